@@ -0,0 +1,410 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from book import load_book, perfect_move
+from engine import BOARD_VARIANTS, EMPTY, O, X, Board, medium_move, random_move
+from mcts import mcts_move, shutdown_pool
+from metrics import LatencyHistogram
+from qlearning import learned_move, load_table
+from search import hard_move
+
+HOST = "127.0.0.1"
+PORT = 8766
+MAX_BATCH = 256
+BATCH_WINDOW = 0.002
+CACHE_SIZE = 65536
+MAX_BODY = 65536
+CELL_SYMBOLS = {"X": X, "O": O, ".": EMPTY, "-": EMPTY, " ": EMPTY}
+DIFFICULTIES = ("easy", "medium", "hard", "mcts", "learned")
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           500: "Internal Server Error"}
+
+
+class RequestError(Exception):
+    """
+    Некорректный запрос клиента; status — код ответа HTTP
+    """
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_job(payload):
+    """
+    Разбирает тело запроса хода:
+      {"cells": "X...O....", "player": "X", "difficulty": "hard", "size": 3, "win_length": 3}
+    cells — символы клеток по строкам: "X", "O" и "." для пустой клетки
+    X ходит первым, поэтому крестиков столько же, сколько ноликов, или на один больше;
+    player должен совпадать с игроком, чей ход, и по умолчанию определяется по позиции
+    Возвращает (сложность, поле, игрок)
+    """
+    if not isinstance(payload, dict):
+        raise RequestError("Тело запроса должно быть объектом JSON")
+    size = payload.get("size", 3)
+    win_length = payload.get("win_length", dict(BOARD_VARIANTS).get(size) if isinstance(size, int) else None)
+    if not isinstance(size, int) or (size, win_length) not in BOARD_VARIANTS:
+        raise RequestError(f"Неподдерживаемый вариант поля: {size}×{size}, {win_length} в ряд")
+    difficulty = payload.get("difficulty", "hard")
+    if difficulty not in DIFFICULTIES:
+        raise RequestError(f"Неизвестная сложность: {difficulty}")
+    cells = payload.get("cells")
+    if not isinstance(cells, str) or len(cells) != size * size or any(c not in CELL_SYMBOLS for c in cells):
+        raise RequestError(f"cells должно быть строкой из {size * size} символов X, O или .")
+
+    x_bits = o_bits = 0
+    for index, cell in enumerate(cells):
+        if CELL_SYMBOLS[cell] == X:
+            x_bits |= 1 << index
+        elif CELL_SYMBOLS[cell] == O:
+            o_bits |= 1 << index
+    placed = x_bits.bit_count() - o_bits.bit_count()
+    if placed not in (0, 1):
+        raise RequestError("Невозможная позиция: крестиков должно быть столько же, сколько ноликов, или на один больше")
+    to_move = X if placed == 0 else O
+    player = payload.get("player", to_move)
+    if player not in (X, O):
+        raise RequestError(f"Неизвестный игрок: {player}")
+    if player != to_move:
+        raise RequestError(f"Сейчас ход {to_move}, а не {player}")
+    board = Board.from_bits(x_bits, o_bits, size, win_length)
+    if board.is_terminal():
+        raise RequestError("Партия уже закончена")
+    return difficulty, board, player
+
+
+def is_slow(difficulty, board):
+    """
+    Долгие расчеты (Монте-Карло и поиск на больших полях) выполняются по отдельности,
+    быстрые — пачкой за один вызов пула потоков
+    """
+    return difficulty == "mcts" or (difficulty == "hard" and not board.is_classic)
+
+
+def compute_move(difficulty, board, player, rng=random):
+    if difficulty == "easy":
+        return random_move(board, rng)
+    if difficulty == "medium":
+        return medium_move(board, player, rng)
+    if difficulty == "mcts":
+        return mcts_move(board, player)
+    if difficulty == "learned":
+        return learned_move(board, player, rng)
+    if board.is_classic:
+        return perfect_move(board, player)
+    return hard_move(board, player)
+
+
+def evaluate_batch(jobs):
+    """
+    Считает ходы для пачки запросов (сложность, поле, игрок);
+    одинаковые позиции детерминированных уровней считаются один раз
+    Если расчет запроса завершился ошибкой, вместо хода возвращается исключение,
+    а остальные запросы пачки считаются как обычно
+    """
+    rng = random.Random()
+    moves = {}
+    results = []
+    for difficulty, board, player in jobs:
+        key = (difficulty, board.size, board.x_bits, board.o_bits, player)
+        try:
+            if difficulty in ("easy", "medium"):
+                move = compute_move(difficulty, board, player, rng)
+            else:
+                if key not in moves:
+                    moves[key] = compute_move(difficulty, board, player, rng)
+                move = moves[key]
+        except Exception as e:
+            move = e
+        results.append(move)
+    return results
+
+
+class MoveCache:
+    """
+    LRU-кэш ответов идеальной игры (сложный уровень на поле 3x3)
+    """
+
+    def __init__(self, max_size=CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(difficulty, board, player):
+        if difficulty == "hard" and board.is_classic:
+            return board.x_bits, board.o_bits, player
+        return None
+
+    def get(self, key):
+        move = self.entries.get(key)
+        if move is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return move
+
+    def put(self, key, move):
+        self.entries[key] = move
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+class ServiceStats:
+    """
+    Счетчики сервиса: запросы, пачки, попадания в кэш и задержка ответа
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched = 0
+        self.connections = 0
+        self.latency = LatencyHistogram()
+
+    def report(self, cache):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "requests_per_s": self.requests / elapsed if elapsed else 0.0,
+            "batches": self.batches,
+            "mean_batch_size": self.batched / self.batches if self.batches else 0.0,
+            "cache_hits": cache.hits,
+            "cache_misses": cache.misses,
+            "cache_size": len(cache.entries),
+            "connections": self.connections,
+            "latency_p50_us": self.latency.percentile(0.5) * 1e6,
+            "latency_p99_us": self.latency.percentile(0.99) * 1e6,
+        }
+
+
+class MoveService:
+    """
+    HTTP/JSON-сервис ходов ИИ без состояния
+    Запросы, пришедшие в пределах batch_window секунд, собираются в пачку и считаются вместе
+    в пуле потоков; соединения поддерживают keep-alive
+
+      POST /move    — тело как в parse_job, ответ {"move": 4, "row": 1, "col": 1}
+      GET /metrics  — счетчики пропускной способности, кэша и задержки
+      GET /health   — проверка доступности
+    """
+
+    def __init__(self, host=HOST, port=PORT, max_batch=MAX_BATCH, batch_window=BATCH_WINDOW,
+                 cache_size=CACHE_SIZE, workers=None):
+        self.host = host
+        self.port = port
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.cache = MoveCache(cache_size)
+        self.stats = ServiceStats()
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.queue = None
+        self.batcher = None
+        self.server = None
+        self.handlers = {}
+
+    async def start(self):
+        await asyncio.get_running_loop().run_in_executor(self.executor, load_book)
+        await asyncio.get_running_loop().run_in_executor(self.executor, load_table)
+        self.queue = asyncio.Queue()
+        self.batcher = asyncio.create_task(self.run_batches())
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+        for writer in self.handlers.values():
+            writer.close()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        if self.server is not None:
+            await self.server.wait_closed()
+        if self.batcher is not None:
+            self.batcher.cancel()
+            await asyncio.gather(self.batcher, return_exceptions=True)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def report(self):
+        return self.stats.report(self.cache)
+
+    async def request_move(self, difficulty, board, player):
+        """
+        Возвращает ход из кэша или ставит запрос в очередь ближайшей пачки
+        """
+        key = self.cache.key(difficulty, board, player)
+        if key is not None:
+            move = self.cache.get(key)
+            if move is not None:
+                return move
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((difficulty, board, player, future))
+        move = await future
+        if key is not None and move is not None:
+            self.cache.put(key, move)
+        return move
+
+    async def run_batches(self):
+        """
+        Собирает запросы в пачки: ждет первый запрос, затем добирает остальные в течение batch_window
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            await asyncio.sleep(self.batch_window)
+            while len(batch) < self.max_batch and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            self.stats.batches += 1
+            self.stats.batched += len(batch)
+
+            fast = [job for job in batch if not is_slow(job[0], job[1])]
+            groups = [[job] for job in batch if is_slow(job[0], job[1])]
+            if fast:
+                groups.append(fast)
+            for group in groups:
+                result = loop.run_in_executor(self.executor, evaluate_batch, [job[:3] for job in group])
+                result.add_done_callback(lambda result, group=group: self.resolve(group, result))
+
+    @staticmethod
+    def resolve(group, result):
+        """
+        Передает ходы, посчитанные для пачки, ожидающим запросам
+        """
+        error = None if result.cancelled() else result.exception()
+        for index, (_, _, _, future) in enumerate(group):
+            if future.done():
+                continue
+            if result.cancelled():
+                future.cancel()
+            elif error is not None:
+                future.set_exception(error)
+            elif isinstance(result.result()[index], Exception):
+                future.set_exception(result.result()[index])
+            else:
+                future.set_result(result.result()[index])
+
+    async def handle(self, reader, writer):
+        """
+        Обслуживает соединение HTTP/1.1 с keep-alive до его закрытия клиентом
+        """
+        self.stats.connections += 1
+        task = asyncio.current_task()
+        self.handlers[task] = writer
+        try:
+            while True:
+                request = await self.read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                started = time.perf_counter()
+                status, payload = await self.dispatch(method, path, body)
+                if path == "/move":
+                    self.stats.requests += 1
+                    self.stats.latency.add(time.perf_counter() - started)
+                    if status != 200:
+                        self.stats.errors += 1
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self.write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            self.stats.connections -= 1
+            self.handlers.pop(task, None)
+            writer.close()
+
+    @staticmethod
+    async def read_request(reader):
+        line = await reader.readline()
+        if not line:
+            return None
+        method, path, _ = line.decode("latin-1").split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", 0))
+        if length > MAX_BODY:
+            raise ValueError("Слишком большое тело запроса")
+        body = await reader.readexactly(length) if length else b""
+        return method, path, headers, body
+
+    async def dispatch(self, method, path, body):
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path == "/metrics":
+            return 200, self.report()
+        if path != "/move":
+            return 404, {"error": f"Неизвестный путь: {path}"}
+        if method != "POST":
+            return 405, {"error": "Ожидается POST"}
+        try:
+            difficulty, board, player = parse_job(json.loads(body or b"null"))
+        except RecursionError:
+            return 400, {"error": "Слишком глубокая вложенность JSON"}
+        except (ValueError, RequestError) as e:
+            return getattr(e, "status", 400), {"error": str(e)}
+        try:
+            move = await self.request_move(difficulty, board, player)
+        except Exception as e:
+            return 500, {"error": f"Ошибка при расчете хода: {e}"}
+        row, col = board.coords(move)
+        return 200, {"move": move, "row": row, "col": col}
+
+    @staticmethod
+    def write_response(writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1") + body
+        )
+
+
+async def serve(host, port, max_batch, batch_window):
+    service = MoveService(host, port, max_batch, batch_window)
+    await service.start()
+    print(f"Сервис ходов слушает http://{service.host}:{service.port}", file=sys.stderr)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTTP-сервис ходов ИИ")
+    parser.add_argument("--host", default=HOST, help="адрес для входящих соединений")
+    parser.add_argument("--port", type=int, default=PORT, help="порт")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="наибольший размер пачки запросов")
+    parser.add_argument("--batch-window", type=float, default=BATCH_WINDOW,
+                        help="сколько секунд добирать запросы в пачку")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.max_batch, args.batch_window))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        shutdown_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import argparse
+import sys
+from collections import namedtuple
+from functools import lru_cache
+
+from engine import CELLS, SIZE, X, Board, geometry, has_line, opponent
+import metrics
+from solver import canonical_key
+
+CACHE_SIZE = 1 << 18
+ENDGAME_CELLS = 10
+
+WIN = "win"
+LOSS = "loss"
+DRAW = "draw"
+
+MoveValue = namedtuple("MoveValue", "cell value outcome plies")
+Analysis = namedtuple("Analysis", "player value outcome plies moves principal_variation")
+
+
+def can_analyze(board):
+    """
+    Точный анализ доступен на поле 3x3 в любой позиции, а на больших полях —
+    в эндшпиле, когда свободных клеток не больше ENDGAME_CELLS
+    """
+    return board.is_classic or board.cells - board.occupied.bit_count() <= ENDGAME_CELLS
+
+
+def _win_score(cells):
+    return cells + 1
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _solve(size, win_length, mine, theirs):
+    """
+    Точная оценка позиции для ходящего игрока без отсечений: cells + 1 минус число
+    клеток на поле в момент победы, со знаком минус при поражении, 0 при ничьей
+    Общий кэш с вытеснением давно не использованных позиций сохраняется между вызовами
+    """
+    cells = size * size
+    win = _win_score(cells)
+    occupied = mine | theirs
+    stones = occupied.bit_count()
+    if has_line(theirs, geometry(size, win_length).lines):
+        return stones - win
+    if stones == cells:
+        return 0
+    fastest = win - stones - 1
+    best = -win
+    for index in range(cells):
+        bit = 1 << index
+        if occupied & bit:
+            continue
+        score = -position_value(size, win_length, theirs, mine | bit)
+        if score > best:
+            best = score
+            if best == fastest:
+                break
+    return best
+
+
+def position_value(size, win_length, mine, theirs):
+    """
+    Оценка позиции по маскам клеток ходящего игрока и соперника;
+    на поле 3x3 все 8 симметричных позиций делят одну запись кэша
+    """
+    if size == SIZE and win_length == SIZE:
+        key = canonical_key(mine, theirs)
+        mine, theirs = key >> CELLS, key & ((1 << CELLS) - 1)
+    return _solve(size, win_length, mine, theirs)
+
+
+def describe(value, stones, cells):
+    """
+    Переводит оценку в исход ("win", "loss", "draw") и число полуходов до конца партии
+    Для ничьей число полуходов не определено и равно None
+    """
+    win = _win_score(cells)
+    if value > 0:
+        return WIN, win - value - stones
+    if value < 0:
+        return LOSS, win + value - stones
+    return DRAW, None
+
+
+def analyze(board, player):
+    """
+    Возвращает Analysis для позиции, в которой ходит player: точную оценку и исход
+    позиции, список MoveValue по всем ходам от лучшего к худшему и главный вариант —
+    последовательность лучших ходов обеих сторон до конца партии
+    ValueError — если позиция слишком велика для точного перебора
+    """
+    if not can_analyze(board):
+        raise ValueError("Точный анализ доступен только на поле 3x3 или в эндшпиле")
+    size, win_length, cells = board.size, board.win_length, board.cells
+    mine, theirs = board.bits(player), board.bits(opponent(player))
+    stones = (mine | theirs).bit_count()
+    value = position_value(size, win_length, mine, theirs)
+    outcome, plies = describe(value, stones, cells)
+
+    moves = []
+    if not board.is_terminal():
+        for index in board.legal_moves():
+            move_value = -position_value(size, win_length, theirs, mine | 1 << index)
+            moves.append(MoveValue(index, move_value, *describe(move_value, stones, cells)))
+        moves.sort(key=lambda move: (-move.value, move.cell))
+
+    variation = []
+    while not (has_line(theirs, board.geometry.lines) or (mine | theirs) == board.geometry.full_mask):
+        best = max(
+            (index for index in range(cells) if not (mine | theirs) >> index & 1),
+            key=lambda index: (-position_value(size, win_length, theirs, mine | 1 << index), -index),
+        )
+        variation.append(best)
+        mine, theirs = theirs, mine | 1 << best
+
+    if metrics.ENABLED:
+        info = _solve.cache_info()
+        metrics.gauge("analysis_cache_hits", info.hits)
+        metrics.gauge("analysis_cache_misses", info.misses)
+        metrics.gauge("analysis_cache_size", info.currsize)
+    return Analysis(player, value, outcome, plies, moves, tuple(variation))
+
+
+def cache_info():
+    return _solve.cache_info()
+
+
+def clear_cache():
+    _solve.cache_clear()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Точный анализ позиции: оценка каждого хода и главный вариант")
+    parser.add_argument("moves", nargs="*", type=int, help="номера клеток сыгранных ходов по порядку")
+    parser.add_argument("--size", type=int, default=SIZE, help="размер поля")
+    parser.add_argument("--win-length", type=int, default=None, help="длина выигрышной линии")
+    parser.add_argument("--first", choices=("X", "O"), default=X, help="кто ходил первым")
+    args = parser.parse_args(argv)
+
+    board = Board(args.size, args.win_length or args.size)
+    player = args.first
+    try:
+        for index in args.moves:
+            board.play(index, player)
+            player = opponent(player)
+        result = analyze(board, player)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    names = {WIN: "победа", LOSS: "поражение", DRAW: "ничья"}
+    plies = f" через {result.plies} полуходов" if result.plies is not None else ""
+    print(f"Ходит {player}: {names[result.outcome]}{plies}")
+    for move in result.moves:
+        row, col = board.coords(move.cell)
+        plies = f" через {move.plies}" if move.plies is not None else ""
+        print(f"  клетка {move.cell} ({row}, {col}): {names[move.outcome]}{plies}")
+    print(f"Главный вариант: {' '.join(map(str, result.principal_variation)) or '—'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
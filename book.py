@@ -0,0 +1,188 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+
+from engine import CELLS, cell_index, has_line, opponent
+import metrics
+from solver import WIN_SCORE, Solver, shared_solver, symmetric_choice
+
+MAGIC = b"TTTB"
+VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+RECORD = struct.Struct("<H")
+POSITIONS = 3 ** CELLS
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perfect_play.bin")
+
+MOVES_MASK = (1 << CELLS) - 1
+VALUE_SHIFT = CELLS
+PRESENT = 1 << 15
+
+TERNARY = tuple(
+    sum(3 ** i for i in range(CELLS) if mask >> i & 1) for mask in range(1 << CELLS)
+)
+
+
+def position_code(mine, theirs):
+    """
+    Возвращает троичный код позиции: 1 — клетка ходящего игрока, 2 — клетка соперника
+    """
+    return TERNARY[mine] + 2 * TERNARY[theirs]
+
+
+def _encode(moves, value):
+    return PRESENT | (value + WIN_SCORE) << VALUE_SHIFT | moves
+
+
+def build_records():
+    """
+    Перебирает все достижимые позиции и вычисляет для каждой
+    точную оценку и маску оптимальных ходов
+    """
+    solver = Solver()
+    records = [0] * POSITIONS
+    stack = [(0, 0)]
+    while stack:
+        mine, theirs = stack.pop()
+        code = position_code(mine, theirs)
+        if records[code]:
+            continue
+        occupied = mine | theirs
+        if has_line(theirs):
+            records[code] = _encode(0, occupied.bit_count() - WIN_SCORE)
+            continue
+        if occupied.bit_count() == CELLS:
+            records[code] = _encode(0, 0)
+            continue
+
+        scores = {}
+        for index in range(CELLS):
+            bit = 1 << index
+            if occupied & bit:
+                continue
+            scores[index] = -solver.negamax(theirs, mine | bit, -WIN_SCORE - 1, WIN_SCORE + 1)
+            stack.append((theirs, mine | bit))
+        value = max(scores.values())
+        moves = 0
+        for index, score in scores.items():
+            if score == value:
+                moves |= 1 << index
+        records[code] = _encode(moves, value)
+    return records
+
+
+def write_book(path=DEFAULT_PATH):
+    """
+    Строит таблицу идеальной игры и сохраняет ее в двоичный файл
+    Возвращает количество записанных позиций
+    """
+    records = build_records()
+    payload = struct.pack(f"<{POSITIONS}H", *records)
+    count = sum(1 for record in records if record)
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, CELLS, count, zlib.crc32(payload)))
+        f.write(payload)
+    return count
+
+
+class Book:
+    """
+    Таблица идеальной игры, отображенная в память
+    Каждая запись — 16 бит: маска оптимальных ходов, оценка позиции и флаг наличия
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, cells, self.count, checksum = HEADER.unpack_from(self.data, 0)
+            if magic != MAGIC or version != VERSION or cells != CELLS:
+                raise ValueError(f"Неподдерживаемый формат таблицы: {path}")
+            if len(self.data) != HEADER.size + RECORD.size * POSITIONS:
+                raise ValueError(f"Неверный размер таблицы: {path}")
+            if zlib.crc32(self.data[HEADER.size:]) != checksum:
+                raise ValueError(f"Неверная контрольная сумма таблицы: {path}")
+        except (ValueError, struct.error):
+            self.data.close()
+            raise
+
+    def lookup(self, mine, theirs):
+        """
+        Возвращает пару (маска оптимальных ходов, оценка) или None для неизвестной позиции
+        """
+        offset = HEADER.size + RECORD.size * position_code(mine, theirs)
+        record, = RECORD.unpack_from(self.data, offset)
+        if not record & PRESENT:
+            return None
+        return record & MOVES_MASK, (record >> VALUE_SHIFT & 0x1F) - WIN_SCORE
+
+    def best_move(self, board, player):
+        """
+        Возвращает оптимальную клетку для игрока player или None, если позиции нет в таблице
+        Из равноценных ходов выбирает тот же, что и живой поиск (symmetric_choice)
+        """
+        mine = board.bits(player)
+        theirs = board.bits(opponent(player))
+        if not mine | theirs:
+            return cell_index(1, 1)
+        entry = self.lookup(mine, theirs)
+        if entry is None or not entry[0]:
+            return None
+        moves = entry[0]
+        return symmetric_choice(mine, theirs, [index for index in range(CELLS) if moves >> index & 1])
+
+
+_book = None
+_book_loaded = False
+_book_lock = threading.Lock()
+
+
+def load_book(path=DEFAULT_PATH):
+    """
+    Загружает таблицу при первом обращении
+    Возвращает None, если файл отсутствует или поврежден
+    Потокобезопасна: пока таблица загружается, остальные вызовы ждут ее
+    """
+    global _book, _book_loaded
+    if not _book_loaded:
+        with _book_lock:
+            if not _book_loaded:
+                try:
+                    _book = Book(path)
+                except (OSError, ValueError):
+                    _book = None
+                _book_loaded = True
+    return _book
+
+
+def perfect_move(board, player, stop=None):
+    """
+    Ход идеальной игры: поиск в таблице, а при ее отсутствии — живой поиск
+    """
+    book = load_book()
+    if book is not None:
+        move = book.best_move(board, player)
+        if move is not None:
+            if metrics.ENABLED:
+                metrics.count("book_lookups", result="hit")
+            return move
+    if metrics.ENABLED:
+        metrics.count("book_lookups", result="miss")
+    return shared_solver().best_move(board, player, stop)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Построение таблицы идеальной игры")
+    parser.add_argument("--output", default=DEFAULT_PATH, help="путь к двоичному файлу таблицы")
+    args = parser.parse_args(argv)
+    count = write_book(args.output)
+    print(f"Записано позиций: {count} -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+CACHE_SIZE = 256
+CACHE_TTL = 30.0
+
+
+class ReadCache:
+    """
+    Ограниченный LRU-кэш результатов чтения с временем жизни записей
+    Ключ — кортеж, первый элемент которого задает вид данных ("user_stats", "ranking", ...);
+    по виду записи сбрасываются при изменении данных
+    TTL ограничивает устаревание, если база меняется другим процессом
+    Доступ из разных потоков сериализуется блокировкой
+    """
+
+    def __init__(self, max_size=CACHE_SIZE, ttl=CACHE_TTL, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0
+
+    def get(self, key, load):
+        """
+        Возвращает значение из кэша или вызывает load() и запоминает результат
+        load вызывается без блокировки кэша, поэтому может сам обращаться к базе; если за это
+        время кэш был сброшен, прочитанное значение не запоминается, чтобы не сохранить устаревшее
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > self.clock():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                metrics.count("storage_cache_lookups", result="hit")
+                return entry[1]
+            self.misses += 1
+            generation = self.generation
+        metrics.count("storage_cache_lookups", result="miss")
+        value = load()
+        with self.lock:
+            if generation == self.generation and self.max_size > 0:
+                self._store(key, value)
+        return value
+
+    def _store(self, key, value):
+        self.entries[key] = (self.clock() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, *kinds):
+        """
+        Удаляет все записи указанных видов
+        """
+        with self.lock:
+            self.generation += 1
+            for key in [key for key in self.entries if key[0] in kinds]:
+                del self.entries[key]
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+    def info(self):
+        """
+        Счетчики кэша: попадания, промахи, вытеснения и текущий размер
+        """
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "size": len(self.entries)}
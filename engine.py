@@ -0,0 +1,316 @@
+import random
+from functools import lru_cache
+
+import metrics
+
+X = "X"
+O = "O"
+EMPTY = ""
+
+SIZE = 3
+CELLS = SIZE * SIZE
+FULL_MASK = (1 << CELLS) - 1
+
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+BOARD_VARIANTS = ((3, 3), (5, 4), (15, 5))
+
+
+def cell_index(row, col):
+    """
+    Переводит координаты клетки (строка, столбец) поля 3x3 в номер бита на доске
+    """
+    return row * SIZE + col
+
+
+def cell_coords(index):
+    """
+    Переводит номер бита на доске 3x3 обратно в координаты (строка, столбец)
+    """
+    return divmod(index, SIZE)
+
+
+class Geometry:
+    """
+    Неизменяемые данные о поле size x size с победой при win_length в ряд:
+    маски всех выигрышных отрезков, отрезки через каждую клетку и соседние клетки
+    """
+
+    __slots__ = ("size", "win_length", "cells", "full_mask", "lines", "cell_lines", "neighbours")
+
+    def __init__(self, size, win_length):
+        if not 1 <= win_length <= size:
+            raise ValueError(f"Длина линии {win_length} не подходит для поля {size}x{size}")
+        self.size = size
+        self.win_length = win_length
+        self.cells = size * size
+        self.full_mask = (1 << self.cells) - 1
+
+        lines = []
+        cell_lines = [[] for _ in range(self.cells)]
+        for row in range(size):
+            for col in range(size):
+                for d_row, d_col in DIRECTIONS:
+                    end_row = row + d_row * (win_length - 1)
+                    end_col = col + d_col * (win_length - 1)
+                    if not (0 <= end_row < size and 0 <= end_col < size):
+                        continue
+                    members = [(row + d_row * i) * size + col + d_col * i for i in range(win_length)]
+                    mask = 0
+                    for index in members:
+                        mask |= 1 << index
+                    lines.append(mask)
+                    for index in members:
+                        cell_lines[index].append(mask)
+        self.lines = tuple(lines)
+        self.cell_lines = tuple(tuple(masks) for masks in cell_lines)
+
+        neighbours = []
+        for index in range(self.cells):
+            row, col = divmod(index, size)
+            mask = 0
+            for n_row in range(max(0, row - 1), min(size, row + 2)):
+                for n_col in range(max(0, col - 1), min(size, col + 2)):
+                    mask |= 1 << (n_row * size + n_col)
+            neighbours.append(mask & ~(1 << index))
+        self.neighbours = tuple(neighbours)
+
+
+@lru_cache(maxsize=None)
+def geometry(size=SIZE, win_length=SIZE):
+    """
+    Возвращает общий для всех полей объект Geometry с указанными параметрами
+    """
+    return Geometry(size, win_length)
+
+
+WIN_MASKS = geometry().lines
+
+
+class SearchCancelled(Exception):
+    """
+    Поиск хода прерван, потому что его результат больше не нужен
+    """
+
+
+def check_stop(stop):
+    """
+    Прерывает поиск, если установлен флаг отмены stop (threading.Event или None)
+    """
+    if stop is not None and stop.is_set():
+        raise SearchCancelled()
+
+
+def opponent(player):
+    """
+    Возвращает символ соперника для указанного игрока
+    """
+    return O if player == X else X
+
+
+def has_line(bits, masks=WIN_MASKS):
+    """
+    Проверяет, содержит ли битовая маска хотя бы одну выигрышную линию из masks
+    """
+    for mask in masks:
+        if bits & mask == mask:
+            return True
+    return False
+
+
+class Board:
+    """
+    Состояние игрового поля без привязки к Qt
+    Клетки каждого игрока хранятся в отдельной битовой маске, бит i соответствует клетке i
+    Победа проверяется после каждого хода только по отрезкам, проходящим через новую клетку
+    """
+
+    __slots__ = ("geometry", "x_bits", "o_bits", "history", "winners")
+
+    def __init__(self, size=SIZE, win_length=SIZE):
+        self.geometry = geometry(size, win_length)
+        self.x_bits = 0
+        self.o_bits = 0
+        self.history = []
+        self.winners = [None]
+
+    @property
+    def size(self):
+        return self.geometry.size
+
+    @property
+    def win_length(self):
+        return self.geometry.win_length
+
+    @property
+    def cells(self):
+        return self.geometry.cells
+
+    @property
+    def is_classic(self):
+        """
+        True для классического поля 3x3 с победой при трех в ряд
+        """
+        return self.geometry.size == SIZE and self.geometry.win_length == SIZE
+
+    def index(self, row, col):
+        return row * self.geometry.size + col
+
+    def coords(self, index):
+        return divmod(index, self.geometry.size)
+
+    @classmethod
+    def from_bits(cls, x_bits, o_bits, size=SIZE, win_length=SIZE):
+        """
+        Восстанавливает поле по маскам клеток игроков без истории ходов
+        Победитель определяется полным просмотром всех отрезков
+        """
+        board = cls(size, win_length)
+        if x_bits & o_bits or (x_bits | o_bits) & ~board.geometry.full_mask:
+            raise ValueError("Некорректные маски клеток")
+        board.x_bits = x_bits
+        board.o_bits = o_bits
+        if has_line(x_bits, board.geometry.lines):
+            board.winners = [X]
+        elif has_line(o_bits, board.geometry.lines):
+            board.winners = [O]
+        return board
+
+    def copy(self):
+        """
+        Возвращает независимую копию поля вместе с историей ходов
+        """
+        board = Board.__new__(Board)
+        board.geometry = self.geometry
+        board.x_bits = self.x_bits
+        board.o_bits = self.o_bits
+        board.history = list(self.history)
+        board.winners = list(self.winners)
+        return board
+
+    def bits(self, player):
+        """
+        Возвращает битовую маску клеток, занятых игроком
+        """
+        return self.x_bits if player == X else self.o_bits
+
+    @property
+    def occupied(self):
+        return self.x_bits | self.o_bits
+
+    def get(self, index):
+        """
+        Возвращает символ в клетке: "X", "O" или пустую строку
+        """
+        bit = 1 << index
+        if self.x_bits & bit:
+            return X
+        if self.o_bits & bit:
+            return O
+        return EMPTY
+
+    def is_empty(self, index):
+        return not self.occupied & (1 << index)
+
+    def legal_moves(self):
+        """
+        Возвращает список номеров свободных клеток в порядке возрастания
+        """
+        free = ~self.occupied & self.geometry.full_mask
+        return [i for i in range(self.geometry.cells) if free >> i & 1]
+
+    def completes_line(self, index, player):
+        """
+        Проверяет, собирает ли ход игрока в клетку index выигрышную линию
+        """
+        bits = self.bits(player) | 1 << index
+        for mask in self.geometry.cell_lines[index]:
+            if bits & mask == mask:
+                return True
+        return False
+
+    def play(self, index, player):
+        """
+        Ставит символ игрока в свободную клетку
+        """
+        bit = 1 << index
+        if self.occupied & bit:
+            raise ValueError(f"Клетка {index} уже занята")
+        winner = self.winners[-1]
+        if winner is None and self.completes_line(index, player):
+            winner = player
+        if player == X:
+            self.x_bits |= bit
+        else:
+            self.o_bits |= bit
+        self.history.append(index)
+        self.winners.append(winner)
+
+    def undo(self):
+        """
+        Отменяет последний ход и возвращает номер освобожденной клетки
+        """
+        index = self.history.pop()
+        self.winners.pop()
+        bit = ~(1 << index)
+        self.x_bits &= bit
+        self.o_bits &= bit
+        return index
+
+    def check_winner(self, player):
+        """
+        Проверяет, собрал ли игрок выигрышную линию
+        """
+        if metrics.ENABLED:
+            metrics.count("check_winner_calls")
+        return self.winners[-1] == player
+
+    def winner(self):
+        """
+        Возвращает победителя ("X" или "O") или None, если его нет
+        """
+        return self.winners[-1]
+
+    def is_full(self):
+        return self.occupied == self.geometry.full_mask
+
+    def check_draw(self):
+        """
+        Проверяет, заполнено ли поле целиком без победителя
+        """
+        return self.is_full() and self.winner() is None
+
+    def is_terminal(self):
+        return self.winner() is not None or self.is_full()
+
+
+def random_move(board, rng=random):
+    """
+    Возвращает случайную свободную клетку или None, если ходов нет
+    """
+    moves = board.legal_moves()
+    return rng.choice(moves) if moves else None
+
+
+def winning_move(board, player):
+    """
+    Ищет клетку, ход в которую сразу приносит игроку победу
+    """
+    occupied = board.occupied
+    for index in range(board.cells):
+        if not occupied >> index & 1 and board.completes_line(index, player):
+            return index
+    return None
+
+
+def medium_move(board, player, rng=random):
+    """
+    Ход среднего уровня: выиграть, если можно, иначе помешать сопернику,
+    иначе случайная свободная клетка
+    """
+    move = winning_move(board, player)
+    if move is None:
+        move = winning_move(board, opponent(player))
+    if move is None:
+        move = random_move(board, rng)
+    return move
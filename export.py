@@ -0,0 +1,74 @@
+import argparse
+import csv
+import json
+import sys
+
+from storage import DB_PATH, GameRecord, Storage
+
+FIELDS = GameRecord._fields
+
+
+def export_jsonl(games, out):
+    """
+    Записывает партии построчно в формате JSON Lines; возвращает количество партий
+    """
+    count = 0
+    for game in games:
+        out.write(json.dumps(game._asdict(), ensure_ascii=False))
+        out.write("\n")
+        count += 1
+    return count
+
+
+def export_csv(games, out):
+    """
+    Записывает партии в CSV; ходы — номера клеток через пробел
+    Возвращает количество партий
+    """
+    writer = csv.writer(out)
+    writer.writerow(FIELDS)
+    count = 0
+    for game in games:
+        writer.writerow(game._replace(moves=" ".join(map(str, game.moves))))
+        count += 1
+    return count
+
+
+EXPORTERS = {
+    "jsonl": export_jsonl,
+    "csv": export_csv,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Потоковая выгрузка истории партий")
+    parser.add_argument("--database", default=DB_PATH, help="путь к базе данных")
+    parser.add_argument("--format", choices=sorted(EXPORTERS), default="jsonl", help="формат выгрузки")
+    parser.add_argument("--output", default="-", help="путь к файлу или - для стандартного вывода")
+    parser.add_argument("--user", default=None, help="выгрузить партии только этого пользователя")
+    parser.add_argument("--batch-size", type=int, default=1000, help="количество партий, читаемых за раз")
+    args = parser.parse_args(argv)
+
+    storage = Storage(args.database)
+    try:
+        user_id = None
+        if args.user is not None:
+            user = storage.find_user(args.user)
+            if user is None:
+                print(f"Пользователь {args.user} не найден", file=sys.stderr)
+                return 1
+            user_id = user.id
+        games = storage.iter_games(user_id, batch_size=args.batch_size)
+        if args.output == "-":
+            count = EXPORTERS[args.format](games, sys.stdout)
+        else:
+            with open(args.output, "w", encoding="utf-8", newline="") as out:
+                count = EXPORTERS[args.format](games, out)
+    finally:
+        storage.close()
+    print(f"Выгружено партий: {count}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
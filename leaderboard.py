@@ -0,0 +1,71 @@
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+PAGE_SIZE = 50
+
+
+class PagedTableModel(QAbstractTableModel):
+    """
+    Модель таблицы, подгружающая строки страницами по мере прокрутки
+    fetch_page(after, limit) возвращает следующую страницу строк; page_key(row) — ключ
+    последней загруженной строки, с которого продолжается выборка; display(row) — значения
+    столбцов headers для строки
+    """
+
+    def __init__(self, fetch_page, headers, page_key, display, page_size=PAGE_SIZE, parent=None):
+        super().__init__(parent)
+        self.fetch_page = fetch_page
+        self.headers = headers
+        self.page_key = page_key
+        self.display = display
+        self.page_size = page_size
+        self.rows = []
+        self.exhausted = False
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        return str(self.display(self.rows[index.row()])[index.column()])
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.headers[section]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self.exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        """
+        Загружает следующую страницу, продолжая с ключа последней загруженной строки
+        """
+        if parent.isValid() or self.exhausted:
+            return
+        after = self.page_key(self.rows[-1]) if self.rows else None
+        page = self.fetch_page(after, self.page_size)
+        if len(page) < self.page_size:
+            self.exhausted = True
+        if not page:
+            return
+        self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+        self.rows.extend(page)
+        self.endInsertRows()
+
+
+class LeaderboardModel(PagedTableModel):
+    """
+    Модель таблицы лидеров
+    fetch_page(after, limit) возвращает строки с полями id и wins (первое поле — id, остальные
+    выводятся в столбцах headers), например Storage.ranking_page
+    """
+
+    HEADERS = ("Имя пользователя", "Победы", "Ничьи", "Поражения")
+
+    def __init__(self, fetch_page, page_size=PAGE_SIZE, parent=None, headers=HEADERS):
+        super().__init__(fetch_page, headers, lambda row: (row.wins, row.id), lambda row: row[1:],
+                         page_size, parent)
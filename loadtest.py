@@ -0,0 +1,254 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+from aiservice import MoveService
+from engine import BOARD_VARIANTS, X, Board, opponent, random_move
+from metrics import LatencyHistogram
+from server import HOST, GameServer, decode, encode
+
+
+class Client:
+    """
+    Клиент нагрузочного теста: играет случайными ходами и замеряет время
+    от отправки хода до его подтверждения сервером
+    """
+
+    def __init__(self, name, latency, rng):
+        self.name = name
+        self.latency = latency
+        self.rng = rng
+        self.reader = None
+        self.writer = None
+
+    async def connect(self, host, port):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+
+    async def send(self, message):
+        self.writer.write(encode(message))
+        await self.writer.drain()
+
+    async def receive(self):
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("Сервер закрыл соединение")
+        return decode(line)
+
+    async def play(self, size, win_length):
+        """
+        Играет одну партию до конца; возвращает количество своих ходов
+        """
+        await self.send({"type": "hello", "name": self.name, "size": size, "win_length": win_length})
+        message = await self.receive()
+        if message["type"] == "waiting":
+            message = await self.receive()
+        symbol = message["symbol"]
+        free = set(range(size * size))
+        turn = message["turn"]
+        moves = 0
+        sent_at = None
+        while True:
+            if turn == symbol and sent_at is None:
+                sent_at = time.perf_counter()
+                await self.send({"type": "move", "cell": self.rng.choice(sorted(free))})
+            message = await self.receive()
+            if message["type"] == "move":
+                free.discard(message["cell"])
+                if message["player"] == symbol:
+                    self.latency.add(time.perf_counter() - sent_at)
+                    sent_at = None
+                    moves += 1
+                turn = message["turn"]
+            elif message["type"] == "end":
+                return moves
+            elif message["type"] == "error":
+                raise RuntimeError(message["message"])
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def run_pair(number, host, port, games, size, win_length, latency, seed):
+    clients = [Client(f"bot{number}-{side}", latency, random.Random(seed + side)) for side in (0, 1)]
+    moves = 0
+    for client in clients:
+        await client.connect(host, port)
+    try:
+        for _ in range(games):
+            first, second = await asyncio.gather(*(client.play(size, win_length) for client in clients))
+            moves += first + second
+    finally:
+        for client in clients:
+            await client.close()
+    return moves
+
+
+async def run_game(rooms, games, size, win_length, host=None, port=None, seed=0):
+    """
+    Запускает rooms пар клиентов, каждая играет games партий подряд
+    Если host не задан, поднимает сервер в этом же процессе
+    Возвращает сводный отчет в виде словаря
+    """
+    server = None
+    if host is None:
+        server = GameServer(HOST, 0)
+        await server.start()
+        host, port = server.host, server.port
+
+    latency = LatencyHistogram()
+    started = time.perf_counter()
+    try:
+        moves = sum(await asyncio.gather(*(
+            run_pair(number, host, port, games, size, win_length, latency, seed + 2 * number)
+            for number in range(rooms)
+        )))
+    finally:
+        elapsed = time.perf_counter() - started
+        report = server.report() if server is not None else None
+        if server is not None:
+            await server.close()
+
+    return {
+        "rooms": rooms,
+        "games": rooms * games,
+        "board_size": size,
+        "win_length": win_length,
+        "moves": moves,
+        "elapsed_s": elapsed,
+        "moves_per_s": moves / elapsed if elapsed else 0.0,
+        "latency_p50_us": latency.percentile(0.5) * 1e6,
+        "latency_p99_us": latency.percentile(0.99) * 1e6,
+        "server": report,
+    }
+
+
+def random_position(size, win_length, rng):
+    """
+    Возвращает незаконченную позицию после случайного числа случайных ходов
+    в виде строки клеток для запроса к сервису ходов и игрока, чей ход
+    """
+    while True:
+        board = Board(size, win_length)
+        player = X
+        for _ in range(rng.randrange(size * size)):
+            board.play(random_move(board, rng), player)
+            player = opponent(player)
+            if board.is_terminal():
+                break
+        if not board.is_terminal():
+            return "".join(board.get(index) or "." for index in range(board.cells)), player
+
+
+async def request_moves(host, port, requests, difficulty, size, win_length, latency, seed):
+    """
+    Отправляет requests запросов хода по одному keep-alive соединению
+    """
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(requests):
+            cells, player = random_position(size, win_length, rng)
+            body = json.dumps({"cells": cells, "player": player, "difficulty": difficulty,
+                               "size": size, "win_length": win_length}).encode("utf-8")
+            started = time.perf_counter()
+            writer.write(f"POST /move HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                         f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+            await writer.drain()
+            status = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.lower() == "content-length":
+                    length = int(value)
+            response = json.loads(await reader.readexactly(length))
+            if b" 200 " not in status:
+                raise RuntimeError(response.get("error"))
+            latency.add(time.perf_counter() - started)
+    finally:
+        writer.close()
+        await writer.wait_closed()
+    return requests
+
+
+async def run_ai(clients, requests, difficulty, size, win_length, host=None, port=None, seed=0):
+    """
+    Запускает clients клиентов сервиса ходов, каждый отправляет requests запросов подряд
+    Если host не задан, поднимает сервис в этом же процессе
+    Возвращает сводный отчет в виде словаря
+    """
+    service = None
+    if host is None:
+        service = MoveService(HOST, 0)
+        await service.start()
+        host, port = service.host, service.port
+
+    latency = LatencyHistogram()
+    started = time.perf_counter()
+    try:
+        total = sum(await asyncio.gather(*(
+            request_moves(host, port, requests, difficulty, size, win_length, latency, seed + number)
+            for number in range(clients)
+        )))
+    finally:
+        elapsed = time.perf_counter() - started
+        report = service.report() if service is not None else None
+        if service is not None:
+            await service.close()
+
+    return {
+        "clients": clients,
+        "requests": total,
+        "difficulty": difficulty,
+        "board_size": size,
+        "win_length": win_length,
+        "elapsed_s": elapsed,
+        "requests_per_s": total / elapsed if elapsed else 0.0,
+        "latency_p50_us": latency.percentile(0.5) * 1e6,
+        "latency_p99_us": latency.percentile(0.99) * 1e6,
+        "server": report,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест сервера сетевой игры и сервиса ходов ИИ")
+    parser.add_argument("--target", choices=("game", "ai"), default="game",
+                        help="game — сервер сетевой игры, ai — HTTP-сервис ходов")
+    parser.add_argument("--rooms", type=int, default=200, help="количество одновременных комнат")
+    parser.add_argument("--games", type=int, default=10, help="партий в каждой комнате")
+    parser.add_argument("--clients", type=int, default=100, help="количество клиентов сервиса ходов")
+    parser.add_argument("--requests", type=int, default=100, help="запросов от каждого клиента сервиса ходов")
+    parser.add_argument("--difficulty", default="hard", help="сложность ИИ в запросах к сервису ходов")
+    parser.add_argument("--size", type=int, default=3, help="размер поля")
+    parser.add_argument("--host", default=None, help="адрес сервера (по умолчанию сервер запускается в процессе теста)")
+    parser.add_argument("--port", type=int, default=None, help="порт сервера")
+    parser.add_argument("--seed", type=int, default=0, help="зерно генератора случайных чисел")
+    parser.add_argument("--output", default=None, help="путь к JSON-файлу с результатами")
+    args = parser.parse_args(argv)
+
+    win_length = dict(BOARD_VARIANTS)[args.size]
+    if args.target == "ai":
+        report = asyncio.run(run_ai(args.clients, args.requests, args.difficulty, args.size, win_length,
+                                    args.host, args.port, args.seed))
+        print(f"Клиентов: {report['clients']}, запросов: {report['requests']}, "
+              f"запросов в секунду: {report['requests_per_s']:.0f}, "
+              f"p50 {report['latency_p50_us']:.0f} мкс, p99 {report['latency_p99_us']:.0f} мкс")
+    else:
+        report = asyncio.run(run_game(args.rooms, args.games, args.size, win_length,
+                                      args.host, args.port, args.seed))
+        print(f"Комнат: {report['rooms']}, партий: {report['games']}, ходов в секунду: {report['moves_per_s']:.0f}, "
+              f"p50 {report['latency_p50_us']:.0f} мкс, p99 {report['latency_p99_us']:.0f} мкс")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,70 +1,202 @@
+import os
 import sys
+import json
+import time
+import logging
+import argparse
 import sqlite3
-import random
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QPushButton, QGridLayout, QWidget,
-    QMessageBox, QVBoxLayout, QLabel, QLineEdit, QTableWidget,
-    QTableWidgetItem, QComboBox
+    QMessageBox, QVBoxLayout, QLabel, QLineEdit, QTableView,
+    QComboBox, QAbstractItemView, QStackedWidget, QButtonGroup, QHBoxLayout
 )
-from PyQt6.QtCore import QSize, Qt
+from PyQt6.QtCore import QObject, QSize, Qt, QTimer, pyqtSignal
+from PyQt6.QtGui import QBrush, QImage, QPalette, QPixmap
+
+import analysis
+import engine
+import metrics
+from engine import BOARD_VARIANTS, Board, SearchCancelled, opponent
+from book import load_book
+from search import hard_move
+from mcts import mcts_move, shutdown_pool
+from qlearning import learned_move
+from replay import Replay
+from leaderboard import LeaderboardModel, PagedTableModel
+from netclient import NetworkClient, parse_address
+from server import HOST, PORT
+from storage import DRAW, GameRecord, ResultBuffer, Storage
+
+STARTED = time.perf_counter()
+log = logging.getLogger(__name__)
+
+RANKINGS = (
+    ("Сложный ИИ", "ai", "hard"),
+    ("Средний ИИ", "ai", "medium"),
+    ("Лёгкий ИИ", "ai", "easy"),
+    ("Монте-Карло", "ai", "mcts"),
+    ("Обученный ИИ", "ai", "learned"),
+    ("Игра с другом", "friend", ""),
+)
+LEADERBOARDS = (("Рейтинг Эло", "rating", ""),) + RANKINGS
+RANKING_HEADERS = ("Имя пользователя", "Победы", "Ничьи", "Поражения")
+RATING_HEADERS = ("Игрок", "Рейтинг", "Партий")
+HISTORY_HEADERS = ("Дата", "Режим", "Поле", "Итог", "Ходов")
+DIFFICULTY_NAMES = {"easy": "лёгкий", "medium": "средний", "hard": "сложный", "mcts": "Монте-Карло",
+                    "learned": "обученный"}
+RESULT_NAMES = {"X": "Победа", "O": "Поражение", DRAW: "Ничья"}
+AUTOPLAY_INTERVAL_MS = 700
+BACKGROUND_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "background_2.png")
+
+
+def load_background(path, size):
+    """
+    Декодирует фоновое изображение и обрезает его по центру под размер окна
+    Вызывается один раз в фоновом потоке: в отличие от QPixmap, QImage можно создавать вне потока интерфейса
+    """
+    image = QImage(path)
+    if image.isNull():
+        return image
+    if image.width() < size.width() or image.height() < size.height():
+        image = image.scaled(size, Qt.AspectRatioMode.KeepAspectRatioByExpanding,
+                             Qt.TransformationMode.SmoothTransformation)
+    left = (image.width() - size.width()) // 2
+    top = (image.height() - size.height()) // 2
+    image = image.copy(left, top, size.width(), size.height())
+    return image.convertToFormat(QImage.Format.Format_ARGB32_Premultiplied)
 
 
 class TicTacToeApp(QMainWindow):
-    def __init__(self):
+    def __init__(self, metrics_output="metrics.json", metrics_format="json"):
         """
-        Инициализирует главное окно приложения, устанавливает соединение с базами данных
-        создает необходимые таблицы и открывает главное меню
+        Инициализирует главное окно приложения и открывает главное меню
+        Хранилище данных (с обновлением схемы), таблица идеальной игры и фон
+        загружаются в фоновых потоках, чтобы окно появилось сразу
+        Если сбор метрик включен, при закрытии они сохраняются в metrics_output
         """
         super().__init__()
-        self.setStyleSheet("background-image:url(\"background_2.png\"); background-position: center;")
+        self.metrics_output = metrics_output
+        self.metrics_format = metrics_format
         self.setWindowTitle("Крестики-нолики")
         self.setFixedSize(QSize(400, 500))
         self.username = None
         self.user_id = None
+        self.auth_pending = False
         self.ai_difficulty = 'medium'
-        try:
-            self.conn = sqlite3.connect("leaderboard.db")
-            self.conn2 = sqlite3.connect("player_stats.db")
-            self.create_tables()
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "База данных", f"Ошибка подключения к базе данных: {e}")
-            sys.exit(1)
+        self.board_size, self.win_length = BOARD_VARIANTS[0]
+        self.ai_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai")
+        self.task_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="task")
+        self.tasks = TaskRunner(self.task_executor, self)
+
+        self.stack = QStackedWidget()
+        self.setCentralWidget(self.stack)
+        self.screens = {}
+        self.game_window = None
+        self.game_views = {}
+        self.replay_views = {}
+
+        self.storage = None
+        self.results = None
+        self.storage_ready_at = None
+        self.storage_future = self.tasks.submit(Storage, on_done=self.on_storage_ready,
+                                                on_error=self.on_storage_failed)
+        self.tasks.submit(load_book)
+        self.tasks.submit(load_background, BACKGROUND_PATH, self.size(), on_done=self.set_background)
         self.main_menu()
 
-    def create_tables(self):
+    def on_storage_ready(self, storage):
+        self.storage = storage
+        self.results = ResultBuffer(storage)
+        self.storage_ready_at = time.perf_counter()
+
+    def on_storage_failed(self, error):
+        QMessageBox.critical(self, "База данных", f"Ошибка подключения к базе данных: {error}")
+        self.close()
+
+    def storage_ready(self):
         """
-        Создает таблицы в базах данных, если они не существуют
-        В player_stats.db создается таблица users
-        В leaderboard.db создается таблица stats
+        Проверяет, открыто ли хранилище; пока оно загружается, предупреждает пользователя
         """
-        try:
-            with self.conn2:
-                self.conn2.execute("""
-                    CREATE TABLE IF NOT EXISTS users (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        username TEXT UNIQUE,
-                        password TEXT
-                    )
-                """)
-            with self.conn:
-                self.conn.execute("""
-                    CREATE TABLE IF NOT EXISTS stats (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        user_id INTEGER,
-                        wins INTEGER DEFAULT 0,
-                        losses INTEGER DEFAULT 0
-                    )
-                """)
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "База данных", f"Ошибка создания таблиц: {e}")
-            sys.exit(1)
+        if self.storage is None:
+            QMessageBox.information(self, "База данных", "База данных еще загружается, попробуйте через секунду.")
+            return False
+        return True
+
+    def set_background(self, image):
+        """
+        Устанавливает фон окна из уже декодированного и обрезанного по размеру окна изображения
+        """
+        if image.isNull():
+            return
+        palette = self.palette()
+        palette.setBrush(QPalette.ColorRole.Window, QBrush(QPixmap.fromImage(image)))
+        self.setPalette(palette)
+        self.setAutoFillBackground(True)
+
+    def closeEvent(self, event):
+        """
+        Останавливает фоновые вычисления ИИ и записывает отложенную статистику при закрытии окна
+        """
+        self.ai_executor.shutdown(wait=False, cancel_futures=True)
+        self.task_executor.shutdown(wait=True, cancel_futures=True)
+        shutdown_pool()
+        if self.storage is None and self.storage_future.done() and not self.storage_future.cancelled() \
+                and self.storage_future.exception() is None:
+            self.on_storage_ready(self.storage_future.result())
+        if self.storage is not None:
+            try:
+                self.results.close()
+            except sqlite3.Error as e:
+                QMessageBox.critical(self, "База данных", f"Ошибка при сохранении статистики: {e}")
+            self.storage.close()
+            if metrics.ENABLED:
+                info = self.storage.cache.info()
+                metrics.gauge("storage_cache_size", info["size"])
+                metrics.gauge("storage_cache_evictions", info["evictions"])
+        if metrics.ENABLED:
+            try:
+                metrics.dump(self.metrics_output, self.metrics_format)
+            except OSError as e:
+                QMessageBox.critical(self, "Метрики", f"Ошибка при сохранении метрик: {e}")
+        super().closeEvent(event)
+
+    def show_screen(self, name, build):
+        """
+        Показывает экран name; при первом обращении строит его функцией build,
+        затем использует уже созданные виджеты
+        """
+        screen = self.screens.get(name)
+        if screen is None:
+            screen = self.screens[name] = build()
+            self.stack.addWidget(screen)
+        self.stack.setCurrentWidget(screen)
+        return screen
+
+    def show_game(self, game):
+        """
+        Показывает игровое поле; поля локальных игр остаются в стеке для следующих партий,
+        а поле прошлой сетевой партии удаляется
+        """
+        previous = self.game_window
+        if previous is not None and previous is not game and isinstance(previous, NetworkGame):
+            self.stack.removeWidget(previous)
+            previous.deleteLater()
+        self.game_window = game
+        if self.stack.indexOf(game) < 0:
+            self.stack.addWidget(game)
+        self.stack.setCurrentWidget(game)
 
     def main_menu(self):
         """
         Отображает главное меню приложения
         """
-        self.central_widget = QWidget()
-        self.setCentralWidget(self.central_widget)
+        self.show_screen("menu", self.build_main_menu)
+
+    def build_main_menu(self):
+        screen = QWidget()
         layout = QVBoxLayout()
 
         title = QLabel("Крестики-нолики")
@@ -83,6 +215,10 @@ class TicTacToeApp(QMainWindow):
         play_with_friend_button.setStyleSheet("font-size: 18px; padding: 10px; background: rgb(0, 191, 255); color: rgb(255, 255, 255);")
         play_with_friend_button.clicked.connect(lambda: self.start_game("friend"))
 
+        play_online_button = QPushButton("Играть по сети")
+        play_online_button.setStyleSheet("font-size: 18px; padding: 10px; background: rgb(0, 191, 255); color: rgb(255, 255, 255);")
+        play_online_button.clicked.connect(self.select_network_game)
+
         play_with_ai_button = QPushButton("Играть с ИИ")
         play_with_ai_button.setStyleSheet("font-size: 18px; padding: 10px; background: rgb(0, 191, 255); color: rgb(255, 255, 255);")
         play_with_ai_button.clicked.connect(self.select_difficulty)
@@ -91,21 +227,35 @@ class TicTacToeApp(QMainWindow):
         leaderboard_button.setStyleSheet("font-size: 18px; padding: 10px; background: rgb(0, 191, 255); color: rgb(255, 255, 255);")
         leaderboard_button.clicked.connect(self.show_leaderboard)
 
+        profile_button = QPushButton("Профиль")
+        profile_button.setStyleSheet("font-size: 18px; padding: 10px; background: rgb(0, 191, 255); color: rgb(255, 255, 255);")
+        profile_button.clicked.connect(self.show_profile)
+
+        history_button = QPushButton("История партий")
+        history_button.setStyleSheet("font-size: 18px; padding: 10px; background: rgb(0, 191, 255); color: rgb(255, 255, 255);")
+        history_button.clicked.connect(self.show_history)
+
         layout.addWidget(title)
         layout.addWidget(register_button)
         layout.addWidget(login_button)
         layout.addWidget(play_with_friend_button)
+        layout.addWidget(play_online_button)
         layout.addWidget(play_with_ai_button)
         layout.addWidget(leaderboard_button)
+        layout.addWidget(profile_button)
+        layout.addWidget(history_button)
         layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.central_widget.setLayout(layout)
+        screen.setLayout(layout)
+        return screen
 
     def select_difficulty(self):
         """
         Отображает окно выбора сложности ИИ и порядка хода перед началом игры с ИИ
         """
-        self.central_widget = QWidget()
-        self.setCentralWidget(self.central_widget)
+        self.show_screen("difficulty", self.build_difficulty_screen)
+
+    def build_difficulty_screen(self):
+        screen = QWidget()
         layout = QVBoxLayout()
 
         title = QLabel("Настройки игры с ИИ")
@@ -116,7 +266,7 @@ class TicTacToeApp(QMainWindow):
         difficulty_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         difficulty_label.setStyleSheet("font-size: 16px; margin-bottom: 5px;")
         self.difficulty_combo = QComboBox()
-        self.difficulty_combo.addItems(["Лёгкий", "Средний", "Сложный"])
+        self.difficulty_combo.addItems(["Лёгкий", "Средний", "Сложный", "Монте-Карло", "Обученный"])
         self.difficulty_combo.setStyleSheet("font-size: 14px; padding: 5px;")
 
         order_label = QLabel("Кто ходит первым?")
@@ -126,6 +276,13 @@ class TicTacToeApp(QMainWindow):
         self.order_combo.addItems(["Игрок", "ИИ"])
         self.order_combo.setStyleSheet("font-size: 14px; padding: 5px;")
 
+        board_label = QLabel("Размер поля")
+        board_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        board_label.setStyleSheet("font-size: 16px; margin-top: 15px; margin-bottom: 5px;")
+        self.ai_board_combo = QComboBox()
+        self.ai_board_combo.addItems([f"{size}×{size} ({length} в ряд)" for size, length in BOARD_VARIANTS])
+        self.ai_board_combo.setStyleSheet("font-size: 14px; padding: 5px;")
+
         start_button = QPushButton("Начать игру с ИИ")
         start_button.setStyleSheet("font-size: 16px; padding: 10px;")
         start_button.clicked.connect(self.set_difficulty_and_start)
@@ -139,15 +296,73 @@ class TicTacToeApp(QMainWindow):
         layout.addWidget(self.difficulty_combo)
         layout.addWidget(order_label)
         layout.addWidget(self.order_combo)
+        layout.addWidget(board_label)
+        layout.addWidget(self.ai_board_combo)
         layout.addWidget(start_button)
         layout.addWidget(back_button)
         layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.central_widget.setLayout(layout)
+        screen.setLayout(layout)
+        return screen
+
+    def select_network_game(self):
+        """
+        Отображает окно подключения к серверу сетевой игры и выбора размера поля
+        """
+        self.show_screen("network", self.build_network_screen)
+
+    def build_network_screen(self):
+        screen = QWidget()
+        layout = QVBoxLayout()
+
+        title = QLabel("Игра по сети")
+        title.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        title.setStyleSheet("font-size: 20px; font-weight: bold; margin-bottom: 20px;")
+
+        self.server_address_input = QLineEdit(f"{HOST}:{PORT}")
+        self.server_address_input.setPlaceholderText("Адрес сервера")
+        self.server_address_input.setStyleSheet("font-size: 16px; padding: 5px;")
+
+        self.network_board_combo = QComboBox()
+        self.network_board_combo.addItems([f"{size}×{size} ({length} в ряд)" for size, length in BOARD_VARIANTS])
+        self.network_board_combo.setStyleSheet("font-size: 14px; padding: 5px;")
+
+        start_button = QPushButton("Найти соперника")
+        start_button.setStyleSheet("font-size: 16px; padding: 10px;")
+        start_button.clicked.connect(self.start_network_game)
+
+        back_button = QPushButton("Назад")
+        back_button.setStyleSheet("font-size: 16px; padding: 10px;")
+        back_button.clicked.connect(self.main_menu)
+
+        layout.addWidget(title)
+        layout.addWidget(self.server_address_input)
+        layout.addWidget(self.network_board_combo)
+        layout.addWidget(start_button)
+        layout.addWidget(back_button)
+        layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        screen.setLayout(layout)
+        return screen
+
+    def start_network_game(self):
+        """
+        Подключается к серверу и открывает поле сетевой партии; соперника подбирает сервер
+        """
+        if not self.username:
+            QMessageBox.warning(self, "Ошибка", "Сначала авторизуйтесь или зарегистрируйтесь, прежде чем играть.")
+            return
+        try:
+            host, port = parse_address(self.server_address_input.text())
+        except ValueError:
+            QMessageBox.warning(self, "Ошибка", "Адрес сервера должен иметь вид хост:порт.")
+            return
+        board_size, win_length = BOARD_VARIANTS[self.network_board_combo.currentIndex()]
+        self.show_game(NetworkGame(self, NetworkClient(host, port), self.username, board_size, win_length))
 
     def set_difficulty_and_start(self):
         """
-        Устанавливает выбранную сложность ИИ и порядок хода, зтем начинает игру
+        Устанавливает выбранную сложность ИИ, порядок хода и размер поля, зтем начинает игру
         """
+        self.board_size, self.win_length = BOARD_VARIANTS[self.ai_board_combo.currentIndex()]
         difficulty_text = self.difficulty_combo.currentText()
         order_text = self.order_combo.currentText()
 
@@ -155,6 +370,10 @@ class TicTacToeApp(QMainWindow):
             self.ai_difficulty = "easy"
         elif difficulty_text == "Средний":
             self.ai_difficulty = "medium"
+        elif difficulty_text == "Монте-Карло":
+            self.ai_difficulty = "mcts"
+        elif difficulty_text == "Обученный":
+            self.ai_difficulty = "learned"
         else:
             self.ai_difficulty = "hard"
 
@@ -169,8 +388,12 @@ class TicTacToeApp(QMainWindow):
         """
         Отображает окно регистрации нового пользователя
         """
-        self.central_widget = QWidget()
-        self.setCentralWidget(self.central_widget)
+        self.show_screen("register", self.build_register_screen)
+        self.reg_username_input.clear()
+        self.reg_password_input.clear()
+
+    def build_register_screen(self):
+        screen = QWidget()
         layout = QVBoxLayout()
 
         title = QLabel("Регистрация")
@@ -200,11 +423,14 @@ class TicTacToeApp(QMainWindow):
         layout.addWidget(submit_button)
         layout.addWidget(back_button)
         layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.central_widget.setLayout(layout)
+        screen.setLayout(layout)
+        return screen
 
     def save_new_user(self):
         """
-        Сохраняет нового пользователя в базу данных, проверяя уникальность имени пользователя
+        Сохраняет нового пользователя в базу данных вместе с его статистикой,
+        проверяя уникальность имени пользователя
+        Хеширование пароля выполняется в фоновом потоке, повторные нажатия на это время игнорируются
         """
         username = self.reg_username_input.text().strip()
         password = self.reg_password_input.text().strip()
@@ -213,40 +439,41 @@ class TicTacToeApp(QMainWindow):
             QMessageBox.warning(self, "Ошибка", "Имя пользователя и пароль не могут быть пустыми.")
             return
 
-        try:
-            with self.conn2:
-                result = self.conn2.execute("SELECT username FROM users WHERE username = ?", (username,)).fetchone()
-                if result:
-                    QMessageBox.warning(self, "Ошибка", "Пользователь с таким именем уже существует.")
-                    return
-                else:
-                    self.conn2.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password))
-                    user_id = self.conn2.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()[0]
-
-            with self.conn:
-                self.conn.execute("INSERT INTO stats (user_id, wins, losses) VALUES (?, 0, 0)", (user_id,))
-
-            QMessageBox.information(self, "Успех", f"Пользователь {username} успешно зарегистрирован!")
-            self.username = username
-            self.user_id = user_id
+        if self.auth_pending or not self.storage_ready():
+            return
+        self.auth_pending = True
+        self.tasks.submit(self.storage.create_user, username, password,
+                          on_done=self.on_user_created, on_error=self.on_user_create_failed)
 
-            try:
-                with open("player_data.txt", "a", encoding="utf-8") as f:
-                    f.write(f"Username: {username}, Password: {password}\n")
-            except Exception as e:
-                QMessageBox.warning(self, "Файл", f"Не удалось записать данные в файл: {e}")
+    def on_user_created(self, user):
+        """
+        Завершает регистрацию после записи пользователя в базу данных
+        """
+        self.auth_pending = False
+        if user is None:
+            QMessageBox.warning(self, "Ошибка", "Пользователь с таким именем уже существует.")
+            return
 
-            self.main_menu()
+        QMessageBox.information(self, "Успех", f"Пользователь {user.username} успешно зарегистрирован!")
+        self.username = user.username
+        self.user_id = user.id
+        self.main_menu()
 
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "База данных", f"Ошибка при регистрации пользователя: {e}")
+    def on_user_create_failed(self, error):
+        self.auth_pending = False
+        title = "База данных" if isinstance(error, sqlite3.Error) else "Ошибка"
+        QMessageBox.critical(self, title, f"Ошибка при регистрации пользователя: {error}")
 
     def login_user(self):
         """
         Отображает окно авторизации пользователя
         """
-        self.central_widget = QWidget()
-        self.setCentralWidget(self.central_widget)
+        self.show_screen("login", self.build_login_screen)
+        self.login_username_input.clear()
+        self.login_password_input.clear()
+
+    def build_login_screen(self):
+        screen = QWidget()
         layout = QVBoxLayout()
 
         title = QLabel("Авторизация")
@@ -276,12 +503,13 @@ class TicTacToeApp(QMainWindow):
         layout.addWidget(submit_button)
         layout.addWidget(back_button)
         layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.central_widget.setLayout(layout)
+        screen.setLayout(layout)
+        return screen
 
     def check_credentials(self):
         """
         Проверяет введенные учетные данные пользователя в базе данных
-        При успешной авторизации сохраняет данные о пользователе и возвращается в главное меню
+        Проверка хеша пароля выполняется в фоновом потоке, повторные нажатия на это время игнорируются
         """
         username = self.login_username_input.text().strip()
         password = self.login_password_input.text().strip()
@@ -290,18 +518,29 @@ class TicTacToeApp(QMainWindow):
             QMessageBox.warning(self, "Ошибка", "Имя пользователя и пароль не могут быть пустыми.")
             return
 
-        try:
-            with self.conn2:
-                result = self.conn2.execute("SELECT id, username FROM users WHERE username = ? AND password = ?", (username, password)).fetchone()
-                if result:
-                    self.user_id = result[0]
-                    self.username = result[1]
-                    QMessageBox.information(self, "Успех", f"Добро пожаловать, {username}!")
-                    self.main_menu()
-                else:
-                    QMessageBox.warning(self, "Ошибка", "Неверное имя пользователя или пароль.")
-        except sqlite3.Error as e:
-            QMessageBox.critical(self, "База данных", f"Ошибка при проверке учетных данных: {e}")
+        if self.auth_pending or not self.storage_ready():
+            return
+        self.auth_pending = True
+        self.tasks.submit(self.storage.check_credentials, username, password,
+                          on_done=self.on_credentials_checked, on_error=self.on_credentials_failed)
+
+    def on_credentials_checked(self, user):
+        """
+        При успешной авторизации сохраняет данные о пользователе и возвращается в главное меню
+        """
+        self.auth_pending = False
+        if user:
+            self.user_id = user.id
+            self.username = user.username
+            QMessageBox.information(self, "Успех", f"Добро пожаловать, {user.username}!")
+            self.main_menu()
+        else:
+            QMessageBox.warning(self, "Ошибка", "Неверное имя пользователя или пароль.")
+
+    def on_credentials_failed(self, error):
+        self.auth_pending = False
+        title = "База данных" if isinstance(error, sqlite3.Error) else "Ошибка"
+        QMessageBox.critical(self, title, f"Ошибка при проверке учетных данных: {error}")
 
     def start_game(self, mode):
         """
@@ -310,70 +549,380 @@ class TicTacToeApp(QMainWindow):
         if not self.username:
             QMessageBox.warning(self, "Ошибка", "Сначала авторизуйтесь или зарегистрируйтесь, прежде чем играть.")
             return
-        self.game_window = TicTacToe(self, mode, self.username, self.user_id, self.ai_difficulty)
-        self.setCentralWidget(self.game_window)
+        key = (self.board_size, self.win_length)
+        game = self.game_views.get(key)
+        if game is None:
+            game = self.game_views[key] = TicTacToe(self, mode, self.username, self.user_id,
+                                                    self.ai_difficulty, self.board_size, self.win_length)
+        else:
+            game.restart(mode, self.username, self.user_id, self.ai_difficulty)
+        self.show_game(game)
 
     def show_leaderboard(self):
         """
-        Отображает таблицу лидеров, получая данные о победах и поражениях из базы данных
+        Отображает таблицу лидеров с выбором режима и сложности;
+        строки подгружаются страницами по мере прокрутки
+        """
+        if not self.storage_ready():
+            return
+        self.after_flush(self.open_leaderboard)
+
+    def open_leaderboard(self):
+        self.show_screen("leaderboard", self.build_leaderboard_screen)
+        self.select_ranking(self.ranking_combo.currentIndex())
+
+    def after_flush(self, open_screen):
+        """
+        Записывает буфер партий в пуле потоков и затем открывает экран,
+        чтобы только что завершенные партии уже были в таблицах
         """
-        self.central_widget = QWidget()
-        self.setCentralWidget(self.central_widget)
+        self.tasks.submit(self.results.flush, on_done=lambda _: open_screen(), on_error=self.on_flush_failed)
+
+    def on_flush_failed(self, error):
+        title = "База данных" if isinstance(error, sqlite3.Error) else "Ошибка"
+        QMessageBox.critical(self, title, f"Ошибка при сохранении статистики: {error}")
+
+    def build_leaderboard_screen(self):
+        screen = QWidget()
         layout = QVBoxLayout()
 
         title = QLabel("Таблица лидеров")
         title.setAlignment(Qt.AlignmentFlag.AlignCenter)
         title.setStyleSheet("font-size: 24px; font-weight: bold; margin-bottom: 20px;")
 
-        leaderboard_table = QTableWidget()
-        leaderboard_table.setColumnCount(3)
-        leaderboard_table.setHorizontalHeaderLabels(["Имя пользователя", "Победы", "Поражения"])
-        leaderboard_table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
-        leaderboard_table.setSelectionMode(QTableWidget.SelectionMode.NoSelection)
-        leaderboard_table.horizontalHeader().setStretchLastSection(True)
-        leaderboard_table.verticalHeader().setVisible(False)
+        self.ranking_combo = QComboBox()
+        self.ranking_combo.addItems([name for name, _, _ in LEADERBOARDS])
+        self.ranking_combo.setStyleSheet("font-size: 14px; padding: 5px;")
+
+        self.leaderboard_table = QTableView()
+        self.leaderboard_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.leaderboard_table.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.leaderboard_table.horizontalHeader().setStretchLastSection(True)
+        self.leaderboard_table.verticalHeader().setVisible(False)
+        self.ranking_combo.currentIndexChanged.connect(self.select_ranking)
+
+        back_button = QPushButton("Назад")
+        back_button.setStyleSheet("font-size: 18px; padding: 10px;")
+        back_button.clicked.connect(self.main_menu)
+
+        layout.addWidget(title)
+        layout.addWidget(self.ranking_combo)
+        layout.addWidget(self.leaderboard_table)
+        layout.addWidget(back_button)
+        layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        screen.setLayout(layout)
+        return screen
+
+    def select_ranking(self, index):
+        """
+        Показывает в таблице лидеров рейтинг Эло или итоги выбранного режима и сложности
+        """
+        _, mode, difficulty = LEADERBOARDS[index]
+        previous = self.leaderboard_table.model()
+        if mode == "rating":
+            model = PagedTableModel(self.fetch_rating_page, RATING_HEADERS, lambda row: (row.rating, row.id),
+                                    self.rating_row, parent=self.leaderboard_table)
+        else:
+            fetch_page = lambda after, limit: self.fetch_leaderboard_page(mode, difficulty, after, limit)
+            model = LeaderboardModel(fetch_page, parent=self.leaderboard_table, headers=RANKING_HEADERS)
+        self.leaderboard_table.setModel(model)
+        if previous is not None:
+            previous.deleteLater()
 
+    def fetch_leaderboard_page(self, mode, difficulty, after, limit):
+        """
+        Загружает страницу рейтинга одним индексированным запросом к готовым итогам
+        """
         try:
-            with self.conn:
-                stats_data = self.conn.execute("SELECT user_id, wins, losses FROM stats ORDER BY wins DESC").fetchall()
+            return self.storage.ranking_page(mode, difficulty, after, limit)
         except sqlite3.Error as e:
             QMessageBox.critical(self, "База данных", f"Ошибка при получении данных таблицы лидеров: {e}")
-            stats_data = []
+            return []
+
+    @staticmethod
+    def rating_row(row):
+        """
+        Значения столбцов рейтинга Эло для одного игрока (RatingRow); уровни ИИ — отдельные игроки
+        """
+        name = row.username if row.bot is None else f"ИИ ({DIFFICULTY_NAMES.get(row.bot, row.bot)})"
+        return name, round(row.rating), row.games
 
-        leaderboard = []
+    def fetch_rating_page(self, after, limit):
+        """
+        Загружает страницу рейтинга Эло по индексу; рейтинги обновляются при записи каждой партии
+        """
         try:
-            with self.conn2:
-                for row in stats_data:
-                    user_id, wins, losses = row
-                    user_row = self.conn2.execute("SELECT username FROM users WHERE id = ?", (user_id,)).fetchone()
-                    if user_row:
-                        username = user_row[0]
-                        leaderboard.append((username, wins, losses))
+            return self.storage.rating_page(after, limit)
         except sqlite3.Error as e:
-            QMessageBox.critical(self, "База данных", f"Ошибка при получении данных пользователей: {e}")
+            QMessageBox.critical(self, "База данных", f"Ошибка при получении рейтинга: {e}")
+            return []
+
+    def show_profile(self):
+        """
+        Отображает статистику текущего пользователя по режимам и уровням сложности
+        """
+        if not self.username:
+            QMessageBox.warning(self, "Ошибка", "Сначала авторизуйтесь или зарегистрируйтесь.")
+            return
+        self.after_flush(self.open_profile)
+
+    def open_profile(self):
+        try:
+            totals = {(row.mode, row.difficulty): row for row in self.storage.user_stats(self.user_id)}
+            rating, rated_games = self.storage.user_rating(self.user_id)
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "База данных", f"Ошибка при получении статистики: {e}")
+            return
+
+        self.show_screen("profile", self.build_profile_screen)
+        self.profile_title.setText(f"Профиль: {self.username}")
+        self.profile_rating.setText(f"Рейтинг Эло: {round(rating)}, партий: {rated_games}")
+        for key, labels in self.profile_cells.items():
+            stats = totals.get(key)
+            values = (stats.wins, stats.draws, stats.losses) if stats else (0, 0, 0)
+            for label, value in zip(labels, values):
+                label.setText(str(value))
+
+    def build_profile_screen(self):
+        screen = QWidget()
+        layout = QVBoxLayout()
 
-        leaderboard_table.setRowCount(len(leaderboard))
-        for i, (username, wins, losses) in enumerate(leaderboard):
-            leaderboard_table.setItem(i, 0, QTableWidgetItem(str(username)))
-            leaderboard_table.setItem(i, 1, QTableWidgetItem(str(wins)))
-            leaderboard_table.setItem(i, 2, QTableWidgetItem(str(losses)))
+        self.profile_title = QLabel()
+        self.profile_title.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.profile_title.setStyleSheet("font-size: 24px; font-weight: bold; margin-bottom: 20px;")
+
+        self.profile_rating = QLabel()
+        self.profile_rating.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.profile_rating.setStyleSheet("font-size: 18px; margin-bottom: 10px;")
+
+        grid = QGridLayout()
+        for column, header in enumerate(("Режим",) + RANKING_HEADERS[1:]):
+            label = QLabel(header)
+            label.setStyleSheet("font-size: 16px; font-weight: bold;")
+            grid.addWidget(label, 0, column)
+        self.profile_cells = {}
+        for row, (name, mode, difficulty) in enumerate(RANKINGS, start=1):
+            labels = []
+            for column, text in enumerate((name, 0, 0, 0)):
+                label = QLabel(str(text))
+                label.setStyleSheet("font-size: 16px;")
+                grid.addWidget(label, row, column)
+                labels.append(label)
+            self.profile_cells[(mode, difficulty)] = labels[1:]
 
         back_button = QPushButton("Назад")
         back_button.setStyleSheet("font-size: 18px; padding: 10px;")
         back_button.clicked.connect(self.main_menu)
 
-        layout.addWidget(title)
-        layout.addWidget(leaderboard_table)
+        layout.addWidget(self.profile_title)
+        layout.addWidget(self.profile_rating)
+        layout.addLayout(grid)
         layout.addWidget(back_button)
         layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.central_widget.setLayout(layout)
+        screen.setLayout(layout)
+        return screen
+
+    def show_history(self):
+        """
+        Отображает историю партий текущего пользователя от новых к старым;
+        строки подгружаются страницами по мере прокрутки, ходы читаются только при просмотре партии
+        """
+        if not self.username:
+            QMessageBox.warning(self, "Ошибка", "Сначала авторизуйтесь или зарегистрируйтесь.")
+            return
+        if not self.storage_ready():
+            return
+        self.after_flush(self.open_history)
+
+    def open_history(self):
+        self.show_screen("history", self.build_history_screen)
+        user_id = self.user_id
+        fetch_page = lambda after, limit: self.fetch_history_page(user_id, after, limit)
+        previous = self.history_table.model()
+        self.history_table.setModel(PagedTableModel(fetch_page, HISTORY_HEADERS, lambda row: row.id,
+                                                    self.history_row, parent=self.history_table))
+        if previous is not None:
+            previous.deleteLater()
+
+    def build_history_screen(self):
+        screen = QWidget()
+        layout = QVBoxLayout()
+
+        title = QLabel("История партий")
+        title.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        title.setStyleSheet("font-size: 24px; font-weight: bold; margin-bottom: 20px;")
+
+        self.history_table = QTableView()
+        self.history_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.history_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.history_table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.history_table.horizontalHeader().setStretchLastSection(True)
+        self.history_table.verticalHeader().setVisible(False)
+        self.history_table.doubleClicked.connect(self.open_replay)
+
+        watch_button = QPushButton("Просмотреть")
+        watch_button.setStyleSheet("font-size: 18px; padding: 10px;")
+        watch_button.clicked.connect(lambda: self.open_replay(self.history_table.currentIndex()))
+
+        back_button = QPushButton("Назад")
+        back_button.setStyleSheet("font-size: 18px; padding: 10px;")
+        back_button.clicked.connect(self.main_menu)
+
+        layout.addWidget(title)
+        layout.addWidget(self.history_table)
+        layout.addWidget(watch_button)
+        layout.addWidget(back_button)
+        screen.setLayout(layout)
+        return screen
+
+    @staticmethod
+    def history_row(game):
+        """
+        Значения столбцов истории для одной партии (GameSummary)
+        """
+        if game.mode == "friend":
+            mode = "С другом"
+        else:
+            mode = f"ИИ, {DIFFICULTY_NAMES.get(game.difficulty, game.difficulty)}"
+        return (
+            time.strftime("%d.%m.%Y %H:%M", time.localtime(game.finished_at)),
+            mode,
+            f"{game.board_size}×{game.board_size}",
+            RESULT_NAMES.get(game.result, game.result),
+            game.move_count,
+        )
+
+    def fetch_history_page(self, user_id, before, limit):
+        """
+        Загружает страницу истории одним запросом по индексу партий пользователя
+        """
+        try:
+            return self.storage.game_history_page(user_id, before, limit)
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "База данных", f"Ошибка при получении истории партий: {e}")
+            return []
+
+    def open_replay(self, index):
+        """
+        Загружает ходы выбранной партии и открывает ее пошаговый просмотр
+        """
+        if not index.isValid():
+            QMessageBox.warning(self, "Ошибка", "Выберите партию в списке.")
+            return
+        summary = self.history_table.model().rows[index.row()]
+        try:
+            game = self.storage.get_game(summary.id)
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "База данных", f"Ошибка при загрузке партии: {e}")
+            return
+        if game is None:
+            return
+        key = (game.board_size, game.win_length)
+        view = self.replay_views.get(key)
+        if view is None:
+            view = self.replay_views[key] = ReplayView(self, game.board_size, game.win_length)
+            self.stack.addWidget(view)
+        view.open(game)
+        self.stack.setCurrentWidget(view)
+
+    def back_to_history(self):
+        self.show_screen("history", self.build_history_screen)
+
+
+class TaskRunner(QObject):
+    """
+    Выполняет функции в пуле потоков и вызывает обработчики результата в потоке интерфейса
+    """
+    finished = pyqtSignal(object, object)
+
+    def __init__(self, executor, parent=None):
+        super().__init__(parent)
+        self.executor = executor
+        self.finished.connect(self._deliver)
+
+    def submit(self, func, *args, on_done=None, on_error=None):
+        """
+        Запускает func(*args) в фоне; on_done(результат) или on_error(исключение)
+        будут вызваны в потоке интерфейса. Ошибка задачи без on_error записывается в журнал
+        """
+        future = self.executor.submit(func, *args)
+        future.add_done_callback(lambda future: self.finished.emit(future, (on_done, on_error)))
+        return future
+
+    def _deliver(self, future, callbacks):
+        on_done, on_error = callbacks
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            if on_error is None:
+                log.error("Ошибка фоновой задачи", exc_info=error)
+                return
+            on_error(error)
+        elif on_done is not None:
+            on_done(future.result())
+
+
+class AiWorker(QObject):
+    """
+    Выполняет расчет хода ИИ в фоновом потоке и возвращает результат через сигнал Qt
+    Каждый запрос получает номер поколения: результаты отмененных запросов отбрасываются
+    """
+    move_ready = pyqtSignal(int, object)
+    move_failed = pyqtSignal(int, str)
+
+    def __init__(self, executor, parent=None):
+        super().__init__(parent)
+        self.executor = executor
+        self.generation = 0
+        self.future = None
+        self.stop = None
+
+    def request(self, func, board, player):
+        """
+        Отменяет предыдущий запрос и ставит в очередь расчет func(board, player, stop)
+        Возвращает номер поколения нового запроса
+        """
+        self.cancel()
+        generation = self.generation
+        self.stop = threading.Event()
+        self.future = self.executor.submit(func, board, player, self.stop)
+        self.future.add_done_callback(lambda future: self._finished(generation, future))
+        return generation
+
+    def cancel(self):
+        """
+        Отменяет ожидающий или выполняющийся запрос
+        """
+        self.generation += 1
+        if self.stop is not None:
+            self.stop.set()
+        if self.future is not None:
+            self.future.cancel()
+        self.future = None
+        self.stop = None
+
+    def is_current(self, generation):
+        return generation == self.generation
+
+    def _finished(self, generation, future):
+        if future.cancelled() or generation != self.generation:
+            return
+        error = future.exception()
+        if isinstance(error, SearchCancelled):
+            return
+        if error is not None:
+            self.move_failed.emit(generation, str(error))
+        else:
+            self.move_ready.emit(generation, future.result())
 
 
 class TicTacToe(QWidget):
-    def __init__(self, parent, mode, username, user_id, ai_difficulty):
+    def __init__(self, parent, mode, username, user_id, ai_difficulty, board_size=3, win_length=3):
         """
         Инициализирует игровое поле, задает текущего игрока, созжает кнопки для поля,
-        определяет режим игры
+        определяет режим игры. Размер кнопок подбирается под размер поля
+        Поле создается один раз для каждого размера и переиспользуется через restart
         """
         super().__init__()
         self.parent = parent
@@ -381,52 +930,166 @@ class TicTacToe(QWidget):
         self.username = username
         self.user_id = user_id
         self.ai_difficulty = ai_difficulty
+        self.board_size = board_size
+        self.win_length = win_length
         self.current_player = "X"
-        self.board = [["" for _ in range(3)] for _ in range(3)]
+        self.board = Board(board_size, win_length)
+        self.started_at = time.time()
 
         self.layout = QGridLayout()
         self.setLayout(self.layout)
 
-        self.buttons = [[None for _ in range(3)] for _ in range(3)]
-        for row in range(3):
-            for col in range(3):
-                button = QPushButton("")
-                button.setFixedSize(100, 100)
-                button.setStyleSheet("font-size: 24px;")
-                button.clicked.connect(lambda x, r=row, c=col: self.make_move(r, c))
-                self.layout.addWidget(button, row, col)
-                self.buttons[row][col] = button
+        spacing = 6 if board_size <= 3 else 2
+        self.layout.setSpacing(spacing)
+        cell_size = min(100, (360 - spacing * (board_size - 1)) // board_size)
+        font_size = max(10, cell_size * 24 // 100)
+        self.setStyleSheet(
+            f"QPushButton#cell {{ font-size: {font_size}px; }}"
+            f" QPushButton#cell[hint=\"win\"] {{ font-size: {max(8, font_size // 2)}px; color: rgb(0, 140, 0); }}"
+            f" QPushButton#cell[hint=\"draw\"] {{ font-size: {max(8, font_size // 2)}px; color: rgb(110, 110, 110); }}"
+            f" QPushButton#cell[hint=\"loss\"] {{ font-size: {max(8, font_size // 2)}px; color: rgb(200, 0, 0); }}"
+            " QPushButton#back, QPushButton#hint { font-size: 18px; padding: 10px; }"
+            " QLabel#status { font-size: 16px; }"
+        )
+
+        self.cells = []
+        self.shown = [("", None)] * (board_size * board_size)
+        self.hints = {}
+        self.cell_group = QButtonGroup(self)
+        self.cell_group.idClicked.connect(self.on_cell_clicked)
+        for index in range(board_size * board_size):
+            button = QPushButton("")
+            button.setObjectName("cell")
+            button.setFixedSize(cell_size, cell_size)
+            self.cell_group.addButton(button, index)
+            self.layout.addWidget(button, *self.board.coords(index))
+            self.cells.append(button)
 
         back_button = QPushButton("Назад")
-        back_button.setStyleSheet("font-size: 18px; padding: 10px;")
-        back_button.clicked.connect(self.parent.main_menu)
-        self.layout.addWidget(back_button, 3, 0, 1, 3)
+        back_button.setObjectName("back")
+        back_button.clicked.connect(self.leave_game)
+        self.hint_button = QPushButton("Подсказка")
+        self.hint_button.setObjectName("hint")
+        self.hint_button.setCheckable(True)
+        self.hint_button.setToolTip("Точная оценка каждого хода: на поле 3×3 всегда, "
+                                    f"на больших полях — когда свободных клеток не больше {analysis.ENDGAME_CELLS}")
+        self.hint_button.toggled.connect(self.render)
+        controls = QHBoxLayout()
+        controls.addWidget(back_button)
+        controls.addWidget(self.hint_button)
+        self.layout.addLayout(controls, board_size, 0, 1, board_size)
+
+        self.ai_thinking = False
+        self.ai_worker = AiWorker(self.parent.ai_executor, self)
+        self.ai_worker.move_ready.connect(self.on_ai_move)
+        self.ai_worker.move_failed.connect(self.on_ai_failed)
 
         if self.mode == "ai_first":
             self.current_player = "O"
             self.ai_move()
 
+    def restart(self, mode, username, user_id, ai_difficulty):
+        """
+        Начинает на этом же поле новую партию с другими настройками
+        """
+        self.mode = mode
+        self.username = username
+        self.user_id = user_id
+        self.ai_difficulty = ai_difficulty
+        self.reset_game()
+
+    def on_cell_clicked(self, index):
+        self.make_move(*self.board.coords(index))
+
+    def render(self):
+        """
+        Приводит кнопки в соответствие с позицией и запрашивает подсказку, если она включена
+        """
+        self.request_hints()
+        self.paint_cells()
+
+    def paint_cells(self):
+        """
+        Меняет текст и оформление только у клеток, которые изменились с прошлой отрисовки
+        В свободных клетках при включенной подсказке показывается оценка хода:
+        "+n" — победа через n полуходов, "-n" — поражение, "=" — ничья
+        """
+        for index, button in enumerate(self.cells):
+            symbol = self.board.get(index)
+            move = None if symbol else self.hints.get(index)
+            state = (symbol, move)
+            if self.shown[index] == state:
+                continue
+            self.shown[index] = state
+            if move is None:
+                button.setText(symbol)
+                button.setToolTip("")
+                outcome = None
+            else:
+                outcome = move.outcome
+                if outcome == analysis.WIN:
+                    button.setText(f"+{move.plies}")
+                    button.setToolTip(f"Победа через {move.plies} полуходов")
+                elif outcome == analysis.LOSS:
+                    button.setText(f"-{move.plies}")
+                    button.setToolTip(f"Поражение через {move.plies} полуходов")
+                else:
+                    button.setText("=")
+                    button.setToolTip("Ничья")
+            if button.property("hint") != outcome:
+                button.setProperty("hint", outcome)
+                button.style().unpolish(button)
+                button.style().polish(button)
+
+    def player_to_move(self):
+        first = "O" if self.mode == "ai_first" else "X"
+        return first if len(self.board.history) % 2 == 0 else opponent(first)
+
+    def request_hints(self):
+        """
+        Сбрасывает подсказку и, если она включена и сейчас ход человека, запускает
+        точный анализ позиции в фоновом потоке; повторные позиции берутся из кэша анализа
+        """
+        self.hints = {}
+        if not self.hint_button.isChecked() or self.board.is_terminal():
+            return
+        player = self.player_to_move()
+        if self.mode.startswith("ai") and player == "O":
+            return
+        if not analysis.can_analyze(self.board):
+            return
+        position = tuple(self.board.history)
+        self.parent.tasks.submit(analysis.analyze, self.board.copy(), player,
+                                 on_done=lambda result: self.show_hints(position, result))
+
+    def show_hints(self, position, result):
+        if position != tuple(self.board.history) or not self.hint_button.isChecked():
+            return
+        self.hints = {move.cell: move for move in result.moves}
+        self.paint_cells()
+
     def make_move(self, row, col):
         """
         Обрабатывает ход текущего игрока, обновляет поле, проверяет победу или ничью
         Если игра продолжается и следующий ход ИИ, делает ход ИИ
+        Пока ИИ думает, поле не принимает ходы
         """
-        if self.board[row][col] == "":
-            self.board[row][col] = self.current_player
-            self.buttons[row][col].setText(self.current_player)
+        if self.ai_thinking:
+            return
+        index = self.board.index(row, col)
+        if self.board.is_empty(index):
+            self.board.play(index, self.current_player)
+            self.render()
 
             if self.check_winner(self.current_player):
                 if self.current_player == "X":
-                    QMessageBox.information(self, "Игра завершена", f"Игрок {self.current_player} победил!")
+                    self.end_game(f"Игрок {self.current_player} победил!", self.current_player)
                 else:
-                    QMessageBox.information(self, "Игра завершена", f"ИИ ({self.current_player}) победил!")
-                self.update_leaderboard(self.current_player)
-                self.reset_game()
+                    self.end_game(f"ИИ ({self.current_player}) победил!", self.current_player)
                 return
 
             if self.check_draw():
-                QMessageBox.information(self, "Игра завершена", "Ничья!")
-                self.reset_game()
+                self.end_game("Ничья!", None)
                 return
 
             self.current_player = "O" if self.current_player == "X" else "X"
@@ -436,205 +1099,162 @@ class TicTacToe(QWidget):
 
     def ai_move(self):
         """
-        Определяет ход ИИ в зависимости от выбранной сложности
+        Запускает расчет хода ИИ в фоновом потоке в зависимости от выбранной сложности
+        Поле блокируется до получения результата
         """
         if self.ai_difficulty == 'easy':
-            self.ai_move_easy()
+            policy = self.ai_move_easy
         elif self.ai_difficulty == 'medium':
-            self.ai_move_medium()
-        elif self.ai_difficulty == 'hard':
-            self.ai_move_hard()
+            policy = self.ai_move_medium
+        elif self.ai_difficulty == 'mcts':
+            policy = self.ai_move_mcts
+        elif self.ai_difficulty == 'learned':
+            policy = self.ai_move_learned
+        else:
+            policy = self.ai_move_hard
+        self.ai_thinking = True
+        self.ai_worker.request(policy, self.board.copy(), "O")
 
-    def ai_move_easy(self):
+    @staticmethod
+    @metrics.timed("ai_move_seconds")
+    def ai_move_easy(board, player, stop):
         """
         Ход ИИ на легком уровне — выбирает случайную пустую клетку
         """
-        empty_cells = [(r, c) for r in range(3) for c in range(3) if self.board[r][c] == ""]
-        if empty_cells:
-            row, col = random.choice(empty_cells)
-            self.board[row][col] = "O"
-            self.buttons[row][col].setText("O")
-            if self.check_winner("O"):
-                QMessageBox.information(self, "Игра завершена", "ИИ победил!")
-                self.update_leaderboard("O")
-                self.reset_game()
-                return
-            if self.check_draw():
-                QMessageBox.information(self, "Игра завершена", "Ничья!")
-                self.reset_game()
-                return
-            self.current_player = "X"
+        return engine.random_move(board)
 
-    def ai_move_medium(self):
+    @staticmethod
+    @metrics.timed("ai_move_seconds")
+    def ai_move_medium(board, player, stop):
         """
         Ход ИИ на среднем уровне — пытается выиграть или помешать игроку выиграть
         Если нет очевидного хода, выбирает случайную пустую клетку
         """
-        for player in ["O", "X"]:
-            for row in range(3):
-                for col in range(3):
-                    if self.board[row][col] == "":
-                        self.board[row][col] = player
-                        if self.check_winner(player):
-                            if player == "O":
-                                self.buttons[row][col].setText("O")
-                                QMessageBox.information(self, "Игра завершена", "ИИ победил!")
-                                self.update_leaderboard("O")
-                                self.reset_game()
-                                return
-                            else:
-                                self.board[row][col] = "O"
-                                self.buttons[row][col].setText("O")
-                                if self.check_winner("O"):
-                                    QMessageBox.information(self, "Игра завершена", "ИИ победил!")
-                                    self.update_leaderboard("O")
-                                    self.reset_game()
-                                    return
-                                if self.check_draw():
-                                    QMessageBox.information(self, "Игра завершена", "Ничья!")
-                                    self.reset_game()
-                                    return
-                                self.current_player = "X"
-                                return
-                        self.board[row][col] = ""
-
-        empty_cells = [(r, c) for r in range(3) for c in range(3) if self.board[r][c] == ""]
-        if empty_cells:
-            row, col = random.choice(empty_cells)
-            self.board[row][col] = "O"
-            self.buttons[row][col].setText("O")
-            if self.check_winner("O"):
-                QMessageBox.information(self, "Игра завершена", "ИИ победил!")
-                self.update_leaderboard("O")
-                self.reset_game()
-                return
-            if self.check_draw():
-                QMessageBox.information(self, "Игра завершена", "Ничья!")
-                self.reset_game()
-                return
-            self.current_player = "X"
+        return engine.medium_move(board, player)
 
-    def ai_move_hard(self):
+    @staticmethod
+    @metrics.timed("ai_move_seconds")
+    def ai_move_hard(board, player, stop):
         """
-        Ход ИИ на сложном уровне — использует алгоритм минимакс для выбора оптимального хода
+        Ход ИИ на сложном уровне — на поле 3x3 берет оптимальный ход из таблицы идеальной игры,
+        на больших полях ищет ход эвристическим поиском с ограничением по времени
         """
-        best_score = -float('inf')
-        best_move = None
-        if self.board == [["", "", ""],
-                          ["", "", ""],
-                          ["", "", ""]]:
-            best_move = (1, 1)
-        else:
-            for r in range(3):
-                for c in range(3):
-                    if self.board[r][c] == "":
-                        self.board[r][c] = "O"
-                        score = self.get_best_move(False, 0)
-                        self.board[r][c] = ""
-                        if score > best_score:
-                            best_score = score
-                            best_move = (r, c)
-
-        if best_move is not None:
-            r, c = best_move
-            self.board[r][c] = "O"
-            self.buttons[r][c].setText("O")
-
-            if self.check_winner("O"):
-                QMessageBox.information(self, "Игра завершена", "ИИ победил!")
-                self.update_leaderboard("O")
-                self.reset_game()
-                return
+        return hard_move(board, player, stop)
 
-            if self.check_draw():
-                QMessageBox.information(self, "Игра завершена", "Ничья!")
-                self.reset_game()
-                return
+    @staticmethod
+    @metrics.timed("ai_move_seconds")
+    def ai_move_mcts(board, player, stop):
+        """
+        Ход ИИ уровня "Монте-Карло" — поиск по дереву со случайными доигровками,
+        распределенными по всем ядрам процессора, с ограничением по времени
+        """
+        return mcts_move(board, player, stop)
 
-            self.current_player = "X"
+    @staticmethod
+    @metrics.timed("ai_move_seconds")
+    def ai_move_learned(board, player, stop):
+        """
+        Ход обученного ИИ — лучший ход по таблице оценок, полученной партиями против самого себя
+        Таблица загружается при первом ходе; на больших полях ИИ играет как средний уровень
+        """
+        return learned_move(board, player)
+
+    def on_ai_move(self, generation, index):
+        """
+        Получает рассчитанный ход ИИ из фонового потока и применяет его,
+        если запрос не был отменен
+        """
+        if not self.ai_worker.is_current(generation):
+            return
+        self.ai_thinking = False
+        self.apply_ai_move(index)
 
-    def get_best_move(self, is_maximizing, depth):
+    def on_ai_failed(self, generation, message):
         """
-        Рекурсивный метод для оценки хода на сложном уровн
+        Сообщает об ошибке при расчете хода ИИ и разблокирует поле
         """
+        if not self.ai_worker.is_current(generation):
+            return
+        self.ai_thinking = False
+        QMessageBox.critical(self, "ИИ", f"Ошибка при расчете хода ИИ: {message}")
+
+    def leave_game(self):
+        """
+        Отменяет расчет хода ИИ и возвращается в главное меню
+        """
+        self.ai_worker.cancel()
+        self.ai_thinking = False
+        self.parent.main_menu()
+
+    def apply_ai_move(self, index):
+        """
+        Ставит "O" в выбранную ИИ клетку, проверяет победу или ничью и передает ход игроку
+        """
+        if index is None:
+            return
+        self.board.play(index, "O")
+        self.render()
+
         if self.check_winner("O"):
-            return 10 - depth
-        if self.check_winner("X"):
-            return -10 + depth
+            self.end_game("ИИ победил!", "O")
+            return
+
         if self.check_draw():
-            return 0
-
-        if is_maximizing:
-            best_score = -float('inf')
-            for r in range(3):
-                for c in range(3):
-                    if self.board[r][c] == "":
-                        self.board[r][c] = "O"
-                        score = self.get_best_move(False, depth + 1)
-                        self.board[r][c] = ""
-                        best_score = max(best_score, score)
-            return best_score
-        else:
-            best_score = float('inf')
-            for r in range(3):
-                for c in range(3):
-                    if self.board[r][c] == "":
-                        self.board[r][c] = "X"
-                        score = self.get_best_move(True, depth + 1)
-                        self.board[r][c] = ""
-                        best_score = min(best_score, score)
-            return best_score
+            self.end_game("Ничья!", None)
+            return
+
+        self.current_player = "X"
 
     def check_winner(self, player):
         """
         Проверяет, достиг ли игрок победы
         Возвращает True, если есть победа, иначе False
         """
-        for i in range(3):
-            if all(self.board[i][j] == player for j in range(3)) or \
-               all(self.board[j][i] == player for j in range(3)):
-                return True
-        if all(self.board[i][i] == player for i in range(3)) or \
-           all(self.board[i][2 - i] == player for i in range(3)):
-            return True
-        return False
+        return self.board.check_winner(player)
 
     def check_draw(self):
         """
         Проверяет, остались ли пустые клетки
         Если пустых клеток нет и нет победителя, возвращает True, иначе False
         """
-        return all(self.board[row][col] != "" for row in range(3) for col in range(3))
+        return self.board.check_draw()
 
-    def update_leaderboard(self, winner):
+    def end_game(self, message, winner):
         """
-        Обновляет статистику побед и поражений в таблице лидеров для текущего пользователя
+        Завершает партию: показывает итог, сохраняет запись партии (итоги и рейтинг
+        обновляются при ее записи), затем начинает новую партию. winner — "X", "O" или None при ничьей
         """
-        try:
-            with self.parent.conn:
-                stats = self.parent.conn.execute("SELECT wins, losses FROM stats WHERE user_id = ?", (self.user_id,)).fetchone()
-                if not stats:
-                    self.parent.conn.execute("INSERT INTO stats (user_id, wins, losses) VALUES (?, 0, 0)", (self.user_id,))
-                    stats = (0, 0)
-                wins, losses = stats
-
-                if self.mode.startswith("ai") and self.ai_difficulty == 'hard':
-                    if winner == "X":
-                        wins += 1
-                    elif winner == "O":
-                        losses += 1
-                    self.parent.conn.execute("UPDATE stats SET wins = ?, losses = ? WHERE user_id = ?", (wins, losses, self.user_id))
-        except sqlite3.Error as e:
-            QMessageBox.critical(self.parent, "База данных", f"Ошибка при обновлении статистики: {e}")
+        QMessageBox.information(self, "Игра завершена", message)
+        self.record_game(winner)
+        self.reset_game()
+
+    def record_game(self, winner):
+        """
+        Передает запись завершенной партии в буфер отложенной записи
+        """
+        self.parent.results.add_game(GameRecord(
+            id=None,
+            user_id=self.user_id,
+            mode=self.mode,
+            difficulty=self.ai_difficulty if self.mode.startswith("ai") else None,
+            board_size=self.board_size,
+            win_length=self.win_length,
+            first_player="O" if self.mode == "ai_first" else "X",
+            result=winner or DRAW,
+            started_at=self.started_at,
+            finished_at=time.time(),
+            moves=list(self.board.history),
+        ))
 
     def reset_game(self):
         """
         Сбрасывает состояние игры, очщает поле. Если ИИ должен ходить первым, делает первый ход
         """
-        self.board = [["" for _ in range(3)] for _ in range(3)]
-        for row in range(3):
-            for col in range(3):
-                self.buttons[row][col].setText("")
+        self.ai_worker.cancel()
+        self.ai_thinking = False
+        self.board = Board(self.board_size, self.win_length)
+        self.started_at = time.time()
+        self.render()
 
         if self.mode == "ai_first":
             self.current_player = "O"
@@ -643,8 +1263,300 @@ class TicTacToe(QWidget):
             self.current_player = "X"
 
 
+class NetworkGame(TicTacToe):
+    """
+    Сетевая партия: ходы проверяет сервер, поле отображает только подтвержденные им ходы
+    Результаты сетевых партий в локальную статистику не записываются
+    """
+
+    def __init__(self, parent, client, username, board_size, win_length):
+        super().__init__(parent, "online", username, None, None, board_size, win_length)
+        self.client = client
+        self.client.setParent(self)
+        self.hint_button.hide()
+        self.symbol = None
+        self.current_player = None
+
+        self.status_label = QLabel("Подключение к серверу...")
+        self.status_label.setObjectName("status")
+        self.status_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.layout.addWidget(self.status_label, board_size + 1, 0, 1, board_size)
+
+        self.client.message_received.connect(self.on_message)
+        self.client.connection_lost.connect(self.on_connection_lost)
+        self.client.connect_to_server()
+        self.client.find_match(username, board_size, win_length)
+
+    def make_move(self, row, col):
+        """
+        Отправляет ход на сервер, если сейчас ход игрока; поле обновится после подтверждения
+        """
+        index = self.board.index(row, col)
+        if self.symbol is None or self.current_player != self.symbol or not self.board.is_empty(index):
+            return
+        self.current_player = None
+        self.client.play(index)
+
+    def on_message(self, message):
+        """
+        Обрабатывает сообщения сервера
+        """
+        kind = message["type"]
+        if kind == "waiting":
+            self.status_label.setText("Ожидание соперника...")
+        elif kind in ("start", "resume"):
+            self.symbol = message["symbol"]
+            self.board = Board(self.board_size, self.win_length)
+            player = "X"
+            for index in message["moves"]:
+                self.board.play(index, player)
+                player = "O" if player == "X" else "X"
+            self.render()
+            self.current_player = message["turn"]
+            self.show_turn(f"Соперник: {message['opponent']}. Вы играете за {self.symbol}.")
+        elif kind == "move":
+            self.board.play(message["cell"], message["player"])
+            self.render()
+            self.current_player = message["turn"]
+            self.show_turn()
+        elif kind == "end":
+            self.finish(message["winner"], message["reason"])
+        elif kind == "opponent_disconnected":
+            self.status_label.setText("Соперник отключился, ожидаем переподключения...")
+        elif kind == "opponent_returned":
+            self.show_turn("Соперник вернулся.")
+        elif kind == "error":
+            if self.symbol is not None and self.current_player is None and not self.board.is_terminal():
+                self.current_player = self.symbol
+            self.status_label.setText(message["message"])
+
+    def show_turn(self, prefix=""):
+        turn = "Ваш ход" if self.current_player == self.symbol else "Ход соперника"
+        self.status_label.setText(f"{prefix} {turn}".strip())
+
+    def finish(self, winner, reason):
+        """
+        Показывает итог партии и снова встает в очередь подбора соперника
+        """
+        if winner is None:
+            message = "Ничья!"
+        elif winner == self.symbol:
+            message = "Вы победили!" if reason == "line" else "Вы победили: соперник покинул партию."
+        else:
+            message = "Соперник победил!" if reason == "line" else "Поражение: вы покинули партию."
+        QMessageBox.information(self, "Игра завершена", message)
+        self.symbol = None
+        self.current_player = None
+        self.board = Board(self.board_size, self.win_length)
+        self.render()
+        self.client.find_match(self.username, self.board_size, self.win_length)
+
+    def on_connection_lost(self, message):
+        QMessageBox.warning(self, "Сеть", message)
+        self.leave_game()
+
+    def leave_game(self):
+        """
+        Сдает партию или покидает очередь и возвращается в главное меню
+        """
+        self.client.leave()
+        self.client.close()
+        self.parent.main_menu()
+
+
+class ReplayView(QWidget):
+    """
+    Просмотр записанной партии: ходы показываются по одному вперед и назад,
+    автовоспроизведение идет по таймеру Qt без блокировки интерфейса
+    Виджет создается один раз для каждого размера поля и переиспользуется через open
+    """
+
+    def __init__(self, parent, board_size, win_length):
+        super().__init__()
+        self.parent = parent
+        self.replay = None
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+
+        spacing = 6 if board_size <= 3 else 2
+        cell_size = min(90, (340 - spacing * (board_size - 1)) // board_size)
+        font_size = max(10, cell_size * 24 // 100)
+        self.setStyleSheet(
+            f"QLabel#cell {{ font-size: {font_size}px; background: white; border: 1px solid rgb(160, 160, 160); }}"
+            " QLabel#cell[last=\"true\"] { background: rgb(255, 240, 180); }"
+            " QLabel#title, QLabel#status { font-size: 16px; }"
+            " QPushButton { font-size: 18px; padding: 8px; }"
+        )
+
+        self.title_label = QLabel()
+        self.title_label.setObjectName("title")
+        self.title_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+
+        grid = QGridLayout()
+        grid.setSpacing(spacing)
+        self.cells = []
+        for index in range(board_size * board_size):
+            cell = QLabel("")
+            cell.setObjectName("cell")
+            cell.setFixedSize(cell_size, cell_size)
+            cell.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            grid.addWidget(cell, *divmod(index, board_size))
+            self.cells.append(cell)
+        self.last_cell = None
+
+        self.status_label = QLabel()
+        self.status_label.setObjectName("status")
+        self.status_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+
+        controls = QHBoxLayout()
+        for text, handler in (("«", self.to_start), ("◀", self.step_back), ("▶", self.step_forward),
+                              ("»", self.to_end)):
+            button = QPushButton(text)
+            button.clicked.connect(handler)
+            controls.addWidget(button)
+        self.autoplay_button = QPushButton("Авто")
+        self.autoplay_button.setCheckable(True)
+        self.autoplay_button.toggled.connect(self.set_autoplay)
+        controls.addWidget(self.autoplay_button)
+
+        back_button = QPushButton("Назад")
+        back_button.clicked.connect(self.leave)
+
+        self.timer = QTimer(self)
+        self.timer.setInterval(AUTOPLAY_INTERVAL_MS)
+        self.timer.timeout.connect(self.autoplay_step)
+
+        layout.addWidget(self.title_label)
+        layout.addLayout(grid)
+        layout.addWidget(self.status_label)
+        layout.addLayout(controls)
+        layout.addWidget(back_button)
+        layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
+
+    def open(self, game):
+        """
+        Начинает просмотр партии game (GameRecord) с пустого поля
+        """
+        self.autoplay_button.setChecked(False)
+        if self.replay is not None:
+            self.to_start()
+        self.replay = Replay(game)
+        date = time.strftime("%d.%m.%Y %H:%M", time.localtime(game.finished_at))
+        self.title_label.setText(f"{date}: {RESULT_NAMES.get(game.result, game.result)}")
+        self.show_position()
+
+    def mark_last(self, index):
+        """
+        Подсвечивает клетку последнего показанного хода
+        """
+        for cell, last in ((self.last_cell, False), (index, True)):
+            if cell is None:
+                continue
+            label = self.cells[cell]
+            label.setProperty("last", last)
+            label.style().unpolish(label)
+            label.style().polish(label)
+        self.last_cell = index
+
+    def show_position(self):
+        history = self.replay.board.history
+        self.mark_last(history[-1] if history else None)
+        self.status_label.setText(f"Ход {self.replay.position} из {self.replay.length}")
+
+    def advance(self):
+        move = self.replay.step_forward()
+        if move is None:
+            return False
+        index, player = move
+        self.cells[index].setText(player)
+        return True
+
+    def retreat(self):
+        index = self.replay.step_back()
+        if index is None:
+            return False
+        self.cells[index].setText("")
+        return True
+
+    def step_forward(self):
+        """
+        Показывает следующий ход; возвращает False, если партия уже показана до конца
+        """
+        moved = self.advance()
+        self.show_position()
+        return moved
+
+    def step_back(self):
+        moved = self.retreat()
+        self.show_position()
+        return moved
+
+    def to_start(self):
+        while self.retreat():
+            pass
+        self.show_position()
+
+    def to_end(self):
+        while self.advance():
+            pass
+        self.show_position()
+
+    def set_autoplay(self, enabled):
+        if not enabled:
+            self.timer.stop()
+            return
+        if self.replay.position >= self.replay.length:
+            self.to_start()
+        self.timer.start()
+
+    def autoplay_step(self):
+        if not self.step_forward():
+            self.autoplay_button.setChecked(False)
+
+    def leave(self):
+        self.autoplay_button.setChecked(False)
+        self.parent.back_to_history()
+
+
+def parse_args(argv):
+    """
+    Разбирает собственные флаги приложения; остальные аргументы передаются Qt
+    """
+    parser = argparse.ArgumentParser(description="Крестики-нолики")
+    parser.add_argument("--metrics", action="store_true",
+                        help=f"собирать метрики (также включается переменной {metrics.ENV_VAR}=1)")
+    parser.add_argument("--metrics-output", default="metrics.json", help="куда сохранить метрики при выходе")
+    parser.add_argument("--metrics-format", choices=("json", "prometheus"), default="json", help="формат метрик")
+    parser.add_argument("--startup-benchmark", action="store_true",
+                        help="вывести время запуска до первого кадра и до готовности базы данных и выйти")
+    return parser.parse_known_args(argv)
+
+
+def report_startup(app, window, times):
+    """
+    Дожидается открытия базы данных, печатает замеры запуска в JSON (секунды от окончания
+    импорта модулей main) и закрывает приложение
+    """
+    times.setdefault("first_frame_s", time.perf_counter() - STARTED)
+    if window.storage_ready_at is None:
+        QTimer.singleShot(5, lambda: report_startup(app, window, times))
+        return
+    times["storage_ready_s"] = window.storage_ready_at - STARTED
+    print(json.dumps(times))
+    window.close()
+    app.quit()
+
+
 if __name__ == "__main__":
-    app = QApplication(sys.argv)
-    window = TicTacToeApp()
+    multiprocessing.freeze_support()
+    args, qt_args = parse_args(sys.argv[1:])
+    if args.metrics:
+        metrics.enable()
+    app = QApplication(sys.argv[:1] + qt_args)
+    window = TicTacToeApp(args.metrics_output, args.metrics_format)
     window.show()
+    if args.startup_benchmark:
+        times = {"window_s": time.perf_counter() - STARTED}
+        QTimer.singleShot(0, lambda: report_startup(app, window, times))
     sys.exit(app.exec())
\ No newline at end of file
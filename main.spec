@@ -5,7 +5,7 @@ a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[],
+    datas=[('perfect_play.bin', '.'), ('background_2.png', '.'), ('learned_values.bin', '.')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
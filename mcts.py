@@ -0,0 +1,218 @@
+import math
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from engine import Board, check_stop, opponent
+import metrics
+
+DEFAULT_TIME_LIMIT = 1.0
+EXPLORATION = 1.4
+
+
+class Node:
+    """
+    Узел дерева поиска; wins считаются для игрока, сделавшего ход move
+    """
+
+    __slots__ = ("move", "player", "parent", "children", "untried", "visits", "wins")
+
+    def __init__(self, move, player, parent, untried):
+        self.move = move
+        self.player = player
+        self.parent = parent
+        self.children = []
+        self.untried = untried
+        self.visits = 0
+        self.wins = 0.0
+
+    def select_child(self, exploration):
+        log_visits = math.log(self.visits)
+        return max(
+            self.children,
+            key=lambda child: child.wins / child.visits + exploration * math.sqrt(log_visits / child.visits),
+        )
+
+
+class MCTS:
+    """
+    Поиск по дереву методом Монте-Карло (UCT) со случайными доигровками
+    Останавливается по числу симуляций iterations или по времени time_limit
+    """
+
+    def __init__(self, iterations=None, time_limit=DEFAULT_TIME_LIMIT, exploration=EXPLORATION, seed=None):
+        self.iterations = iterations
+        self.time_limit = time_limit
+        self.exploration = exploration
+        self.rng = random.Random(seed)
+        self.simulations = 0
+
+    def visit_counts(self, board, player, stop=None):
+        """
+        Строит дерево из текущей позиции и возвращает словарь {клетка: (посещения, победы)}
+        для ходов корня
+        """
+        deadline = None if self.time_limit is None else time.monotonic() + self.time_limit
+        root = Node(None, opponent(player), None, board.legal_moves())
+        self.rng.shuffle(root.untried)
+        self.simulations = 0
+
+        while self.iterations is None or self.simulations < self.iterations:
+            if self.simulations & 63 == 0:
+                check_stop(stop)
+                if deadline is not None and time.monotonic() > deadline:
+                    break
+            self.simulate(root, board)
+            self.simulations += 1
+
+        return {child.move: (child.visits, child.wins) for child in root.children}
+
+    def simulate(self, root, board):
+        """
+        Одна итерация: выбор, расширение, случайная доигровка и обратное распространение
+        """
+        node = root
+        played = 0
+        while not node.untried and node.children and board.winner() is None:
+            node = node.select_child(self.exploration)
+            board.play(node.move, node.player)
+            played += 1
+
+        if node.untried and board.winner() is None:
+            move = node.untried.pop()
+            player = opponent(node.player)
+            board.play(move, player)
+            played += 1
+            untried = [] if board.is_terminal() else board.legal_moves()
+            self.rng.shuffle(untried)
+            child = Node(move, player, node, untried)
+            node.children.append(child)
+            node = child
+
+        winner = self.rollout(board, opponent(node.player))
+
+        for _ in range(played):
+            board.undo()
+
+        while node is not None:
+            node.visits += 1
+            if winner == node.player:
+                node.wins += 1.0
+            elif winner is None:
+                node.wins += 0.5
+            node = node.parent
+
+    def rollout(self, board, player):
+        """
+        Доигрывает позицию случайными ходами на битовых масках и возвращает победителя
+        """
+        winner = board.winner()
+        if winner is not None:
+            return winner
+        geometry = board.geometry
+        bits = {player: board.bits(player), opponent(player): board.bits(opponent(player))}
+        free = board.legal_moves()
+        self.rng.shuffle(free)
+        for index in free:
+            own = bits[player] | 1 << index
+            bits[player] = own
+            for mask in geometry.cell_lines[index]:
+                if own & mask == mask:
+                    return player
+            player = opponent(player)
+        return None
+
+    def best_move(self, board, player, stop=None):
+        """
+        Возвращает самый посещаемый ход корня
+        """
+        counts = self.visit_counts(board.copy(), player, stop)
+        if not counts:
+            moves = board.legal_moves()
+            return moves[0] if moves else None
+        return max(counts, key=lambda move: counts[move][0])
+
+
+def _worker_counts(x_bits, o_bits, size, win_length, player, iterations, time_limit, seed):
+    board = Board.from_bits(x_bits, o_bits, size, win_length)
+    search = MCTS(iterations, time_limit, seed=seed)
+    return search.visit_counts(board, player), search.simulations
+
+
+_pool = None
+
+
+def process_pool():
+    """
+    Возвращает общий пул процессов для параллельных доигровок
+    Процессы запускаются методом spawn, чтобы не копировать потоки Qt через fork
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                    mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def parallel_visit_counts(board, player, stop=None, iterations=None, time_limit=DEFAULT_TIME_LIMIT, workers=None):
+    """
+    Параллелизация по корню: каждый процесс строит свое дерево из той же позиции,
+    затем посещения ходов корня суммируются
+    Бюджет iterations делится между процессами, time_limit действует в каждом из них
+    Возвращает пару (словарь посещений, общее число симуляций)
+    """
+    workers = workers or os.cpu_count() or 1
+    share = None if iterations is None else max(1, iterations // workers)
+    pool = process_pool()
+    futures = [
+        pool.submit(_worker_counts, board.x_bits, board.o_bits, board.size, board.win_length,
+                    player, share, time_limit, random.randrange(1 << 30))
+        for _ in range(workers)
+    ]
+
+    pending = set(futures)
+    try:
+        while pending:
+            check_stop(stop)
+            done, pending = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        raise
+
+    merged = {}
+    simulations = 0
+    for future in futures:
+        counts, count = future.result()
+        simulations += count
+        for move, (visits, wins) in counts.items():
+            total_visits, total_wins = merged.get(move, (0, 0.0))
+            merged[move] = (total_visits + visits, total_wins + wins)
+    metrics.count("mcts_simulations", simulations)
+    return merged, simulations
+
+
+def mcts_move(board, player, stop=None, iterations=None, time_limit=DEFAULT_TIME_LIMIT, workers=None):
+    """
+    Ход уровня "Монте-Карло": самый посещаемый ход корня по всем процессам
+    При workers=1 поиск выполняется в текущем процессе
+    """
+    if workers == 1:
+        search = MCTS(iterations, time_limit)
+        move = search.best_move(board, player, stop)
+        metrics.count("mcts_simulations", search.simulations)
+        return move
+    counts, _ = parallel_visit_counts(board, player, stop, iterations, time_limit, workers)
+    if not counts:
+        moves = board.legal_moves()
+        return moves[0] if moves else None
+    return max(counts, key=lambda move: counts[move][0])
@@ -0,0 +1,244 @@
+import bisect
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from functools import wraps
+
+ENV_VAR = "TICTACTOE_METRICS"
+LATENCY_BOUNDS = tuple(round(1e-6 * 1.25 ** i, 9) for i in range(80))
+
+ENABLED = os.environ.get(ENV_VAR, "").lower() in ("1", "true", "yes", "on")
+
+
+class LatencyHistogram:
+    """
+    Гистограмма задержек с геометрическими корзинами
+    Объединяется между процессами и позволяет оценить перцентили без хранения всех замеров
+    """
+
+    def __init__(self, counts=None, total_seconds=0.0):
+        self.counts = counts or [0] * (len(LATENCY_BOUNDS) + 1)
+        self.total = sum(self.counts)
+        self.total_seconds = total_seconds
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(LATENCY_BOUNDS, seconds)] += 1
+        self.total += 1
+        self.total_seconds += seconds
+
+    def merge(self, other):
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.total += other.total
+        self.total_seconds += other.total_seconds
+
+    def percentile(self, fraction):
+        """
+        Возвращает верхнюю границу корзины, в которую попадает перцентиль fraction, в секундах
+        """
+        if not self.total:
+            return 0.0
+        rank = fraction * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return LATENCY_BOUNDS[min(i, len(LATENCY_BOUNDS) - 1)]
+        return LATENCY_BOUNDS[-1]
+
+
+class Registry:
+    """
+    Счетчики, значения и гистограммы времени, различаемые по имени и меткам
+    Доступ из нескольких потоков защищен блокировкой
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge(self, name, value, **labels):
+        with self.lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = LatencyHistogram()
+            histogram.add(seconds)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+
+    def state(self):
+        """
+        Возвращает копию всех значений в виде, пригодном для передачи между процессами
+        """
+        with self.lock:
+            return (
+                dict(self.counters),
+                dict(self.gauges),
+                {key: (list(h.counts), h.total_seconds) for key, h in self.histograms.items()},
+            )
+
+    def merge(self, state):
+        counters, gauges, histograms = state
+        with self.lock:
+            for key, value in counters.items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            self.gauges.update(gauges)
+            for key, (counts, total_seconds) in histograms.items():
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = LatencyHistogram()
+                histogram.merge(LatencyHistogram(list(counts), total_seconds))
+
+    def to_dict(self):
+        """
+        Снимок для выгрузки в JSON; для гистограмм — количество, сумма и перцентили в микросекундах
+        """
+        def name_of(key):
+            name, labels = key
+            if not labels:
+                return name
+            return name + "{" + ",".join(f"{label}={value}" for label, value in labels) + "}"
+
+        with self.lock:
+            return {
+                "counters": {name_of(key): value for key, value in sorted(self.counters.items())},
+                "gauges": {name_of(key): value for key, value in sorted(self.gauges.items())},
+                "histograms": {
+                    name_of(key): {
+                        "count": h.total,
+                        "sum_s": h.total_seconds,
+                        "p50_us": h.percentile(0.5) * 1e6,
+                        "p90_us": h.percentile(0.9) * 1e6,
+                        "p99_us": h.percentile(0.99) * 1e6,
+                    }
+                    for key, h in sorted(self.histograms.items())
+                },
+            }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self, prefix="tictactoe_"):
+        """
+        Текстовый формат Prometheus; гистограммы выводятся с накопленными корзинами le в секундах
+        """
+        def labels_of(labels, extra=()):
+            pairs = [f'{label}="{value}"' for label, value in tuple(labels) + tuple(extra)]
+            return "{" + ",".join(pairs) + "}" if pairs else ""
+
+        lines = []
+        with self.lock:
+            for kind, values in (("counter", self.counters), ("gauge", self.gauges)):
+                seen = set()
+                for (name, labels), value in sorted(values.items()):
+                    if name not in seen:
+                        lines.append(f"# TYPE {prefix}{name} {kind}")
+                        seen.add(name)
+                    lines.append(f"{prefix}{name}{labels_of(labels)} {value}")
+            seen = set()
+            for (name, labels), h in sorted(self.histograms.items()):
+                if name not in seen:
+                    lines.append(f"# TYPE {prefix}{name} histogram")
+                    seen.add(name)
+                cumulative = 0
+                for bound, count in zip(LATENCY_BOUNDS, h.counts):
+                    cumulative += count
+                    if count:
+                        lines.append(f"{prefix}{name}_bucket{labels_of(labels, (('le', bound),))} {cumulative}")
+                lines.append(f"{prefix}{name}_bucket{labels_of(labels, (('le', '+Inf'),))} {h.total}")
+                lines.append(f"{prefix}{name}_sum{labels_of(labels)} {h.total_seconds}")
+                lines.append(f"{prefix}{name}_count{labels_of(labels)} {h.total}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def enable(flag=True):
+    """
+    Включает или выключает сбор метрик; значение передается дочерним процессам через окружение
+    """
+    global ENABLED
+    ENABLED = flag
+    os.environ[ENV_VAR] = "1" if flag else "0"
+
+
+def count(name, value=1, **labels):
+    if ENABLED:
+        REGISTRY.count(name, value, **labels)
+
+
+def gauge(name, value, **labels):
+    if ENABLED:
+        REGISTRY.gauge(name, value, **labels)
+
+
+def observe(name, seconds, **labels):
+    if ENABLED:
+        REGISTRY.observe(name, seconds, **labels)
+
+
+def timed(name, **labels):
+    """
+    Декоратор: замеряет время каждого вызова в гистограмму name с меткой op — именем функции
+    Пока сбор выключен, добавляет к вызову только проверку флага
+    """
+    def decorate(func):
+        op = func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                REGISTRY.observe(name, time.perf_counter() - started, op=op, **labels)
+
+        return wrapper
+
+    return decorate
+
+
+def dump(path, fmt="json"):
+    """
+    Записывает метрики в файл в формате json или prometheus
+    """
+    text = REGISTRY.to_prometheus() if fmt == "prometheus" else REGISTRY.to_json()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def profile_call(func, *args, output=None, sort="cumulative", limit=30):
+    """
+    Выполняет func(*args) под cProfile и возвращает (результат, текстовый отчет)
+    Если задан output, сохраняет туда двоичные данные профиля для pstats или snakeviz
+    """
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func, *args)
+    if output:
+        profiler.dump_stats(output)
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats(sort).print_stats(limit)
+    return result, stream.getvalue()
@@ -0,0 +1,112 @@
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from PyQt6.QtNetwork import QAbstractSocket, QTcpSocket
+
+from server import HOST, PORT, RECONNECT_TIMEOUT, decode, encode
+
+RETRY_INTERVAL_MS = 2000
+
+
+def parse_address(text):
+    """
+    Разбирает адрес вида "хост:порт"; порт по умолчанию — PORT
+    """
+    host, _, port = text.strip().rpartition(":")
+    if not host:
+        return text.strip() or HOST, PORT
+    return host, int(port)
+
+
+class NetworkClient(QObject):
+    """
+    Клиент сервера сетевой игры на QTcpSocket: работает в цикле событий Qt без отдельных потоков
+    После обрыва соединения во время партии переподключается по токену,
+    пока сервер держит место игрока
+    """
+    message_received = pyqtSignal(dict)
+    connection_lost = pyqtSignal(str)
+
+    def __init__(self, host=HOST, port=PORT, parent=None):
+        super().__init__(parent)
+        self.host = host
+        self.port = port
+        self.token = None
+        self.pending = []
+        self.closing = False
+        self.retries = 0
+        self.socket = QTcpSocket(self)
+        self.socket.connected.connect(self.on_connected)
+        self.socket.readyRead.connect(self.on_ready_read)
+        self.socket.disconnected.connect(self.on_disconnected)
+        self.socket.errorOccurred.connect(self.on_error)
+
+    def connect_to_server(self):
+        self.socket.connectToHost(self.host, self.port)
+
+    def send(self, message):
+        """
+        Отправляет сообщение; до установки соединения сообщения копятся в очереди
+        """
+        if self.socket.state() == QAbstractSocket.SocketState.ConnectedState:
+            self.socket.write(encode(message))
+        else:
+            self.pending.append(message)
+
+    def find_match(self, name, size, win_length):
+        self.token = None
+        self.send({"type": "hello", "name": name, "size": size, "win_length": win_length})
+
+    def play(self, cell):
+        self.send({"type": "move", "cell": cell})
+
+    def leave(self):
+        self.token = None
+        self.send({"type": "leave"})
+
+    def close(self):
+        self.closing = True
+        self.socket.flush()
+        self.socket.disconnectFromHost()
+
+    def on_connected(self):
+        self.retries = 0
+        if self.token is not None:
+            self.socket.write(encode({"type": "hello", "token": self.token}))
+        for message in self.pending:
+            self.socket.write(encode(message))
+        self.pending.clear()
+
+    def on_ready_read(self):
+        while self.socket.canReadLine():
+            line = bytes(self.socket.readLine())
+            try:
+                message = decode(line)
+            except ValueError:
+                continue
+            if message["type"] in ("start", "resume"):
+                self.token = message["token"]
+            elif message["type"] == "end":
+                self.token = None
+            self.message_received.emit(message)
+
+    def on_disconnected(self):
+        if self.closing:
+            return
+        if self.token is not None and self.retries * RETRY_INTERVAL_MS < RECONNECT_TIMEOUT * 1000:
+            self.retries += 1
+            QTimer.singleShot(RETRY_INTERVAL_MS, self.connect_to_server)
+            return
+        self.connection_lost.emit("Соединение с сервером потеряно")
+
+    def on_error(self, error):
+        """
+        Ошибки подключения приходят без сигнала disconnected: повторяет попытку
+        переподключения или сообщает, что сервер недоступен
+        """
+        if self.closing or error == QAbstractSocket.SocketError.RemoteHostClosedError:
+            return
+        if self.socket.state() != QAbstractSocket.SocketState.UnconnectedState:
+            return
+        if self.retries:
+            self.on_disconnected()
+        else:
+            self.connection_lost.emit(self.socket.errorString())
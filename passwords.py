@@ -0,0 +1,63 @@
+import base64
+import hashlib
+import hmac
+import os
+
+SCHEME = "scrypt"
+SCRYPT_N = int(os.environ.get("TICTACTOE_SCRYPT_N", 2 ** 14))
+if SCRYPT_N < 2 or SCRYPT_N & (SCRYPT_N - 1):
+    raise ValueError(f"TICTACTOE_SCRYPT_N должна быть степенью двойки не меньше 2, получено {SCRYPT_N}")
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+
+def _b64encode(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def _scrypt(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * n * r, dklen=HASH_BYTES)
+
+
+def hash_password(password, n=None, r=SCRYPT_R, p=SCRYPT_P):
+    """
+    Возвращает строку вида scrypt$n$r$p$соль$хеш для хранения в базе данных
+    Стоимость n по умолчанию задается переменной окружения TICTACTOE_SCRYPT_N
+    """
+    n = n or SCRYPT_N
+    salt = os.urandom(SALT_BYTES)
+    digest = _scrypt(password, salt, n, r, p)
+    return f"{SCHEME}${n}${r}${p}${_b64encode(salt)}${_b64encode(digest)}"
+
+
+def is_hashed(stored):
+    return stored.startswith(SCHEME + "$")
+
+
+def verify_password(password, stored):
+    """
+    Сравнивает пароль с сохраненным хешем за постоянное время
+    """
+    try:
+        scheme, n, r, p, salt, digest = stored.split("$")
+        if scheme != SCHEME:
+            return False
+        expected = base64.b64decode(digest)
+        actual = _scrypt(password, base64.b64decode(salt), int(n), int(r), int(p))
+    except (ValueError, TypeError):
+        return False
+    return hmac.compare_digest(actual, expected)
+
+
+def needs_rehash(stored, n=None):
+    """
+    Проверяет, сохранен ли хеш с другой стоимостью и его нужно пересчитать
+    """
+    try:
+        scheme, stored_n, stored_r, stored_p, _, _ = stored.split("$")
+    except ValueError:
+        return True
+    return (scheme, int(stored_n), int(stored_r), int(stored_p)) != (SCHEME, n or SCRYPT_N, SCRYPT_R, SCRYPT_P)
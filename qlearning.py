@@ -0,0 +1,280 @@
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+import threading
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+from book import TERNARY, position_code
+from engine import CELLS, FULL_MASK, has_line, medium_move, opponent, random_move
+from solver import canonical_key
+
+MAGIC = b"TTTQ"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQ")
+POSITIONS = 3 ** CELLS
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "learned_values.bin")
+
+ALPHA = 0.3
+EPSILON = 0.1
+SYNC_EVERY = 2000
+CHUNKS = 8
+
+
+@lru_cache(maxsize=None)
+def canonical_codes():
+    """
+    Таблица троичный код позиции -> код ее канонического поворота или отражения,
+    чтобы все 8 симметричных позиций делили одну ячейку таблицы оценок
+    """
+    codes = array("I", bytes(4 * POSITIONS))
+    for mine in range(1 << CELLS):
+        free = FULL_MASK & ~mine
+        theirs = free
+        while True:
+            key = canonical_key(mine, theirs)
+            codes[position_code(mine, theirs)] = position_code(key >> CELLS, key & FULL_MASK)
+            if not theirs:
+                break
+            theirs = (theirs - 1) & free
+    return codes
+
+
+def move_scores(values, mine, theirs):
+    """
+    Возвращает [(оценка, клетка), ...] для всех ходов игрока, который сейчас ходит:
+    1 — немедленная победа, 0 — ничья на последнем ходу, иначе оценка из таблицы
+    для позиции соперника с обратным знаком
+    """
+    codes = canonical_codes()
+    occupied = mine | theirs
+    scores = []
+    for index in range(CELLS):
+        bit = 1 << index
+        if occupied & bit:
+            continue
+        after = mine | bit
+        if has_line(after):
+            score = 1.0
+        elif after | theirs == FULL_MASK:
+            score = 0.0
+        else:
+            score = -values[codes[TERNARY[theirs] + 2 * TERNARY[after]]]
+        scores.append((score, index))
+    return scores
+
+
+def train_episodes(values, episodes, alpha=ALPHA, epsilon=EPSILON, rng=random, visits=None):
+    """
+    Обучает таблицу values партиями против самой себя: после каждого хода оценка позиции
+    сдвигается к лучшей оценке хода (Q-обучение в форме негамакса, одна таблица на обе стороны)
+    С вероятностью epsilon ход выбирается случайно; visits считает обновления каждой ячейки
+    """
+    codes = canonical_codes()
+    for _ in range(episodes):
+        mine = theirs = 0
+        while True:
+            scores = move_scores(values, mine, theirs)
+            target = max(scores)[0]
+            code = codes[TERNARY[mine] + 2 * TERNARY[theirs]]
+            values[code] += alpha * (target - values[code])
+            if visits is not None:
+                visits[code] += 1
+            if rng.random() < epsilon:
+                _, index = rng.choice(scores)
+            else:
+                index = rng.choice([index for score, index in scores if score == target])
+            after = mine | 1 << index
+            if has_line(after) or after | theirs == FULL_MASK:
+                break
+            mine, theirs = theirs, after
+
+
+def _train_chunk(data, episodes, alpha, epsilon, seed):
+    """
+    Обучает копию таблицы в процессе пула; возвращает оценки и число обновлений ячеек
+    """
+    values = array("f", data)
+    visits = array("I", bytes(4 * POSITIONS))
+    train_episodes(values, episodes, alpha, epsilon, random.Random(seed), visits)
+    return values.tobytes(), visits.tobytes()
+
+
+def merge(values, results):
+    """
+    Сводит таблицы процессов: оценка каждой ячейки — среднее по процессам,
+    взвешенное числом ее обновлений; непосещенные ячейки не меняются
+    """
+    tables = [(array("f", data), array("I", counts)) for data, counts in results]
+    for index in range(POSITIONS):
+        weight = 0
+        total = 0.0
+        for table, visits in tables:
+            count = visits[index]
+            if count:
+                weight += count
+                total += table[index] * count
+        if weight:
+            values[index] = total / weight
+
+
+def train(episodes, workers=None, sync_every=SYNC_EVERY, alpha=ALPHA, epsilon=EPSILON, seed=None, values=None):
+    """
+    Обучает таблицу партиями против самой себя в нескольких процессах
+    Каждый раунд CHUNKS копий текущей таблицы обучаются по sync_every партий, затем копии сводятся
+    Разбиение на части и их зерна не зависят от workers, поэтому при одном seed
+    таблица получается одинаковой при любом числе процессов
+    Возвращает (таблица, отчет со скоростью обучения)
+    """
+    workers = workers or os.cpu_count() or 1
+    values = values if values is not None else array("f", bytes(4 * POSITIONS))
+    rng = random.Random(seed)
+    rounds = 0
+    started = time.perf_counter()
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        done = 0
+        while done < episodes:
+            data = values.tobytes()
+            chunks = []
+            for _ in range(CHUNKS):
+                chunk = min(sync_every, episodes - done)
+                if chunk <= 0:
+                    break
+                chunks.append((data, chunk, alpha, epsilon, rng.randrange(1 << 30)))
+                done += chunk
+            if pool is None:
+                results = [_train_chunk(*chunk) for chunk in chunks]
+            else:
+                results = [future.result() for future in [pool.submit(_train_chunk, *chunk) for chunk in chunks]]
+            merge(values, results)
+            rounds += 1
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    elapsed = time.perf_counter() - started
+    return values, {
+        "episodes": episodes,
+        "workers": workers,
+        "rounds": rounds,
+        "elapsed_s": elapsed,
+        "games_per_s": episodes / elapsed if elapsed else 0.0,
+    }
+
+
+def save_table(values, episodes, path=DEFAULT_PATH):
+    """
+    Сохраняет таблицу оценок: заголовок и POSITIONS чисел float32, пригодных для отображения в память
+    """
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, CELLS, episodes))
+        f.write(values.tobytes())
+    os.replace(temporary, path)
+
+
+class LearnedTable:
+    """
+    Обученная таблица оценок, отображенная в память
+    values — оценки позиций для ходящего игрока по каноническому троичному коду
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, cells, self.episodes = HEADER.unpack_from(self.data, 0)
+            if magic != MAGIC or version != VERSION or cells != CELLS:
+                raise ValueError(f"Неподдерживаемый формат таблицы: {path}")
+            if len(self.data) != HEADER.size + 4 * POSITIONS:
+                raise ValueError(f"Неверный размер таблицы: {path}")
+        except (ValueError, struct.error):
+            self.data.close()
+            raise
+        self.values = memoryview(self.data)[HEADER.size:].cast("f")
+
+    def copy_values(self):
+        return array("f", self.values.tobytes())
+
+    def close(self):
+        self.values.release()
+        self.data.close()
+
+
+_table = None
+_table_loaded = False
+_table_lock = threading.Lock()
+
+
+def load_table(path=DEFAULT_PATH):
+    """
+    Загружает обученную таблицу при первом обращении
+    Возвращает None, если файл отсутствует или поврежден
+    Потокобезопасна: пока таблица загружается, остальные вызовы ждут ее
+    """
+    global _table, _table_loaded
+    if not _table_loaded:
+        with _table_lock:
+            if not _table_loaded:
+                try:
+                    _table = LearnedTable(path)
+                except (OSError, ValueError):
+                    _table = None
+                _table_loaded = True
+    return _table
+
+
+def learned_move(board, player, rng=random, epsilon=0.0):
+    """
+    Ход обученного ИИ: лучший ход по таблице, с вероятностью epsilon — случайный
+    epsilon позволяет ослабить уровень; на больших полях и без файла таблицы
+    используется ход среднего уровня
+    """
+    table = load_table() if board.is_classic else None
+    if table is None:
+        return medium_move(board, player, rng)
+    if epsilon and rng.random() < epsilon:
+        return random_move(board, rng)
+    scores = move_scores(table.values, board.bits(player), board.bits(opponent(player)))
+    if not scores:
+        return None
+    return max(scores, key=lambda item: (item[0], -item[1]))[1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Обучение ИИ партиями против самого себя (табличное Q-обучение)")
+    parser.add_argument("--episodes", type=int, default=200000, help="количество обучающих партий")
+    parser.add_argument("--workers", type=int, default=None, help="количество процессов (по умолчанию — все ядра)")
+    parser.add_argument("--sync-every", type=int, default=SYNC_EVERY,
+                        help="партий в каждой из частей раунда между сведениями таблиц")
+    parser.add_argument("--alpha", type=float, default=ALPHA, help="скорость обучения")
+    parser.add_argument("--epsilon", type=float, default=EPSILON, help="доля случайных ходов при обучении")
+    parser.add_argument("--seed", type=int, default=None, help="зерно генератора случайных чисел")
+    parser.add_argument("--resume", action="store_true", help="продолжить обучение сохраненной таблицы")
+    parser.add_argument("--output", default=DEFAULT_PATH, help="путь к двоичному файлу таблицы")
+    args = parser.parse_args(argv)
+
+    values = None
+    episodes = args.episodes
+    if args.resume:
+        table = LearnedTable(args.output)
+        values = table.copy_values()
+        episodes += table.episodes
+        table.close()
+    values, report = train(args.episodes, args.workers, args.sync_every, args.alpha, args.epsilon,
+                           args.seed, values)
+    save_table(values, episodes, args.output)
+    print(f"Партий: {report['episodes']}, процессов: {report['workers']}, сведений: {report['rounds']}, "
+          f"время: {report['elapsed_s']:.1f} с, партий в секунду: {report['games_per_s']:.0f}")
+    print(f"Таблица ({episodes} партий обучения) -> {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+INITIAL_RATING = 1500.0
+K_FACTOR = 32.0
+
+WIN = 1.0
+DRAW_SCORE = 0.5
+LOSS = 0.0
+
+
+def expected_score(rating, opponent_rating):
+    """
+    Ожидаемый результат игрока с рейтингом rating против opponent_rating по формуле Эло
+    """
+    return 1.0 / (1.0 + 10.0 ** ((opponent_rating - rating) / 400.0))
+
+
+def update(rating, opponent_rating, score, k=K_FACTOR):
+    """
+    Возвращает новые рейтинги обоих игроков после партии, в которой первый набрал score
+    (1 — победа, 0.5 — ничья, 0 — поражение); сумма рейтингов не меняется
+    """
+    delta = k * (score - expected_score(rating, opponent_rating))
+    return rating + delta, opponent_rating - delta
+
+
+def score_for(result, player):
+    """
+    Очки игрока player ("X" или "O") по итогу партии: "X", "O" или ничья
+    """
+    if result == player:
+        return WIN
+    if result in ("X", "O"):
+        return LOSS
+    return DRAW_SCORE
+
+
+class Ratings:
+    """
+    Рейтинги в памяти для пакетного пересчета и турниров
+    Ключ игрока — любое хешируемое значение; новый игрок начинает с INITIAL_RATING
+    """
+
+    def __init__(self, k=K_FACTOR):
+        self.k = k
+        self.ratings = {}
+        self.games = {}
+
+    def get(self, player):
+        return self.ratings.get(player, INITIAL_RATING)
+
+    def play(self, first, second, score):
+        """
+        Учитывает партию first против second, в которой first набрал score
+        """
+        self.ratings[first], self.ratings[second] = update(self.get(first), self.get(second), score, self.k)
+        self.games[first] = self.games.get(first, 0) + 1
+        self.games[second] = self.games.get(second, 0) + 1
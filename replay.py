@@ -0,0 +1,46 @@
+from engine import Board, opponent
+
+
+class Replay:
+    """
+    Пошаговый просмотр записанной партии (GameRecord) без привязки к Qt
+    Каждый шаг вперед ставит один символ, шаг назад отменяет один ход:
+    позиция никогда не пересобирается с начала партии
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.board = Board(game.board_size, game.win_length)
+        self.position = 0
+
+    @property
+    def length(self):
+        return len(self.game.moves)
+
+    def player_at(self, position):
+        """
+        Возвращает символ игрока, сделавшего ход с номером position (с нуля)
+        """
+        first = self.game.first_player
+        return first if position % 2 == 0 else opponent(first)
+
+    def step_forward(self):
+        """
+        Делает следующий ход партии; возвращает (клетка, символ) или None в конце партии
+        """
+        if self.position >= self.length:
+            return None
+        index = self.game.moves[self.position]
+        player = self.player_at(self.position)
+        self.board.play(index, player)
+        self.position += 1
+        return index, player
+
+    def step_back(self):
+        """
+        Отменяет последний показанный ход; возвращает освобожденную клетку или None в начале партии
+        """
+        if self.position == 0:
+            return None
+        self.position -= 1
+        return self.board.undo()
@@ -0,0 +1,235 @@
+import time
+
+from book import perfect_move
+from engine import check_stop, opponent
+import metrics
+
+WIN_SCORE = 10 ** 9
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+class SearchTimeout(Exception):
+    """
+    Исчерпан бюджет времени на текущую итерацию углубления
+    """
+
+
+def line_weights(win_length):
+    """
+    Веса отрезков по числу камней одного игрока: каждый следующий камень в 10 раз ценнее
+    Полный отрезок оценивается как победа
+    """
+    weights = [0] + [10 ** (count - 1) for count in range(1, win_length)]
+    weights.append(WIN_SCORE)
+    return tuple(weights)
+
+
+class HeuristicSearch:
+    """
+    Поиск хода для больших полей: альфа-бета с итеративным углублением,
+    ограничением по времени, упорядочиванием ходов и эвристической оценкой
+    Оценка поддерживается инкрементально: после хода пересчитываются только
+    отрезки, проходящие через новую клетку
+    """
+
+    def __init__(self, time_limit=1.0, max_depth=8, max_branching=12):
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.max_branching = max_branching
+        self.nodes = 0
+        self.depth_reached = 0
+        self.table_hits = 0
+        self.table = {}
+
+    def best_move(self, board, player, stop=None):
+        """
+        Возвращает лучший найденный ход за отведенное время
+        Результат последней полностью просмотренной глубины имеет приоритет
+        """
+        try:
+            return self._best_move(board, player, stop)
+        finally:
+            if metrics.ENABLED:
+                metrics.count("search_nodes", self.nodes)
+                metrics.count("search_table_hits", self.table_hits)
+                metrics.gauge("search_depth_reached", self.depth_reached)
+
+    def _best_move(self, board, player, stop):
+        geometry = board.geometry
+        self.geometry = geometry
+        self.weights = line_weights(geometry.win_length)
+        self.stop = stop
+        self.deadline = time.monotonic() + self.time_limit
+        self.table = {}
+        self.nodes = 0
+        self.depth_reached = 0
+        self.table_hits = 0
+
+        mine = board.bits(player)
+        theirs = board.bits(opponent(player))
+        if not mine | theirs:
+            center = geometry.size // 2
+            return center * geometry.size + center
+
+        score = self.evaluate(mine, theirs)
+        ordered = self.ordered_moves(mine, theirs)
+        if not ordered:
+            return None
+        best = ordered[0][1]
+        if ordered[0][0] >= WIN_SCORE // 2:
+            return best
+
+        for depth in range(1, self.max_depth + 1):
+            try:
+                move, value = self.search_root(mine, theirs, score, depth, ordered)
+            except SearchTimeout:
+                break
+            best = move
+            self.depth_reached = depth
+            if abs(value) >= WIN_SCORE // 2:
+                break
+            ordered.sort(key=lambda item: item[1] != best)
+        return best
+
+    def search_root(self, mine, theirs, score, depth, ordered):
+        alpha = -WIN_SCORE - 1
+        best_move = ordered[0][1]
+        for delta, index in ordered:
+            value = self.child_value(mine, theirs, score, delta, index, depth, alpha, WIN_SCORE + 1)
+            if value > alpha:
+                alpha = value
+                best_move = index
+        return best_move, alpha
+
+    def child_value(self, mine, theirs, score, delta, index, depth, alpha, beta):
+        bit = 1 << index
+        if delta >= WIN_SCORE // 2:
+            return WIN_SCORE - (mine | theirs).bit_count()
+        return -self.negamax(theirs, mine | bit, -(score + delta), depth - 1, -beta, -alpha)
+
+    def negamax(self, mine, theirs, score, depth, alpha, beta):
+        """
+        Оценка позиции с точки зрения ходящего игрока mine; score — текущая эвристика для него
+        """
+        self.nodes += 1
+        if self.nodes & 255 == 0:
+            check_stop(self.stop)
+            if time.monotonic() > self.deadline:
+                raise SearchTimeout()
+
+        if (mine | theirs) == self.geometry.full_mask:
+            return 0
+        if depth == 0:
+            return score
+
+        key = (mine, theirs)
+        entry = self.table.get(key)
+        hint = None
+        if entry is not None:
+            self.table_hits += 1
+            entry_depth, value, flag, hint = entry
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return value
+                if flag == LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value
+
+        ordered = self.ordered_moves(mine, theirs)
+        if hint is not None:
+            ordered.sort(key=lambda item: item[1] != hint)
+
+        alpha_orig = alpha
+        best = -WIN_SCORE - 1
+        best_move = None
+        for delta, index in ordered:
+            value = self.child_value(mine, theirs, score, delta, index, depth, alpha, beta)
+            if value > best:
+                best = value
+                best_move = index
+                if value > alpha:
+                    alpha = value
+                    if alpha >= beta:
+                        break
+
+        if best <= alpha_orig:
+            flag = UPPER
+        elif best >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table[key] = (depth, best, flag, best_move)
+        return best
+
+    def ordered_moves(self, mine, theirs):
+        """
+        Возвращает ходы рядом с уже занятыми клетками, отсортированные по приросту оценки
+        Прирост учитывает и собственные отрезки, и разрушенные отрезки соперника
+        """
+        geometry = self.geometry
+        occupied = mine | theirs
+        candidates = 0
+        rest = occupied
+        while rest:
+            low = rest & -rest
+            candidates |= geometry.neighbours[low.bit_length() - 1]
+            rest ^= low
+        candidates &= ~occupied
+        if not candidates:
+            candidates = ~occupied & geometry.full_mask
+
+        moves = []
+        while candidates:
+            low = candidates & -candidates
+            index = low.bit_length() - 1
+            moves.append((self.move_delta(mine, theirs, index), index))
+            candidates ^= low
+        moves.sort(reverse=True)
+        return moves[:self.max_branching]
+
+    def move_delta(self, mine, theirs, index):
+        """
+        Изменение эвристики ходящего игрока после его хода в клетку index
+        """
+        weights = self.weights
+        delta = 0
+        for mask in self.geometry.cell_lines[index]:
+            if theirs & mask:
+                if not mine & mask:
+                    delta += weights[(theirs & mask).bit_count()]
+            else:
+                count = (mine & mask).bit_count()
+                delta += weights[count + 1] - weights[count]
+        return delta
+
+    def evaluate(self, mine, theirs):
+        """
+        Полная эвристическая оценка позиции для игрока mine
+        """
+        weights = self.weights
+        score = 0
+        for mask in self.geometry.lines:
+            own = mine & mask
+            other = theirs & mask
+            if own and not other:
+                score += weights[own.bit_count()]
+            elif other and not own:
+                score -= weights[other.bit_count()]
+        return score
+
+
+def hard_move(board, player, stop=None, time_limit=1.0):
+    """
+    Ход сложного уровня: идеальная игра на поле 3x3,
+    эвристический поиск с ограничением по времени на больших полях
+    """
+    if board.is_classic:
+        return perfect_move(board, player, stop)
+    return HeuristicSearch(time_limit).best_move(board, player, stop)
+
@@ -0,0 +1,258 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from book import perfect_move
+from engine import BOARD_VARIANTS, X, Board, medium_move, opponent, random_move
+import metrics
+from mcts import MCTS
+from metrics import LatencyHistogram
+from qlearning import learned_move
+from search import HeuristicSearch
+from solver import shared_solver
+
+
+def play_easy(board, player, rng):
+    return random_move(board, rng), 0
+
+
+def play_medium(board, player, rng):
+    return medium_move(board, player, rng), 0
+
+
+def play_hard(board, player, rng):
+    if board.is_classic:
+        return perfect_move(board, player), 0
+    return play_search(board, player, rng)
+
+
+def play_search(board, player, rng):
+    if board.is_classic:
+        solver = shared_solver()
+        before = solver.nodes
+        move = solver.best_move(board, player)
+        return move, solver.nodes - before
+    search = HeuristicSearch(time_limit=0.2)
+    move = search.best_move(board, player)
+    return move, search.nodes
+
+
+def play_learned(board, player, rng):
+    return learned_move(board, player, rng), 0
+
+
+def play_mcts(board, player, rng):
+    search = MCTS(iterations=500, time_limit=None, seed=rng.randrange(1 << 30))
+    move = search.best_move(board, player)
+    return move, search.simulations
+
+
+POLICIES = {
+    "easy": play_easy,
+    "medium": play_medium,
+    "hard": play_hard,
+    "search": play_search,
+    "mcts": play_mcts,
+    "learned": play_learned,
+}
+
+
+class PolicyStats:
+    """
+    Результаты и замеры одной стратегии в серии партий
+    """
+
+    def __init__(self):
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+        self.moves = 0
+        self.nodes = 0
+        self.latency = LatencyHistogram()
+
+    def merge(self, other):
+        self.wins += other.wins
+        self.draws += other.draws
+        self.losses += other.losses
+        self.moves += other.moves
+        self.nodes += other.nodes
+        self.latency.merge(other.latency)
+
+    def report(self, games):
+        return {
+            "wins": self.wins,
+            "draws": self.draws,
+            "losses": self.losses,
+            "win_rate": self.wins / games if games else 0.0,
+            "draw_rate": self.draws / games if games else 0.0,
+            "loss_rate": self.losses / games if games else 0.0,
+            "moves": self.moves,
+            "nodes_per_move": self.nodes / self.moves if self.moves else 0.0,
+            "latency_p50_us": self.latency.percentile(0.5) * 1e6,
+            "latency_p99_us": self.latency.percentile(0.99) * 1e6,
+        }
+
+
+def play_games(first, second, games, start, size, win_length, alternate, seed):
+    """
+    Играет серию партий в текущем процессе
+    Партия номер i начинается с start; при alternate стороны меняются каждую партию
+    Возвращает пару PolicyStats для first и second
+    """
+    rng = random.Random(seed)
+    policies = (POLICIES[first], POLICIES[second])
+    stats = (PolicyStats(), PolicyStats())
+    clock = time.perf_counter
+    for number in range(start, start + games):
+        x_side = number % 2 if alternate else 0
+        board = Board(size, win_length)
+        player = X
+        side = x_side
+        while not board.is_terminal():
+            began = clock()
+            move, nodes = policies[side](board, player, rng)
+            elapsed = clock() - began
+            board.play(move, player)
+            side_stats = stats[side]
+            side_stats.moves += 1
+            side_stats.nodes += nodes
+            side_stats.latency.add(elapsed)
+            player = opponent(player)
+            side = 1 - side
+
+        winner = board.winner()
+        if winner is None:
+            stats[0].draws += 1
+            stats[1].draws += 1
+        else:
+            winning_side = x_side if winner == X else 1 - x_side
+            stats[winning_side].wins += 1
+            stats[1 - winning_side].losses += 1
+    return stats
+
+
+def _play_chunk(*args):
+    """
+    Играет часть партий в процессе пула и возвращает также собранные там метрики
+    """
+    stats = play_games(*args)
+    if not metrics.ENABLED:
+        return stats, None
+    state = metrics.REGISTRY.state()
+    metrics.REGISTRY.reset()
+    return stats, state
+
+
+def profile_move(policy, size, win_length, opening=2, seed=0, output=None):
+    """
+    Профилирует один ход стратегии policy в позиции после opening случайных ходов
+    Возвращает текстовый отчет cProfile; при заданном output сохраняет профиль в файл
+    """
+    rng = random.Random(seed)
+    board = Board(size, win_length)
+    player = X
+    for _ in range(opening):
+        board.play(random_move(board, rng), player)
+        player = opponent(player)
+    _, report = metrics.profile_call(POLICIES[policy], board, player, rng, output=output)
+    return report
+
+
+def run(first, second, games, workers=None, size=3, win_length=3, alternate=True, seed=None, chunk=None):
+    """
+    Распределяет партии по процессам и возвращает сводный отчет в виде словаря
+    """
+    workers = workers or os.cpu_count() or 1
+    chunk = chunk or max(1, min(10000, -(-games // (workers * 4))))
+    rng = random.Random(seed)
+    totals = (PolicyStats(), PolicyStats())
+
+    started = time.perf_counter()
+    if workers == 1:
+        for stats, total in zip(play_games(first, second, games, 0, size, win_length, alternate, seed), totals):
+            total.merge(stats)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_play_chunk, first, second, min(chunk, games - start), start,
+                            size, win_length, alternate, rng.randrange(1 << 30))
+                for start in range(0, games, chunk)
+            ]
+            for future in futures:
+                chunk_stats, state = future.result()
+                for stats, total in zip(chunk_stats, totals):
+                    total.merge(stats)
+                if state is not None:
+                    metrics.REGISTRY.merge(state)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "first": first,
+        "second": second,
+        "games": games,
+        "board_size": size,
+        "win_length": win_length,
+        "alternate": alternate,
+        "workers": workers,
+        "seed": seed,
+        "elapsed_s": elapsed,
+        "games_per_s": games / elapsed if elapsed else 0.0,
+        "policies": {
+            "first": totals[0].report(games),
+            "second": totals[1].report(games),
+        },
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Партии ИИ против ИИ без интерфейса и замер производительности")
+    parser.add_argument("first", choices=sorted(POLICIES), help="стратегия первого игрока")
+    parser.add_argument("second", choices=sorted(POLICIES), help="стратегия второго игрока")
+    parser.add_argument("--games", type=int, default=10000, help="количество партий")
+    parser.add_argument("--workers", type=int, default=None, help="количество процессов (по умолчанию — все ядра)")
+    parser.add_argument("--size", type=int, default=3, help="размер поля")
+    parser.add_argument("--win-length", type=int, default=None, help="длина выигрышной линии")
+    parser.add_argument("--no-alternate", action="store_true", help="первая стратегия всегда играет за X")
+    parser.add_argument("--seed", type=int, default=None, help="зерно генератора случайных чисел")
+    parser.add_argument("--output", default=None, help="путь к JSON-файлу с результатами")
+    parser.add_argument("--metrics", choices=("json", "prometheus"), default=None,
+                        help="собрать метрики поиска и вывести их в выбранном формате")
+    parser.add_argument("--profile-move", default=None, metavar="PATH",
+                        help="профилировать один ход первой стратегии через cProfile и сохранить профиль в PATH")
+    args = parser.parse_args(argv)
+
+    win_length = args.win_length or dict(BOARD_VARIANTS).get(args.size, min(args.size, 5))
+    if args.profile_move:
+        print(profile_move(args.first, args.size, win_length, seed=args.seed or 0, output=args.profile_move))
+        return 0
+    if args.metrics:
+        metrics.enable()
+    report = run(args.first, args.second, args.games, args.workers, args.size,
+                 win_length, not args.no_alternate, args.seed)
+
+    for side in ("first", "second"):
+        stats = report["policies"][side]
+        print(f"{report[side]:>7}: побед {stats['win_rate']:.2%}, ничьих {stats['draw_rate']:.2%}, "
+              f"поражений {stats['loss_rate']:.2%}, узлов на ход {stats['nodes_per_move']:.1f}, "
+              f"p50 {stats['latency_p50_us']:.1f} мкс, p99 {stats['latency_p99_us']:.1f} мкс")
+    print(f"Партий в секунду: {report['games_per_s']:.0f}")
+    if args.metrics:
+        report["metrics"] = metrics.REGISTRY.to_dict()
+        print(metrics.REGISTRY.to_prometheus() if args.metrics == "prometheus" else metrics.REGISTRY.to_json())
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
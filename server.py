@@ -0,0 +1,334 @@
+import argparse
+import asyncio
+import itertools
+import json
+import secrets
+import sys
+import time
+from collections import deque
+
+from engine import BOARD_VARIANTS, X, O, Board, opponent
+from metrics import LatencyHistogram
+
+HOST = "127.0.0.1"
+PORT = 8765
+RECONNECT_TIMEOUT = 30.0
+MAX_LINE = 4096
+
+
+def encode(message):
+    """
+    Кодирует сообщение протокола: одна строка JSON, завершенная переводом строки
+    """
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def decode(line):
+    """
+    Разбирает строку протокола; возвращает словарь с полем type
+    """
+    message = json.loads(line)
+    if not isinstance(message, dict) or not isinstance(message.get("type"), str):
+        raise ValueError("Сообщение должно быть объектом с полем type")
+    return message
+
+
+class Seat:
+    """
+    Место игрока: соединение (None, пока игрок отключен) и токен для переподключения
+    """
+
+    __slots__ = ("name", "token", "writer", "room", "symbol", "forfeit")
+
+    def __init__(self, name, writer):
+        self.name = name
+        self.token = secrets.token_hex(16)
+        self.writer = writer
+        self.room = None
+        self.symbol = None
+        self.forfeit = None
+
+    def send(self, message):
+        if self.writer is not None and not self.writer.is_closing():
+            self.writer.write(encode(message))
+
+
+class Room:
+    """
+    Комната на двух игроков; сервер хранит доску и сам проверяет каждый ход
+    """
+
+    __slots__ = ("id", "board", "seats", "turn")
+
+    def __init__(self, room_id, first, second, size, win_length):
+        self.id = room_id
+        self.board = Board(size, win_length)
+        self.seats = {X: first, O: second}
+        self.turn = X
+        first.room, first.symbol = self, X
+        second.room, second.symbol = self, O
+
+    def broadcast(self, message):
+        for seat in self.seats.values():
+            seat.send(message)
+
+    def state(self, seat):
+        return {
+            "room": self.id,
+            "symbol": seat.symbol,
+            "token": seat.token,
+            "opponent": self.seats[opponent(seat.symbol)].name,
+            "size": self.board.size,
+            "win_length": self.board.win_length,
+            "moves": list(self.board.history),
+            "turn": self.turn,
+        }
+
+
+class ServerStats:
+    """
+    Счетчики сервера: комнаты, ходы и задержка обработки хода
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.rooms_total = 0
+        self.moves = 0
+        self.latency = LatencyHistogram()
+
+    def report(self, rooms_active, connections):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "rooms_active": rooms_active,
+            "rooms_total": self.rooms_total,
+            "connections": connections,
+            "moves": self.moves,
+            "moves_per_s": self.moves / elapsed if elapsed else 0.0,
+            "latency_p50_us": self.latency.percentile(0.5) * 1e6,
+            "latency_p99_us": self.latency.percentile(0.99) * 1e6,
+        }
+
+
+class GameServer:
+    """
+    Сервер сетевой игры "с другом" на asyncio
+    Подбирает соперников с одинаковым вариантом поля, проверяет ходы по правилам движка
+    и ждет переподключения выбывшего игрока reconnect_timeout секунд, прежде чем засчитать поражение
+
+    Протокол — строки JSON поверх TCP. Клиент отправляет:
+      {"type": "hello", "name": ..., "size": 3, "win_length": 3} — встать в очередь подбора,
+      {"type": "hello", "token": ...} — вернуться в прерванную партию,
+      {"type": "move", "cell": 4}, {"type": "leave"}, {"type": "stats"}, {"type": "ping"}
+    Сервер отвечает сообщениями waiting, start, resume, move, end, opponent_disconnected,
+    opponent_returned, stats, pong и error
+    """
+
+    def __init__(self, host=HOST, port=PORT, reconnect_timeout=RECONNECT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.reconnect_timeout = reconnect_timeout
+        self.queues = {variant: deque() for variant in BOARD_VARIANTS}
+        self.rooms = {}
+        self.tokens = {}
+        self.handlers = {}
+        self.room_ids = itertools.count(1)
+        self.stats = ServerStats()
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, self.host, self.port, limit=MAX_LINE)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+        for writer in self.handlers.values():
+            writer.close()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        if self.server is not None:
+            await self.server.wait_closed()
+        for seat in self.tokens.values():
+            if seat.forfeit is not None:
+                seat.forfeit.cancel()
+
+    def report(self):
+        return self.stats.report(len(self.rooms), len(self.handlers))
+
+    async def handle(self, reader, writer):
+        """
+        Обслуживает одно соединение до его закрытия
+        """
+        task = asyncio.current_task()
+        self.handlers[task] = writer
+        seat = None
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, ConnectionError):
+                    break
+                if not line:
+                    break
+                received = time.perf_counter()
+                try:
+                    message = decode(line)
+                except ValueError as e:
+                    writer.write(encode({"type": "error", "message": f"Неверное сообщение: {e}"}))
+                    continue
+                kind = message["type"]
+                if kind == "hello":
+                    seat = self.hello(message, writer, seat)
+                elif kind == "move":
+                    self.move(seat, message, writer)
+                    self.stats.latency.add(time.perf_counter() - received)
+                elif kind == "leave":
+                    self.leave(seat)
+                    seat = None
+                elif kind == "stats":
+                    writer.write(encode(dict(self.report(), type="stats")))
+                elif kind == "ping":
+                    writer.write(encode({"type": "pong"}))
+                else:
+                    writer.write(encode({"type": "error", "message": f"Неизвестный тип сообщения: {kind}"}))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.handlers.pop(task, None)
+            self.disconnected(seat, writer)
+            writer.close()
+
+    def hello(self, message, writer, seat):
+        """
+        Ставит игрока в очередь подбора или возвращает его в партию по токену
+        """
+        token = message.get("token")
+        if token is not None:
+            returning = self.tokens.get(token) if isinstance(token, str) else None
+            if returning is None or returning.room is None:
+                writer.write(encode({"type": "error", "message": "Партия не найдена"}))
+                return seat
+            if returning.forfeit is not None:
+                returning.forfeit.cancel()
+                returning.forfeit = None
+            returning.writer = writer
+            room = returning.room
+            returning.send(dict(room.state(returning), type="resume"))
+            room.seats[opponent(returning.symbol)].send({"type": "opponent_returned"})
+            return returning
+
+        variant = (message.get("size", 3), message.get("win_length", 3))
+        if not all(isinstance(value, int) for value in variant) or variant not in self.queues:
+            writer.write(encode({"type": "error", "message": f"Неподдерживаемый вариант поля: {variant}"}))
+            return seat
+        if seat is not None:
+            self.leave(seat)
+        seat = Seat(str(message.get("name") or "Игрок")[:32], writer)
+        queue = self.queues[variant]
+        while queue and (queue[0].writer is None or queue[0].writer.is_closing()):
+            queue.popleft()
+        if not queue:
+            queue.append(seat)
+            seat.send({"type": "waiting"})
+            return seat
+
+        room = Room(next(self.room_ids), queue.popleft(), seat, *variant)
+        self.rooms[room.id] = room
+        self.stats.rooms_total += 1
+        for player in room.seats.values():
+            self.tokens[player.token] = player
+            player.send(dict(room.state(player), type="start"))
+        return seat
+
+    def move(self, seat, message, writer):
+        """
+        Проверяет ход и рассылает его обоим игрокам; при окончании партии закрывает комнату
+        """
+        room = seat.room if seat is not None else None
+        if room is None:
+            writer.write(encode({"type": "error", "message": "Вы не в партии"}))
+            return
+        cell = message.get("cell")
+        board = room.board
+        if room.turn != seat.symbol:
+            seat.send({"type": "error", "message": "Сейчас ход соперника"})
+            return
+        if not isinstance(cell, int) or isinstance(cell, bool) or not 0 <= cell < board.cells or not board.is_empty(cell):
+            seat.send({"type": "error", "message": f"Недопустимый ход: {cell}"})
+            return
+        board.play(cell, seat.symbol)
+        self.stats.moves += 1
+        room.turn = None if board.is_terminal() else opponent(seat.symbol)
+        room.broadcast({"type": "move", "cell": cell, "player": seat.symbol, "turn": room.turn})
+        if room.turn is None:
+            self.finish(room, board.winner(), "line" if board.winner() else "draw")
+
+    def finish(self, room, winner, reason):
+        room.broadcast({"type": "end", "winner": winner, "reason": reason})
+        self.rooms.pop(room.id, None)
+        for seat in room.seats.values():
+            self.tokens.pop(seat.token, None)
+            if seat.forfeit is not None:
+                seat.forfeit.cancel()
+                seat.forfeit = None
+            seat.room = None
+
+    def leave(self, seat):
+        """
+        Игрок покидает очередь или сдает партию
+        """
+        if seat is None:
+            return
+        if seat.room is not None:
+            self.finish(seat.room, opponent(seat.symbol), "leave")
+            return
+        for queue in self.queues.values():
+            if seat in queue:
+                queue.remove(seat)
+
+    def disconnected(self, seat, writer):
+        """
+        При обрыве соединения держит место в партии до истечения reconnect_timeout
+        """
+        if seat is None or seat.writer is not writer:
+            return
+        seat.writer = None
+        room = seat.room
+        if room is None:
+            self.leave(seat)
+            return
+        room.seats[opponent(seat.symbol)].send({"type": "opponent_disconnected", "timeout": self.reconnect_timeout})
+        seat.forfeit = asyncio.get_running_loop().call_later(
+            self.reconnect_timeout, self.finish, room, opponent(seat.symbol), "timeout")
+
+
+async def serve(host, port, reconnect_timeout, report_interval):
+    server = GameServer(host, port, reconnect_timeout)
+    await server.start()
+    print(f"Сервер слушает {server.host}:{server.port}", file=sys.stderr)
+    try:
+        while True:
+            await asyncio.sleep(report_interval)
+            print(json.dumps(server.report(), ensure_ascii=False), file=sys.stderr)
+    finally:
+        await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Сервер сетевой игры с другом")
+    parser.add_argument("--host", default=HOST, help="адрес для входящих соединений")
+    parser.add_argument("--port", type=int, default=PORT, help="порт")
+    parser.add_argument("--reconnect-timeout", type=float, default=RECONNECT_TIMEOUT,
+                        help="сколько секунд ждать переподключения игрока")
+    parser.add_argument("--report-interval", type=float, default=10.0, help="период вывода статистики в секундах")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.reconnect_timeout, args.report_interval))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
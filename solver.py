@@ -0,0 +1,185 @@
+from engine import CELLS, SIZE, cell_coords, cell_index, check_stop, has_line, opponent
+import metrics
+
+WIN_SCORE = 10
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+MOVE_ORDER = (4, 0, 2, 6, 8, 1, 3, 5, 7)
+
+
+def _symmetries():
+    transforms = [
+        lambda r, c: (r, c),
+        lambda r, c: (c, SIZE - 1 - r),
+        lambda r, c: (SIZE - 1 - r, SIZE - 1 - c),
+        lambda r, c: (SIZE - 1 - c, r),
+        lambda r, c: (r, SIZE - 1 - c),
+        lambda r, c: (SIZE - 1 - r, c),
+        lambda r, c: (c, r),
+        lambda r, c: (SIZE - 1 - c, SIZE - 1 - r),
+    ]
+    perms = []
+    for transform in transforms:
+        perm = [0] * CELLS
+        for index in range(CELLS):
+            perm[index] = cell_index(*transform(*cell_coords(index)))
+        perms.append(tuple(perm))
+    return tuple(perms)
+
+
+SYMMETRIES = _symmetries()
+
+
+def _mask_table(perm):
+    table = []
+    for mask in range(1 << CELLS):
+        mapped = 0
+        for index in range(CELLS):
+            if mask >> index & 1:
+                mapped |= 1 << perm[index]
+        table.append(mapped)
+    return tuple(table)
+
+
+MASK_TABLES = tuple(_mask_table(perm) for perm in SYMMETRIES)
+
+
+def canonical_key(mine, theirs):
+    """
+    Возвращает ключ позиции, одинаковый для всех 8 поворотов и отражений поля
+    Позиция задается масками клеток ходящего игрока и его соперника
+    """
+    return min(table[mine] << CELLS | table[theirs] for table in MASK_TABLES)
+
+
+def symmetric_choice(mine, theirs, moves):
+    """
+    Выбирает из равноценных ходов тот, после которого позиция имеет наименьший канонический ключ
+    Правило не зависит от поворота и отражения поля, поэтому в симметричной позиции
+    выбирается симметричный ход
+    """
+    if len(moves) == 1:
+        return moves[0]
+    return min(moves, key=lambda index: (canonical_key(theirs, mine | 1 << index), index))
+
+
+SHARED_TABLE = {}
+
+
+class Solver:
+    """
+    Минимакс с альфа-бета отсечением и таблицей транспозиций
+    Оценки хранятся с точки зрения ходящего игрока, поэтому одна запись
+    подходит для позиции независимо от того, играет он за "X" или за "O"
+    """
+
+    def __init__(self, table=None):
+        self.table = {} if table is None else table
+        self.nodes = 0
+        self.table_hits = 0
+
+    def best_move(self, board, player, stop=None):
+        """
+        Возвращает оптимальную клетку для игрока player
+        Равноценные ходы оцениваются точно и выбираются по symmetric_choice
+        На пустом поле сразу занимает центр
+        Между ходами корня проверяет флаг отмены stop
+        """
+        mine = board.bits(player)
+        theirs = board.bits(opponent(player))
+        if not mine | theirs:
+            return cell_index(1, 1)
+
+        nodes, hits = self.nodes, self.table_hits
+        best_score = -WIN_SCORE - 1
+        best_moves = []
+        for index in range(CELLS):
+            bit = 1 << index
+            if (mine | theirs) & bit:
+                continue
+            check_stop(stop)
+            score = -self.negamax(theirs, mine | bit, -WIN_SCORE - 1, 1 - best_score)
+            if score > best_score:
+                best_score = score
+                best_moves = [index]
+            elif score == best_score:
+                best_moves.append(index)
+        if metrics.ENABLED:
+            metrics.count("solver_nodes", self.nodes - nodes)
+            metrics.count("solver_table_hits", self.table_hits - hits)
+            metrics.gauge("solver_table_size", len(self.table))
+        return symmetric_choice(mine, theirs, best_moves) if best_moves else None
+
+    def evaluate(self, board, player):
+        """
+        Возвращает точную оценку позиции для игрока, который сейчас ходит
+        """
+        return self.negamax(board.bits(player), board.bits(opponent(player)),
+                            -WIN_SCORE - 1, WIN_SCORE + 1)
+
+    def negamax(self, mine, theirs, alpha, beta):
+        """
+        Рекурсивная оценка позиции: mine — клетки ходящего игрока, theirs — соперника
+        Чем быстрее победа, тем выше оценка
+        """
+        self.nodes += 1
+        occupied = mine | theirs
+        stones = occupied.bit_count()
+        if has_line(theirs):
+            return stones - WIN_SCORE
+        if stones == CELLS:
+            return 0
+
+        key = canonical_key(mine, theirs)
+        entry = self.table.get(key)
+        if entry is not None:
+            self.table_hits += 1
+            value, flag = entry
+            if flag == EXACT:
+                return value
+            if flag == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                return value
+
+        alpha_orig = alpha
+        best = -WIN_SCORE - 1
+        for index in MOVE_ORDER:
+            bit = 1 << index
+            if occupied & bit:
+                continue
+            score = -self.negamax(theirs, mine | bit, -beta, -alpha)
+            if score > best:
+                best = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        if best <= alpha_orig:
+            flag = UPPER
+        elif best >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.table[key] = (best, flag)
+        return best
+
+
+_shared_solver = None
+
+
+def shared_solver():
+    """
+    Возвращает решатель с общей таблицей транспозиций,
+    которая сохраняется между партиями в пределах процесса
+    """
+    global _shared_solver
+    if _shared_solver is None:
+        _shared_solver = Solver(SHARED_TABLE)
+    return _shared_solver
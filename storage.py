@@ -0,0 +1,639 @@
+import logging
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+
+from cache import CACHE_SIZE, CACHE_TTL, ReadCache
+import metrics
+from passwords import hash_password, is_hashed, needs_rehash, verify_password
+from rating import INITIAL_RATING, Ratings, score_for, update
+
+log = logging.getLogger(__name__)
+
+DB_PATH = "tictactoe.db"
+LEGACY_USERS_DB = "player_stats.db"
+LEGACY_STATS_DB = "leaderboard.db"
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -8000",
+)
+
+User = namedtuple("User", "id username")
+GameRecord = namedtuple(
+    "GameRecord",
+    "id user_id mode difficulty board_size win_length first_player result started_at finished_at moves",
+)
+
+UserStats = namedtuple("UserStats", "mode difficulty wins draws losses")
+RankingRow = namedtuple("RankingRow", "id username wins draws losses")
+RatingRow = namedtuple("RatingRow", "id username bot rating games")
+BotGame = namedtuple("BotGame", "x_bot o_bot board_size win_length result finished_at")
+GameSummary = namedtuple(
+    "GameSummary",
+    "id mode difficulty board_size win_length first_player result finished_at move_count",
+)
+
+DRAW = "draw"
+
+STATS_MODE_SQL = "CASE WHEN {mode} LIKE 'ai%' THEN 'ai' ELSE {mode} END"
+
+GAME_COLUMNS = "id, user_id, mode, difficulty, board_size, win_length, first_player, result, started_at, finished_at, moves"
+
+RATED_GAMES_SQL = """
+    SELECT finished_at, 0, id, user_id, NULL, difficulty, result FROM games
+    WHERE user_id IS NOT NULL AND mode LIKE 'ai%' AND difficulty IS NOT NULL
+    UNION ALL
+    SELECT finished_at, 1, id, NULL, x_bot, o_bot, result FROM bot_games
+    ORDER BY 1, 2, 3
+"""
+
+
+def encode_moves(moves):
+    """
+    Упаковывает последовательность номеров клеток в BLOB: один байт на ход
+    """
+    return bytes(moves)
+
+
+def decode_moves(blob):
+    """
+    Распаковывает BLOB ходов обратно в список номеров клеток
+    """
+    return list(blob)
+
+
+def _create_schema(conn, legacy_dir):
+    conn.execute("""
+        CREATE TABLE users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL UNIQUE,
+            password TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE stats (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL UNIQUE REFERENCES users (id) ON DELETE CASCADE,
+            wins INTEGER NOT NULL DEFAULT 0,
+            losses INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("CREATE INDEX stats_wins_idx ON stats (wins DESC)")
+
+
+def _read_legacy(path, table, query):
+    if not os.path.exists(path):
+        return []
+    legacy = sqlite3.connect(path)
+    try:
+        if not legacy.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone():
+            return []
+        return legacy.execute(query).fetchall()
+    finally:
+        legacy.close()
+
+
+def _import_legacy(conn, legacy_dir):
+    users = _read_legacy(
+        os.path.join(legacy_dir, LEGACY_USERS_DB), "users",
+        "SELECT id, username, password FROM users WHERE username IS NOT NULL AND password IS NOT NULL")
+    conn.executemany("INSERT OR IGNORE INTO users (id, username, password) VALUES (?, ?, ?)", users)
+
+    stats = _read_legacy(
+        os.path.join(legacy_dir, LEGACY_STATS_DB), "stats",
+        "SELECT user_id, SUM(wins), SUM(losses) FROM stats WHERE user_id IS NOT NULL GROUP BY user_id")
+    conn.executemany("""
+        INSERT OR IGNORE INTO stats (user_id, wins, losses)
+        SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM users WHERE id = ?)
+    """, [(user_id, wins, losses, user_id) for user_id, wins, losses in stats])
+    conn.execute("INSERT OR IGNORE INTO stats (user_id) SELECT id FROM users")
+
+
+def _hash_plaintext_passwords(conn, legacy_dir):
+    rows = conn.execute("SELECT id, password FROM users").fetchall()
+    conn.executemany("UPDATE users SET password = ? WHERE id = ?", [
+        (hash_password(password), user_id) for user_id, password in rows if not is_hashed(password)
+    ])
+
+
+def _create_games(conn, legacy_dir):
+    conn.execute("""
+        CREATE TABLE games (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER REFERENCES users (id),
+            mode TEXT NOT NULL,
+            difficulty TEXT,
+            board_size INTEGER NOT NULL,
+            win_length INTEGER NOT NULL,
+            first_player TEXT NOT NULL,
+            result TEXT NOT NULL,
+            started_at REAL NOT NULL,
+            finished_at REAL NOT NULL,
+            moves BLOB NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX games_user_idx ON games (user_id, id)")
+    conn.execute("""
+        CREATE TRIGGER games_no_update BEFORE UPDATE ON games
+        BEGIN SELECT RAISE(ABORT, 'games is append-only'); END
+    """)
+    conn.execute("""
+        CREATE TRIGGER games_no_delete BEFORE DELETE ON games
+        BEGIN SELECT RAISE(ABORT, 'games is append-only'); END
+    """)
+
+
+def _create_user_stats(conn, legacy_dir):
+    conn.execute("""
+        CREATE TABLE user_stats (
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            mode TEXT NOT NULL,
+            difficulty TEXT NOT NULL,
+            wins INTEGER NOT NULL DEFAULT 0,
+            draws INTEGER NOT NULL DEFAULT 0,
+            losses INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, mode, difficulty)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX user_stats_rank_idx ON user_stats (mode, difficulty, wins DESC, user_id)")
+    conn.execute(f"""
+        CREATE TRIGGER games_user_stats AFTER INSERT ON games WHEN NEW.user_id IS NOT NULL
+        BEGIN
+            INSERT INTO user_stats (user_id, mode, difficulty, wins, draws, losses)
+            VALUES (NEW.user_id, {STATS_MODE_SQL.format(mode="NEW.mode")}, COALESCE(NEW.difficulty, ''),
+                    NEW.result = 'X', NEW.result = '{DRAW}', NEW.result = 'O')
+            ON CONFLICT (user_id, mode, difficulty) DO UPDATE SET
+                wins = wins + excluded.wins,
+                draws = draws + excluded.draws,
+                losses = losses + excluded.losses;
+        END
+    """)
+    conn.execute(f"""
+        INSERT INTO user_stats (user_id, mode, difficulty, wins, draws, losses)
+        SELECT user_id, {STATS_MODE_SQL.format(mode="mode")}, COALESCE(difficulty, ''),
+               SUM(result = 'X'), SUM(result = '{DRAW}'), SUM(result = 'O')
+        FROM games WHERE user_id IS NOT NULL
+        GROUP BY 1, 2, 3
+    """)
+    conn.execute("""
+        INSERT INTO user_stats (user_id, mode, difficulty, wins, losses)
+        SELECT user_id, 'ai', 'hard', wins, losses FROM stats WHERE wins > 0 OR losses > 0
+        ON CONFLICT (user_id, mode, difficulty) DO UPDATE SET
+            wins = max(wins, excluded.wins),
+            losses = max(losses, excluded.losses)
+    """)
+
+
+def game_match(user_id, mode, difficulty, result):
+    """
+    Участники рейтинговой партии: ((user_id, бот), (user_id, бот), очки первого) или None
+    Рейтинг меняют партии пользователя (он всегда играет за X) против ИИ и партии ботов
+    между собой; игра с другом за одним компьютером в рейтинг не идет
+    """
+    if user_id is None or not mode.startswith("ai") or not difficulty:
+        return None
+    return (user_id, None), (None, difficulty), score_for(result, "X")
+
+
+def bot_match(game):
+    if game.x_bot == game.o_bot:
+        return None
+    return (None, game.x_bot), (None, game.o_bot), score_for(game.result, "X")
+
+
+def _rating_player(conn, user_id, bot):
+    """
+    Возвращает (id, рейтинг) игрока, создавая запись перед его первой партией
+    """
+    column, value = ("user_id", user_id) if user_id is not None else ("bot", bot)
+    conn.execute(f"INSERT OR IGNORE INTO ratings ({column}) VALUES (?)", (value,))
+    return conn.execute(f"SELECT id, rating FROM ratings WHERE {column} = ?", (value,)).fetchone()
+
+
+def _rate(conn, first, second, score):
+    """
+    Обновляет рейтинги двух игроков после одной партии
+    """
+    first_id, first_rating = _rating_player(conn, *first)
+    second_id, second_rating = _rating_player(conn, *second)
+    first_rating, second_rating = update(first_rating, second_rating, score)
+    conn.executemany("UPDATE ratings SET rating = ?, games = games + 1 WHERE id = ?",
+                     ((first_rating, first_id), (second_rating, second_id)))
+
+
+def _rebuild_ratings(conn):
+    """
+    Пересчитывает все рейтинги одним проходом по партиям пользователей и ботов
+    в порядке завершения; в памяти хранятся только текущие рейтинги игроков
+    Возвращает количество учтенных партий
+    """
+    ratings = Ratings()
+    count = 0
+    for _, source, _, user_id, x_bot, o_bot, result in conn.execute(RATED_GAMES_SQL):
+        if source == 0:
+            match = game_match(user_id, "ai", o_bot, result)
+        else:
+            match = bot_match(BotGame(x_bot, o_bot, None, None, result, None))
+        if match is not None:
+            ratings.play(*match)
+            count += 1
+    conn.execute("DELETE FROM ratings")
+    conn.executemany(
+        "INSERT INTO ratings (user_id, bot, rating, games) VALUES (?, ?, ?, ?)",
+        [(user_id, bot, value, ratings.games[(user_id, bot)]) for (user_id, bot), value in ratings.ratings.items()],
+    )
+    return count
+
+
+def _create_ratings(conn, legacy_dir):
+    conn.execute(f"""
+        CREATE TABLE ratings (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER UNIQUE REFERENCES users (id),
+            bot TEXT UNIQUE,
+            rating REAL NOT NULL DEFAULT {INITIAL_RATING},
+            games INTEGER NOT NULL DEFAULT 0,
+            CHECK ((user_id IS NULL) <> (bot IS NULL))
+        )
+    """)
+    conn.execute("CREATE INDEX ratings_rank_idx ON ratings (rating DESC, id)")
+    conn.execute("""
+        CREATE TABLE bot_games (
+            id INTEGER PRIMARY KEY,
+            x_bot TEXT NOT NULL,
+            o_bot TEXT NOT NULL,
+            board_size INTEGER NOT NULL,
+            win_length INTEGER NOT NULL,
+            result TEXT NOT NULL,
+            finished_at REAL NOT NULL
+        )
+    """)
+    _rebuild_ratings(conn)
+
+
+def _drop_legacy_stats(conn, legacy_dir):
+    """
+    Старые итоги побед и поражений перенесены в user_stats при создании этой таблицы
+    """
+    conn.execute("DROP TABLE stats")
+
+
+MIGRATIONS = (
+    _create_schema,
+    _import_legacy,
+    _hash_plaintext_passwords,
+    _create_games,
+    _create_user_stats,
+    _create_ratings,
+    _drop_legacy_stats,
+)
+
+
+class Storage:
+    """
+    Единое хранилище пользователей и статистики в одной базе SQLite
+    Владеет одним соединением в режиме WAL; доступ из разных потоков сериализуется блокировкой
+    При открытии применяет недостающие миграции схемы, включая импорт старых файлов
+    password_cost — параметр стоимости scrypt (n); None — значение по умолчанию из passwords
+    Статистика пользователей и первые страницы рейтингов кэшируются в памяти (ReadCache
+    с cache_size записями и временем жизни cache_ttl секунд) и сбрасываются при записи
+    """
+
+    def __init__(self, path=DB_PATH, legacy_dir=None, password_cost=None, cache_size=CACHE_SIZE,
+                 cache_ttl=CACHE_TTL):
+        self.lock = threading.RLock()
+        self.password_cost = password_cost
+        self.cache = ReadCache(cache_size, cache_ttl)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        try:
+            for pragma in PRAGMAS:
+                self.conn.execute(pragma)
+            self.migrate(legacy_dir if legacy_dir is not None else os.path.dirname(os.path.abspath(path)))
+        except sqlite3.Error:
+            self.conn.close()
+            raise
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    @property
+    def version(self):
+        return self.conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def migrate(self, legacy_dir):
+        """
+        Применяет миграции, номер которых больше PRAGMA user_version
+        Каждая миграция выполняется в отдельной транзакции вместе с обновлением версии
+        """
+        with self.lock:
+            for version, migration in enumerate(MIGRATIONS, start=1):
+                if self.version >= version:
+                    continue
+                self.conn.execute("BEGIN IMMEDIATE")
+                try:
+                    migration(self.conn, legacy_dir)
+                    self.conn.execute(f"PRAGMA user_version = {version}")
+                except BaseException:
+                    self.conn.execute("ROLLBACK")
+                    raise
+                self.conn.execute("COMMIT")
+
+    @metrics.timed("db_query_seconds")
+    def create_user(self, username, password):
+        """
+        Создает пользователя
+        Пароль сохраняется в виде соленого хеша scrypt; хеширование медленное,
+        поэтому метод не следует вызывать из потока интерфейса
+        Возвращает User или None, если имя уже занято
+        """
+        password_hash = hash_password(password, self.password_cost)
+        with self.lock:
+            try:
+                with self.conn:
+                    cursor = self.conn.execute(
+                        "INSERT INTO users (username, password) VALUES (?, ?)", (username, password_hash))
+            except sqlite3.IntegrityError:
+                return None
+            return User(cursor.lastrowid, username)
+
+    @metrics.timed("db_query_seconds")
+    def find_user(self, username):
+        """
+        Возвращает User по имени или None
+        """
+        with self.lock:
+            row = self.conn.execute("SELECT id, username FROM users WHERE username = ?", (username,)).fetchone()
+        return User(*row) if row else None
+
+    @metrics.timed("db_query_seconds")
+    def check_credentials(self, username, password):
+        """
+        Возвращает User, если имя и пароль совпадают, иначе None
+        Хеш, сохраненный с устаревшей стоимостью, пересчитывается после успешной проверки
+        Проверка медленная, поэтому метод не следует вызывать из потока интерфейса
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT id, username, password FROM users WHERE username = ?", (username,)).fetchone()
+        if row is None or not verify_password(password, row[2]):
+            return None
+        if needs_rehash(row[2], self.password_cost):
+            password_hash = hash_password(password, self.password_cost)
+            with self.lock, self.conn:
+                self.conn.execute("UPDATE users SET password = ? WHERE id = ?", (password_hash, row[0]))
+        return User(row[0], row[1])
+
+    @metrics.timed("db_query_seconds")
+    def write_batch(self, games):
+        """
+        Записывает завершенные партии (список GameRecord, поле id игнорируется) одной транзакцией
+        Итоги пользователей обновляет триггер, рейтинги — эта же транзакция
+        Ходы партий хранятся в виде BLOB, один байт на ход
+        """
+        with self.lock, self.conn:
+            self.conn.executemany(f"""
+                INSERT INTO games ({GAME_COLUMNS}) VALUES (NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [(game.user_id, game.mode, game.difficulty, game.board_size, game.win_length,
+                   game.first_player, game.result, game.started_at, game.finished_at,
+                   encode_moves(game.moves)) for game in games])
+            for game in games:
+                match = game_match(game.user_id, game.mode, game.difficulty, game.result)
+                if match is not None:
+                    _rate(self.conn, *match)
+        self.cache.invalidate("user_stats", "ranking", "rating", "rating_page", "history")
+
+    @metrics.timed("db_query_seconds")
+    def record_bot_games(self, games):
+        """
+        Записывает партии ботов между собой (список BotGame) и обновляет их рейтинги
+        одной транзакцией в порядке списка
+        """
+        with self.lock, self.conn:
+            self.conn.executemany("""
+                INSERT INTO bot_games (x_bot, o_bot, board_size, win_length, result, finished_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, games)
+            for game in games:
+                match = bot_match(game)
+                if match is not None:
+                    _rate(self.conn, *match)
+        self.cache.invalidate("rating_page")
+
+    def recompute_ratings(self):
+        """
+        Пересчитывает рейтинги всех игроков и ботов с нуля по сохраненным партиям
+        Возвращает количество учтенных партий
+        """
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                count = _rebuild_ratings(self.conn)
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+        self.cache.invalidate("rating", "rating_page")
+        return count
+
+    @metrics.timed("db_query_seconds")
+    def rating_page(self, after=None, limit=50):
+        """
+        Возвращает страницу общего рейтинга пользователей и ботов (список RatingRow)
+        Использует индекс по рейтингу; after — ключ (рейтинг, id) последней загруженной строки
+        Первая страница кэшируется
+        """
+        if after is None:
+            return self.cache.get(("rating_page", limit), lambda: self._rating_page(None, limit))
+        return self._rating_page(after, limit)
+
+    def _rating_page(self, after, limit):
+        rating, row_id = after if after is not None else (float("inf"), 0)
+        with self.lock:
+            rows = self.conn.execute("""
+                SELECT r.id, u.username, r.bot, r.rating, r.games
+                FROM ratings AS r
+                LEFT JOIN users AS u ON u.id = r.user_id
+                WHERE r.rating < :rating OR (r.rating = :rating AND r.id > :id)
+                ORDER BY r.rating DESC, r.id
+                LIMIT :limit
+            """, {"rating": rating, "id": row_id, "limit": limit}).fetchall()
+        return [RatingRow(*row) for row in rows]
+
+    @metrics.timed("db_query_seconds")
+    def user_rating(self, user_id):
+        """
+        Возвращает (рейтинг, количество рейтинговых партий) пользователя
+        """
+        return self.cache.get(("rating", user_id), lambda: self._user_rating(user_id))
+
+    def _user_rating(self, user_id):
+        with self.lock:
+            row = self.conn.execute("SELECT rating, games FROM ratings WHERE user_id = ?", (user_id,)).fetchone()
+        return tuple(row) if row else (INITIAL_RATING, 0)
+
+    @metrics.timed("db_query_seconds")
+    def user_stats(self, user_id):
+        """
+        Возвращает готовые итоги пользователя по режимам и уровням сложности (список UserStats)
+        Итоги поддерживаются триггером при записи каждой партии
+        """
+        return self.cache.get(("user_stats", user_id), lambda: self._user_stats(user_id))
+
+    def _user_stats(self, user_id):
+        with self.lock:
+            rows = self.conn.execute("""
+                SELECT mode, difficulty, wins, draws, losses FROM user_stats
+                WHERE user_id = ? ORDER BY mode, difficulty
+            """, (user_id,)).fetchall()
+        return [UserStats(*row) for row in rows]
+
+    @metrics.timed("db_query_seconds")
+    def ranking_page(self, mode, difficulty="", after=None, limit=50):
+        """
+        Возвращает страницу рейтинга для режима ("ai" или "friend") и уровня сложности
+        Использует индекс по (режим, сложность, победы); after — ключ (победы, id пользователя)
+        Первая страница кэшируется
+        """
+        if after is None:
+            return self.cache.get(("ranking", mode, difficulty, limit),
+                                  lambda: self._ranking_page(mode, difficulty, None, limit))
+        return self._ranking_page(mode, difficulty, after, limit)
+
+    def _ranking_page(self, mode, difficulty, after, limit):
+        wins, user_id = after if after is not None else (2 ** 63 - 1, 0)
+        with self.lock:
+            rows = self.conn.execute("""
+                SELECT s.user_id, u.username, s.wins, s.draws, s.losses
+                FROM user_stats AS s
+                JOIN users AS u ON u.id = s.user_id
+                WHERE s.mode = :mode AND s.difficulty = :difficulty
+                  AND (s.wins < :wins OR (s.wins = :wins AND s.user_id > :id))
+                ORDER BY s.wins DESC, s.user_id
+                LIMIT :limit
+            """, {"mode": mode, "difficulty": difficulty, "wins": wins, "id": user_id, "limit": limit}).fetchall()
+        return [RankingRow(*row) for row in rows]
+
+    @metrics.timed("db_query_seconds")
+    def game_history_page(self, user_id, before=None, limit=50):
+        """
+        Возвращает страницу истории партий пользователя от новых к старым (список GameSummary)
+        Ходы не читаются и не распаковываются; before — id последней загруженной партии
+        Выборка идет по индексу (пользователь, id), поэтому не зависит от длины истории
+        Первая страница кэшируется
+        """
+        if before is None:
+            return self.cache.get(("history", user_id, limit), lambda: self._game_history_page(user_id, None, limit))
+        return self._game_history_page(user_id, before, limit)
+
+    def _game_history_page(self, user_id, before, limit):
+        with self.lock:
+            rows = self.conn.execute("""
+                SELECT id, mode, difficulty, board_size, win_length, first_player, result, finished_at,
+                       length(moves)
+                FROM games
+                WHERE user_id = ? AND id < ?
+                ORDER BY id DESC
+                LIMIT ?
+            """, (user_id, before if before is not None else 2 ** 63 - 1, limit)).fetchall()
+        return [GameSummary(*row) for row in rows]
+
+    @metrics.timed("db_query_seconds")
+    def get_game(self, game_id):
+        """
+        Возвращает партию (GameRecord) по id или None
+        """
+        with self.lock:
+            row = self.conn.execute(f"SELECT {GAME_COLUMNS} FROM games WHERE id = ?", (game_id,)).fetchone()
+        return GameRecord(*row[:-1], decode_moves(row[-1])) if row else None
+
+    def iter_games(self, user_id=None, after_id=0, batch_size=1000):
+        """
+        Генератор партий в порядке записи с постраничной выборкой по id
+        Блокировка удерживается только на время чтения одной страницы
+        """
+        while True:
+            with self.lock:
+                if user_id is None:
+                    rows = self.conn.execute(
+                        f"SELECT {GAME_COLUMNS} FROM games WHERE id > ? ORDER BY id LIMIT ?",
+                        (after_id, batch_size)).fetchall()
+                else:
+                    rows = self.conn.execute(
+                        f"SELECT {GAME_COLUMNS} FROM games WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?",
+                        (user_id, after_id, batch_size)).fetchall()
+            for row in rows:
+                yield GameRecord(*row[:-1], decode_moves(row[-1]))
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1][0]
+
+
+class ResultBuffer:
+    """
+    Отложенная запись завершенных партий
+    Партии накапливаются в памяти и сохраняются одной транзакцией: по таймеру,
+    при достижении max_pending партий или при закрытии
+    """
+
+    def __init__(self, storage, max_pending=100, flush_interval=2.0):
+        self.storage = storage
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.games = []
+        self.closed = threading.Event()
+        self.thread = None
+        if flush_interval:
+            self.thread = threading.Thread(target=self._run, name="result-buffer", daemon=True)
+            self.thread.start()
+
+    def add_game(self, game):
+        """
+        Добавляет запись завершенной партии (GameRecord) в буфер; при переполнении сразу записывает буфер
+        """
+        with self.lock:
+            self.games.append(game)
+            full = len(self.games) >= self.max_pending
+        if full:
+            self.flush()
+
+    def flush(self):
+        """
+        Записывает накопленные данные; при ошибке возвращает их в буфер и пробрасывает исключение
+        Сбросы выполняются строго по очереди, поэтому партии попадают в базу в порядке завершения
+        """
+        with self.flush_lock:
+            with self.lock:
+                games, self.games = self.games, []
+            if not games:
+                return
+            try:
+                self.storage.write_batch(games)
+            except sqlite3.Error:
+                with self.lock:
+                    self.games[:0] = games
+                raise
+
+    def close(self):
+        """
+        Останавливает таймер и записывает оставшиеся данные
+        """
+        self.closed.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.flush()
+
+    def _run(self):
+        while not self.closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error:
+                log.exception("Не удалось записать буфер партий, повтор через %s с", self.flush_interval)
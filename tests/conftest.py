@@ -0,0 +1,43 @@
+import pytest
+
+import reference as ref
+
+
+def pytest_addoption(parser):
+    parser.addoption("--update-baseline", action="store_true",
+                     help="сохранить текущие замеры производительности как базовые")
+    parser.addoption("--timing", action="store_true",
+                     help="проверить время работы относительно базовых замеров (зависит от машины)")
+
+
+def pytest_collection_modifyitems(config, items):
+    """
+    Замеры времени записаны на одной машине, поэтому по умолчанию пропускаются;
+    их включают --timing или --update-baseline
+    """
+    if config.getoption("--timing") or config.getoption("--update-baseline"):
+        return
+    skip = pytest.mark.skip(reason="замеры времени включаются параметром --timing")
+    for item in items:
+        if "timing" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture(scope="session")
+def reference():
+    return ref.Reference()
+
+
+@pytest.fixture(scope="session")
+def positions():
+    return ref.reachable_positions()
+
+
+@pytest.fixture(scope="session")
+def open_positions(positions):
+    """
+    Незавершенные достижимые позиции: список (маска X, маска O, ходящий игрок)
+    """
+    return [(x_bits, o_bits, player) for (x_bits, o_bits), player in positions.items()
+            if not ref.is_terminal(x_bits, o_bits)]
+
@@ -0,0 +1,120 @@
+"""
+Эталонные реализации для проверки движка: строятся по координатам клеток
+и полным перебором, без масок, таблиц и отсечений из рабочего кода
+"""
+
+from engine import CELLS, SIZE, X, opponent
+from solver import SYMMETRIES, WIN_SCORE
+
+
+def reference_lines(size, win_length):
+    """
+    Битовые маски всех выигрышных отрезков поля
+    """
+    lines = []
+    for row in range(size):
+        for col in range(size):
+            for d_row, d_col in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                end_row = row + d_row * (win_length - 1)
+                end_col = col + d_col * (win_length - 1)
+                if 0 <= end_row < size and 0 <= end_col < size:
+                    lines.append(sum(1 << (row + d_row * i) * size + col + d_col * i for i in range(win_length)))
+    return lines
+
+
+CLASSIC_LINES = reference_lines(SIZE, SIZE)
+
+
+def has_line(bits, lines=CLASSIC_LINES):
+    return any(bits & line == line for line in lines)
+
+
+def lines_by_cell(lines, cells):
+    """
+    Отрезки, проходящие через каждую клетку: проверка хода смотрит только их
+    """
+    return [[line for line in lines if line >> index & 1] for index in range(cells)]
+
+
+def winner(x_bits, o_bits):
+    if has_line(x_bits):
+        return X
+    if has_line(o_bits):
+        return opponent(X)
+    return None
+
+
+def is_terminal(x_bits, o_bits):
+    return winner(x_bits, o_bits) is not None or (x_bits | o_bits).bit_count() == CELLS
+
+
+def reachable_positions():
+    """
+    Все позиции 3x3, достижимые из пустого поля: (маска X, маска O) -> символ ходящего игрока
+    """
+    positions = {}
+    stack = [(0, 0)]
+    while stack:
+        x_bits, o_bits = stack.pop()
+        if (x_bits, o_bits) in positions:
+            continue
+        player = X if x_bits.bit_count() == o_bits.bit_count() else opponent(X)
+        positions[(x_bits, o_bits)] = player
+        if is_terminal(x_bits, o_bits):
+            continue
+        for index in range(CELLS):
+            bit = 1 << index
+            if not (x_bits | o_bits) & bit:
+                stack.append((x_bits | bit, o_bits) if player == X else (x_bits, o_bits | bit))
+    return positions
+
+
+def transform(bits, perm):
+    """
+    Применяет к маске клеток симметрию поля perm (номер клетки -> новый номер)
+    """
+    return sum(1 << perm[index] for index in range(CELLS) if bits >> index & 1)
+
+
+def stabilizer(x_bits, o_bits):
+    """
+    Симметрии, переводящие позицию саму в себя
+    """
+    return [perm for perm in SYMMETRIES if transform(x_bits, perm) == x_bits and transform(o_bits, perm) == o_bits]
+
+
+class Reference:
+    """
+    Полный перебор поля 3x3 без отсечений и симметрий; оценки в шкале Solver:
+    stones - WIN_SCORE при поражении ходящего, 0 при ничьей, быстрее победа — выше оценка
+    """
+
+    def __init__(self):
+        self.values = {}
+
+    def value(self, mine, theirs):
+        key = (mine, theirs)
+        value = self.values.get(key)
+        if value is not None:
+            return value
+        occupied = mine | theirs
+        stones = occupied.bit_count()
+        if has_line(theirs):
+            value = stones - WIN_SCORE
+        elif stones == CELLS:
+            value = 0
+        else:
+            value = max(-self.value(theirs, mine | 1 << index) for index in range(CELLS)
+                        if not occupied >> index & 1)
+        self.values[key] = value
+        return value
+
+    def optimal_moves(self, mine, theirs):
+        """
+        Клетки, ход в которые сохраняет оценку позиции
+        """
+        occupied = mine | theirs
+        scores = {index: -self.value(theirs, mine | 1 << index) for index in range(CELLS)
+                  if not occupied >> index & 1}
+        best = max(scores.values())
+        return {index for index, score in scores.items() if score == best}
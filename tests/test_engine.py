@@ -0,0 +1,58 @@
+from engine import X, Board, opponent
+
+import reference as ref
+
+REACHABLE_POSITIONS = 5478
+
+
+def test_reachable_position_count(positions):
+    assert len(positions) == REACHABLE_POSITIONS
+
+
+def test_incremental_winner_matches_reference():
+    """
+    Обход всех партий ходами и отменой ходов на одном Board: победитель, которого движок
+    находит по отрезкам через последнюю клетку, совпадает с полным перебором отрезков
+    """
+    board = Board()
+    seen = set()
+    mismatches = []
+
+    def visit(player):
+        key = (board.x_bits, board.o_bits)
+        if key in seen:
+            return
+        seen.add(key)
+        expected = ref.winner(*key)
+        if board.winner() != expected or board.check_winner(X) != (expected == X) \
+                or board.check_winner(opponent(X)) != (expected == opponent(X)):
+            mismatches.append((key, board.winner(), expected))
+        if board.is_terminal():
+            return
+        for index in board.legal_moves():
+            board.play(index, player)
+            visit(opponent(player))
+            board.undo()
+
+    visit(X)
+    assert len(seen) == REACHABLE_POSITIONS
+    assert not mismatches, mismatches[:5]
+
+
+def test_from_bits_winner_and_draw(positions):
+    for x_bits, o_bits in positions:
+        board = Board.from_bits(x_bits, o_bits)
+        expected = ref.winner(x_bits, o_bits)
+        assert board.winner() == expected, (x_bits, o_bits)
+        assert board.check_draw() == (expected is None and (x_bits | o_bits).bit_count() == board.cells)
+        assert board.is_terminal() == ref.is_terminal(x_bits, o_bits)
+
+
+def test_undo_restores_position():
+    board = Board()
+    board.play(4, X)
+    board.play(0, opponent(X))
+    before = (board.x_bits, board.o_bits, list(board.history), board.winner())
+    board.play(8, X)
+    assert board.undo() == 8
+    assert (board.x_bits, board.o_bits, board.history, board.winner()) == before
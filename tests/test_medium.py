@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+from engine import BOARD_VARIANTS, CELLS, X, Board, medium_move, opponent, random_move
+
+import reference as ref
+
+CLASSIC_CELL_LINES = ref.lines_by_cell(ref.CLASSIC_LINES, CELLS)
+SEEDS = range(20)
+POSITIONS_PER_SEED = 25
+
+
+def assert_wins_or_blocks(board, player, move, cell_lines):
+    """
+    Средний уровень выигрывает сразу, если может, иначе закрывает выигрыш соперника
+    """
+    free = board.legal_moves()
+    assert move in free
+    mine, theirs = board.bits(player), board.bits(opponent(player))
+    wins = [index for index in free if ref.has_line(mine | 1 << index, cell_lines[index])]
+    blocks = [index for index in free if ref.has_line(theirs | 1 << index, cell_lines[index])]
+    if wins:
+        assert move in wins, (board.history, move, wins)
+    elif blocks:
+        assert move in blocks, (board.history, move, blocks)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_medium_wins_or_blocks_in_every_classic_position(open_positions, seed):
+    rng = random.Random(seed)
+    for x_bits, o_bits, player in open_positions:
+        board = Board.from_bits(x_bits, o_bits)
+        assert_wins_or_blocks(board, player, medium_move(board, player, rng), CLASSIC_CELL_LINES)
+
+
+def random_position(size, win_length, rng):
+    """
+    Случайная незавершенная позиция после случайного числа случайных ходов
+    """
+    while True:
+        board = Board(size, win_length)
+        player = X
+        for _ in range(rng.randrange(size * size)):
+            board.play(random_move(board, rng), player)
+            player = opponent(player)
+            if board.is_terminal():
+                break
+        if not board.is_terminal():
+            return board, player
+
+
+@pytest.mark.parametrize("size, win_length", BOARD_VARIANTS[1:])
+@pytest.mark.parametrize("seed", SEEDS)
+def test_medium_wins_or_blocks_on_random_large_positions(size, win_length, seed):
+    rng = random.Random(seed)
+    cell_lines = ref.lines_by_cell(ref.reference_lines(size, win_length), size * size)
+    for _ in range(POSITIONS_PER_SEED):
+        board, player = random_position(size, win_length, rng)
+        assert_wins_or_blocks(board, player, medium_move(board, player, rng), cell_lines)
@@ -0,0 +1,88 @@
+import pytest
+
+from analysis import position_value
+from book import load_book, perfect_move
+from engine import SIZE, X, Board, opponent
+from solver import SYMMETRIES, Solver
+
+import reference as ref
+
+
+def sides(board, player):
+    return board.bits(player), board.bits(opponent(player))
+
+
+def test_empty_board_is_a_draw(reference):
+    assert reference.value(0, 0) == 0
+
+
+def test_book_matches_reference(reference, open_positions):
+    book = load_book()
+    assert book is not None, "таблица идеальной игры не загружена"
+    for x_bits, o_bits, player in open_positions:
+        mine, theirs = sides(Board.from_bits(x_bits, o_bits), player)
+        if not mine | theirs:
+            continue
+        optimal = reference.optimal_moves(mine, theirs)
+        expected = (sum(1 << index for index in optimal), reference.value(mine, theirs))
+        assert book.lookup(mine, theirs) == expected, (x_bits, o_bits)
+
+
+def test_hard_and_solver_moves_are_optimal(reference, open_positions):
+    solver = Solver()
+    for x_bits, o_bits, player in open_positions:
+        board = Board.from_bits(x_bits, o_bits)
+        optimal = reference.optimal_moves(*sides(board, player))
+        hard = perfect_move(board, player)
+        assert hard in optimal, (x_bits, o_bits, hard, optimal)
+        assert solver.best_move(board, player) == hard, (x_bits, o_bits)
+
+
+def test_analysis_matches_reference(reference, open_positions):
+    for x_bits, o_bits, player in open_positions:
+        mine, theirs = sides(Board.from_bits(x_bits, o_bits), player)
+        assert position_value(SIZE, SIZE, mine, theirs) == reference.value(mine, theirs), (x_bits, o_bits)
+
+
+@pytest.mark.parametrize("hard_player", ["X", "O"])
+def test_hard_never_loses(hard_player):
+    """
+    Сложный ИИ отвечает на каждый возможный ход соперника и не проигрывает ни одной партии
+    """
+    board = Board()
+    losses = []
+    games = 0
+
+    def visit(player):
+        nonlocal games
+        if board.is_terminal():
+            games += 1
+            if board.winner() == opponent(hard_player):
+                losses.append(list(board.history))
+            return
+        moves = [perfect_move(board, player)] if player == hard_player else board.legal_moves()
+        for index in moves:
+            board.play(index, player)
+            visit(opponent(player))
+            board.undo()
+
+    visit(X)
+    assert games
+    assert not losses, losses[:5]
+
+
+@pytest.mark.parametrize("perm", SYMMETRIES, ids=range(len(SYMMETRIES)))
+def test_symmetric_positions_get_symmetric_moves(reference, open_positions, perm):
+    """
+    Ход сложного ИИ в отраженной позиции — отраженный ход исходной позиции
+    Если позиция сама симметрична, равноценные ходы неразличимы, и ход сверяется
+    с точностью до симметрий, сохраняющих позицию
+    """
+    for x_bits, o_bits, player in open_positions:
+        board = Board.from_bits(x_bits, o_bits)
+        mapped = Board.from_bits(ref.transform(x_bits, perm), ref.transform(o_bits, perm))
+        assert reference.value(*sides(mapped, player)) == reference.value(*sides(board, player))
+
+        move = perfect_move(board, player)
+        expected = {perm[own[move]] for own in ref.stabilizer(x_bits, o_bits)}
+        assert perfect_move(mapped, player) in expected, (x_bits, o_bits, move)
@@ -0,0 +1,141 @@
+"""
+Пороги производительности ИИ относительно tests/perf_baseline.json
+Число узлов поиска детерминировано, не зависит от машины и не должно расти; эти проверки выполняются всегда
+Время — лучший из REPEAT прогонов, и оно может превышать базовое не больше чем в 1 + tolerance раз
+(tolerance задан для каждого замера). Базовое время записано на конкретной машине, поэтому проверки
+времени помечены timing и выполняются только с --timing: pytest tests/test_performance.py --timing
+Новые базовые значения: pytest tests/test_performance.py --update-baseline
+"""
+
+import json
+import os
+import random
+import time
+
+import pytest
+
+from book import load_book, perfect_move
+from engine import BOARD_VARIANTS, X, Board, medium_move, opponent
+from search import HeuristicSearch
+from solver import Solver
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perf_baseline.json")
+REPEAT = 7
+DEFAULT_TOLERANCE = 1.0
+
+
+class Baseline:
+    def __init__(self, data, update):
+        self.nodes = data.get("nodes", {})
+        self.timings = data.get("timings_us", {})
+        self.update = update
+
+    def check_nodes(self, name, nodes):
+        if self.update:
+            self.nodes[name] = nodes
+            return
+        assert nodes <= self.nodes[name], f"{name}: {nodes} узлов, базовое значение {self.nodes[name]}"
+
+    def check_time(self, name, microseconds):
+        gate = self.timings.setdefault(name, {"value": microseconds, "tolerance": DEFAULT_TOLERANCE})
+        if self.update:
+            gate["value"] = round(microseconds, 3)
+            return
+        limit = gate["value"] * (1 + gate["tolerance"])
+        assert microseconds <= limit, f"{name}: {microseconds:.2f} мкс при допустимых {limit:.2f} мкс"
+
+    def to_dict(self):
+        return {"nodes": self.nodes, "timings_us": self.timings}
+
+
+@pytest.fixture(scope="module")
+def baseline(request):
+    update = request.config.getoption("--update-baseline")
+    try:
+        with open(BASELINE_PATH, encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        if not update:
+            raise
+        data = {}
+    gates = Baseline(data, update)
+    yield gates
+    if update:
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump(gates.to_dict(), f, indent=2, sort_keys=True)
+            f.write("\n")
+
+
+@pytest.fixture(scope="module")
+def boards(open_positions):
+    load_book()
+    return [(Board.from_bits(x_bits, o_bits), player) for x_bits, o_bits, player in open_positions]
+
+
+def best_per_call_us(func, items, repeat=REPEAT):
+    """
+    Среднее время одного вызова func(item) в микросекундах по лучшему из repeat проходов
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for item in items:
+            func(item)
+        best = min(best, time.perf_counter() - started)
+    return best / len(items) * 1e6
+
+
+def corner_opening():
+    board = Board()
+    board.play(0, X)
+    return board
+
+
+def search_position():
+    size, win_length = BOARD_VARIANTS[1]
+    board = Board(size, win_length)
+    for index, player in zip((12, 6, 8, 18), (X, opponent(X), X, opponent(X))):
+        board.play(index, player)
+    return board
+
+
+def test_solver_opening_nodes(baseline):
+    solver = Solver()
+    solver.best_move(corner_opening(), opponent(X))
+    baseline.check_nodes("solver_opening", solver.nodes)
+
+
+def test_search_nodes(baseline):
+    search = HeuristicSearch(time_limit=600.0, max_depth=3)
+    search.best_move(search_position(), X)
+    baseline.check_nodes("search_5x5_depth3", search.nodes)
+
+
+@pytest.mark.timing
+def test_hard_move_time(baseline, boards):
+    baseline.check_time("hard_move", best_per_call_us(lambda item: perfect_move(*item), boards))
+
+
+@pytest.mark.timing
+def test_medium_move_time(baseline, boards):
+    rng = random.Random(0)
+    baseline.check_time("medium_move", best_per_call_us(lambda item: medium_move(*item, rng), boards))
+
+
+@pytest.mark.timing
+def test_play_check_winner_time(baseline, boards):
+    def play_all(item):
+        board, player = item
+        for index in board.legal_moves():
+            board.play(index, player)
+            board.check_winner(player)
+            board.undo()
+
+    baseline.check_time("play_check_winner", best_per_call_us(play_all, boards))
+
+
+@pytest.mark.timing
+def test_solver_opening_time(baseline):
+    board = corner_opening()
+    baseline.check_time("solver_opening",
+                        best_per_call_us(lambda _: Solver().best_move(board, opponent(X)), [None]))
@@ -0,0 +1,136 @@
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from aiservice import DIFFICULTIES
+from engine import BOARD_VARIANTS, X, Board, opponent
+from rating import Ratings, score_for
+from selfplay import POLICIES
+from storage import DB_PATH, DRAW, BotGame, Storage
+
+
+def pairings(bots, rounds=1):
+    """
+    Круговой турнир: в каждом круге каждый бот играет с каждым дважды, сменив цвет
+    Возвращает список пар (бот за X, бот за O)
+    """
+    return [pair for _ in range(rounds) for pair in itertools.permutations(bots, 2)]
+
+
+def play_pairing(x_bot, o_bot, games, size, win_length, seed):
+    """
+    Играет games партий x_bot против o_bot в текущем процессе
+    Возвращает список результатов: "X", "O" или DRAW
+    """
+    rng = random.Random(seed)
+    policies = {X: POLICIES[x_bot], opponent(X): POLICIES[o_bot]}
+    results = []
+    for _ in range(games):
+        board = Board(size, win_length)
+        player = X
+        while not board.is_terminal():
+            move, _ = policies[player](board, player, rng)
+            board.play(move, player)
+            player = opponent(player)
+        results.append(board.winner() or DRAW)
+    return results
+
+
+def run(bots, games, rounds=1, workers=None, size=3, win_length=3, seed=None):
+    """
+    Проводит турнир, распределяя пары по процессам
+    Возвращает список BotGame в порядке расписания и время игры в секундах
+    """
+    workers = workers or os.cpu_count() or 1
+    rng = random.Random(seed)
+    schedule = [(x_bot, o_bot, rng.randrange(1 << 30)) for x_bot, o_bot in pairings(bots, rounds)]
+
+    started = time.perf_counter()
+    if workers == 1:
+        results = [play_pairing(x_bot, o_bot, games, size, win_length, pair_seed)
+                   for x_bot, o_bot, pair_seed in schedule]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(play_pairing, x_bot, o_bot, games, size, win_length, pair_seed)
+                       for x_bot, o_bot, pair_seed in schedule]
+            results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    finished_at = time.time()
+    played = [
+        BotGame(x_bot, o_bot, size, win_length, result, finished_at)
+        for (x_bot, o_bot, _), pair_results in zip(schedule, results)
+        for result in pair_results
+    ]
+    return played, elapsed
+
+
+def standings(played):
+    """
+    Рейтинги ботов только по партиям турнира (без учета сохраненной истории)
+    """
+    ratings = Ratings()
+    for game in played:
+        ratings.play(game.x_bot, game.o_bot, score_for(game.result, "X"))
+    return sorted(ratings.ratings.items(), key=lambda item: -item[1])
+
+
+def print_ratings(storage):
+    for row in storage.rating_page(limit=1000):
+        name = row.username if row.bot is None else f"ИИ ({row.bot})"
+        print(f"{name:>20}: {row.rating:7.1f}, партий {row.games}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Круговой турнир ботов и рейтинг Эло")
+    parser.add_argument("--database", default=DB_PATH, help="путь к базе данных")
+    parser.add_argument("--bots", nargs="+", choices=DIFFICULTIES, default=list(DIFFICULTIES),
+                        help="участвующие уровни сложности")
+    parser.add_argument("--games", type=int, default=20, help="партий в каждой паре за один круг")
+    parser.add_argument("--rounds", type=int, default=1, help="количество кругов")
+    parser.add_argument("--workers", type=int, default=None, help="количество процессов (по умолчанию — все ядра)")
+    parser.add_argument("--size", type=int, default=3, help="размер поля")
+    parser.add_argument("--win-length", type=int, default=None, help="длина выигрышной линии")
+    parser.add_argument("--seed", type=int, default=None, help="зерно генератора случайных чисел")
+    parser.add_argument("--dry-run", action="store_true", help="не сохранять партии турнира в базу")
+    parser.add_argument("--recompute", action="store_true",
+                        help="не проводить турнир, а пересчитать все рейтинги по сохраненным партиям")
+    args = parser.parse_args(argv)
+
+    if args.recompute:
+        storage = Storage(args.database)
+        try:
+            started = time.perf_counter()
+            count = storage.recompute_ratings()
+            print(f"Пересчитано партий: {count} за {time.perf_counter() - started:.2f} с")
+            print_ratings(storage)
+        finally:
+            storage.close()
+        return 0
+
+    if len(set(args.bots)) < 2:
+        parser.error("для турнира нужны хотя бы два разных бота")
+    win_length = args.win_length or dict(BOARD_VARIANTS).get(args.size, min(args.size, 5))
+    played, elapsed = run(sorted(set(args.bots)), args.games, args.rounds, args.workers,
+                          args.size, win_length, args.seed)
+    print(f"Партий: {len(played)}, партий в секунду: {len(played) / elapsed if elapsed else 0.0:.0f}")
+    for bot, value in standings(played):
+        print(f"{bot:>8}: {value:7.1f}")
+
+    if not args.dry_run:
+        storage = Storage(args.database)
+        try:
+            storage.record_bot_games(played)
+            print("Общий рейтинг:")
+            print_ratings(storage)
+        finally:
+            storage.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+import argparse
+import sys
+import time
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+from engine import SIZE, O, X, geometry
+from storage import Storage
+
+EMPTY_CODE = 0
+X_CODE = 1
+O_CODE = -1
+CODES = {X: X_CODE, O: O_CODE}
+CHUNK = 1 << 20
+TABLE_CELLS = 9
+
+BatchResult = namedtuple("BatchResult", "winner draw terminal legal")
+
+
+def line_cells(size=SIZE, win_length=SIZE):
+    """
+    Возвращает массив (число отрезков, win_length) с номерами клеток каждого выигрышного отрезка
+    """
+    cells = [
+        [index for index in range(size * size) if mask >> index & 1]
+        for mask in geometry(size, win_length).lines
+    ]
+    return np.array(cells, dtype=np.intp)
+
+
+def encode_boards(boards):
+    """
+    Переводит список объектов Board в массив (N, клетки) int8: 1 — X, -1 — O, 0 — пусто
+    """
+    cells = boards[0].cells if boards else SIZE * SIZE
+    result = np.zeros((len(boards), cells), dtype=np.int8)
+    for row, board in enumerate(boards):
+        for index in range(cells):
+            result[row, index] = CODES.get(board.get(index), EMPTY_CODE)
+    return result
+
+
+def boards_from_moves(games, size=SIZE):
+    """
+    Восстанавливает конечные позиции по записям партий [(первый игрок, ходы), ...]
+    """
+    result = np.zeros((len(games), size * size), dtype=np.int8)
+    for row, (first_player, moves) in enumerate(games):
+        first = CODES[first_player]
+        result[row, list(moves[0::2])] = first
+        result[row, list(moves[1::2])] = -first
+    return result
+
+
+def _chunks(boards, chunk):
+    for start in range(0, len(boards), chunk):
+        yield start, boards[start:start + chunk]
+
+
+def classify(boards, size=SIZE, win_length=SIZE, chunk=CHUNK):
+    """
+    Оценивает N позиций сразу: boards — массив (N, клетки) int8 с кодами 1, -1, 0
+    Возвращает BatchResult из массивов длины N: winner (1, -1 или 0), draw, terminal
+    и legal — маску свободных клеток (N, клетки)
+    Позиции обрабатываются частями по chunk строк, чтобы не расходовать лишнюю память
+    """
+    boards = np.asarray(boards, dtype=np.int8)
+    lines = line_cells(size, win_length)
+    winner = np.zeros(len(boards), dtype=np.int8)
+    for start, part in _chunks(boards, chunk):
+        winner[start:start + len(part)] = _line_winners(part, lines, win_length)
+    legal = boards == EMPTY_CODE
+    full = ~legal.any(axis=1)
+    has_winner = winner != EMPTY_CODE
+    return BatchResult(winner, full & ~has_winner, full | has_winner, legal)
+
+
+def _line_winners(boards, lines, win_length):
+    sums = boards[:, lines].sum(axis=2, dtype=np.int16)
+    x_wins = (sums == win_length).any(axis=1)
+    o_wins = (sums == -win_length).any(axis=1)
+    return np.where(x_wins, X_CODE, np.where(o_wins, O_CODE, EMPTY_CODE)).astype(np.int8)
+
+
+def position_codes(boards):
+    """
+    Троичные коды позиций: клетка i дает 3^i, умноженное на 0 (пусто), 1 (X) или 2 (O)
+    """
+    powers = 3 ** np.arange(boards.shape[1], dtype=np.int32)
+    return (boards.astype(np.int32) % 3) @ powers
+
+
+PositionTable = namedtuple("PositionTable", "x_wins o_wins")
+
+
+@lru_cache(maxsize=None)
+def _position_table(size, win_length):
+    """
+    Таблица по всем 3^клетки позициям: наименьшая клетка, ход в которую
+    сразу приносит победу X или O (-1, если такой нет)
+    """
+    cells = size * size
+    codes = np.arange(3 ** cells, dtype=np.int32)
+    boards = (codes[:, None] // 3 ** np.arange(cells, dtype=np.int32) % 3).astype(np.int8)
+    boards[boards == 2] = O_CODE
+    lines = line_cells(size, win_length)
+    wins = [winning_cells(boards, code, lines, win_length) for code in (X_CODE, O_CODE)]
+    first = [np.where(mask.any(axis=1), mask.argmax(axis=1), -1).astype(np.int8) for mask in wins]
+    return PositionTable(*first)
+
+
+def winning_cells(boards, code, lines, win_length):
+    """
+    Маска (N, клетки) клеток, ход в которые сразу собирает отрезок игрока с кодом code
+    """
+    winning = np.zeros(boards.shape, dtype=bool)
+    members = boards[:, lines]
+    ready = ((members == code).sum(axis=2) == win_length - 1) & ((members == EMPTY_CODE).sum(axis=2) == 1)
+    empty = members == EMPTY_CODE
+    for position in range(win_length):
+        hits = ready & empty[:, :, position]
+        rows, line_numbers = np.nonzero(hits)
+        winning[rows, lines[line_numbers, position]] = True
+    return winning
+
+
+def medium_moves(boards, player, size=SIZE, win_length=SIZE, rng=None, chunk=CHUNK):
+    """
+    Пакетный ход среднего уровня, как engine.medium_move: клетка с наименьшим номером,
+    приносящая победу, иначе наименьшая клетка, мешающая сопернику, иначе случайная свободная
+    На полях до 9 клеток выигрывающие клетки берутся из таблицы по троичному коду позиции
+    Возвращает массив номеров клеток; -1 — если свободных клеток нет
+    """
+    boards = np.asarray(boards, dtype=np.int8)
+    rng = rng if rng is not None else np.random.default_rng()
+    code = CODES[player]
+    table = _position_table(size, win_length) if boards.shape[1] <= TABLE_CELLS else None
+    lines = line_cells(size, win_length)
+    moves = np.full(len(boards), -1, dtype=np.intp)
+    for start, part in _chunks(boards, chunk):
+        legal = part == EMPTY_CODE
+        keys = np.where(legal, rng.random(part.shape, dtype=np.float32), -1.0)
+        choice = keys.argmax(axis=1)
+        if table is not None:
+            codes = position_codes(part)
+            mine, theirs = (table.x_wins, table.o_wins) if code == X_CODE else (table.o_wins, table.x_wins)
+            for winning in (theirs[codes], mine[codes]):
+                choice = np.where(winning >= 0, winning, choice)
+        else:
+            for winning in (winning_cells(part, -code, lines, win_length), winning_cells(part, code, lines, win_length)):
+                choice = np.where(winning.any(axis=1), winning.argmax(axis=1), choice)
+        choice[~legal.any(axis=1)] = -1
+        moves[start:start + len(part)] = choice
+    return moves
+
+
+def validate_games(storage, batch_size=100000):
+    """
+    Проверяет сохраненные партии: пересчитывает итог по конечной позиции и сравнивает с записанным
+    Возвращает (число партий, итоги {"X": ..., "O": ..., "draw": ...}, список id расхождений)
+    """
+    names = {X_CODE: X, O_CODE: O}
+    totals = {X: 0, O: 0, "draw": 0}
+    mismatches = []
+    count = 0
+    batch = []
+
+    def flush():
+        for size, win_length in {(game.board_size, game.win_length) for game in batch}:
+            games = [game for game in batch if (game.board_size, game.win_length) == (size, win_length)]
+            result = classify(boards_from_moves([(game.first_player, game.moves) for game in games], size),
+                              size, win_length)
+            for game, winner, draw in zip(games, result.winner, result.draw):
+                outcome = names.get(int(winner), "draw" if draw else None)
+                if outcome in totals:
+                    totals[outcome] += 1
+                if outcome != game.result:
+                    mismatches.append(game.id)
+        batch.clear()
+
+    for game in storage.iter_games():
+        batch.append(game)
+        count += 1
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return count, totals, mismatches
+
+
+def benchmark(count, size=SIZE, win_length=SIZE, seed=0):
+    """
+    Замеряет classify и medium_moves на count случайных позициях
+    """
+    rng = np.random.default_rng(seed)
+    boards = rng.integers(-1, 2, size=(count, size * size), dtype=np.int8)
+    started = time.perf_counter()
+    result = classify(boards, size, win_length)
+    classified = time.perf_counter()
+    medium_moves(boards, X, size, win_length, rng)
+    finished = time.perf_counter()
+    return {
+        "boards": count,
+        "terminal": int(result.terminal.sum()),
+        "classify_s": classified - started,
+        "medium_s": finished - classified,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Пакетная оценка позиций на NumPy")
+    parser.add_argument("--database", default=None, help="проверить сохраненные партии в этой базе данных")
+    parser.add_argument("--benchmark", type=int, default=None, metavar="N", help="замерить скорость на N случайных позициях")
+    parser.add_argument("--size", type=int, default=SIZE, help="размер поля для замера")
+    parser.add_argument("--win-length", type=int, default=None, help="длина выигрышной линии для замера")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        report = benchmark(args.benchmark, args.size, args.win_length or args.size)
+        print(f"Позиций: {report['boards']}, законченных: {report['terminal']}, "
+              f"оценка: {report['classify_s']:.2f} с, ход среднего уровня: {report['medium_s']:.2f} с")
+    if args.database:
+        storage = Storage(args.database)
+        try:
+            count, totals, mismatches = validate_games(storage)
+        finally:
+            storage.close()
+        print(f"Партий: {count}, побед X: {totals[X]}, побед O: {totals[O]}, ничьих: {totals['draw']}")
+        if mismatches:
+            print(f"Итог не совпадает с позицией в партиях: {', '.join(map(str, mismatches))}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())